@@ -0,0 +1,65 @@
+"""
+Compare indexed tree-pattern queries with a scan of every sentence.
+
+Usage: python benchmarks/corpus_query.py [PARSED_FILE] [REPEAT]
+
+PARSED_FILE has one bracketed sentence per line and defaults to the parsed
+dev corpus bundled with IceNLP. A few queries are run with
+``icenlpy.query.CorpusIndex.search`` and by matching the pattern against
+every node of every sentence, and the results are checked to be the same.
+"""
+
+import re
+import sys
+
+from pathlib import Path
+from time import perf_counter
+
+from icenlpy import benchmark, query
+from icenlpy.query import phrase, terminal
+
+DEFAULT_PARSED = benchmark.CORPORA["dev"].parsed
+
+QUERIES = {
+    "PP > NP > dative noun": phrase(
+        "PP", child=phrase("NP", child=terminal(tag=re.compile("n..þ.*")))
+    ),
+    "AdvP >> 'aldrei'": phrase("AdvP", descendant=terminal(word="aldrei")),
+    "NP > AP, noun": phrase("NP", child=[phrase("AP"), terminal(tag=re.compile("n.*"))]),
+    "PP case mismatch": query.PP_CASE_MISMATCH,
+}
+
+
+def timed(function):
+    start = perf_counter()
+    result = function()
+    return result, perf_counter() - start
+
+
+def scan(sentences, pattern):
+    return [
+        query.Match(sent_idx, node)
+        for sent_idx, sentence in enumerate(sentences)
+        for node in range(len(sentence))
+        if pattern.matches(sentence, node)
+    ]
+
+
+def main():
+    path = Path(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PARSED
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    lines = [line for line in path.read_text(encoding="utf-8").split("\n") if line.strip()]
+    index, elapsed = timed(lambda: query.build_index(lines * repeat))
+    print(f"{'build index':>24}: {elapsed * 1000:8.1f} ms, {len(index):,} sentences")
+    for name, pattern in QUERIES.items():
+        found, indexed = timed(lambda: list(index.search(pattern)))
+        expected, scanned = timed(lambda: scan(index.sentences, pattern))
+        assert found == expected, name
+        print(
+            f"{name:>24}: {indexed * 1000:8.1f} ms indexed, {scanned * 1000:8.1f} ms scanned, "
+            f"{len(found):,} matches"
+        )
+
+
+if __name__ == "__main__":
+    main()
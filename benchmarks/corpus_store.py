@@ -0,0 +1,56 @@
+"""
+Compare reading a parsed corpus from IceParser's text output and from a corpus file.
+
+Usage: python benchmarks/corpus_store.py [PARSED_FILE] [REPEAT]
+
+PARSED_FILE has one bracketed sentence per line and defaults to the parsed
+dev corpus bundled with IceNLP. It is stored with ``icenlpy.store`` in a
+temporary directory, and then read back whole and at random.
+"""
+
+import sys
+import random
+import tempfile
+
+from pathlib import Path
+from time import perf_counter
+
+from icenlpy import benchmark, store
+from icenlpy.tree import IceNLPySentence
+
+DEFAULT_PARSED = benchmark.CORPORA["dev"].parsed
+
+
+def timed(label: str, function, count=None):
+    start = perf_counter()
+    result = function()
+    elapsed = perf_counter() - start
+    rate = f", {count / elapsed:>10,.0f} sentences/s" if count else ""
+    print(f"{label:>24}: {elapsed * 1000:8.1f} ms{rate}")
+    return result
+
+
+def main():
+    path = Path(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PARSED
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    text = path.read_text(encoding="utf-8")
+    lines = [line for line in text.split("\n") if line.strip()] * repeat
+    n = len(lines)
+
+    sentences = timed(
+        "parse bracketed text", lambda: [IceNLPySentence(line) for line in lines], n
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus_path = Path(tmp) / "corpus.bin"
+        timed("write corpus file", lambda: store.write_corpus(corpus_path, sentences), n)
+        size = corpus_path.stat().st_size
+        print(f"{'file size':>24}: {size:,} bytes, {len(text.encode()) * repeat:,} as text")
+        corpus = timed("open corpus file", lambda: store.read_corpus(corpus_path))
+        timed("read all sentences", lambda: list(corpus), n)
+        indices = [random.randrange(n) for _ in range(n)]
+        timed("read at random", lambda: [corpus[idx] for idx in indices], n)
+        corpus.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Measure the latency of a fresh runner process under each JVM launch profile,
+without and with the AppCDS archives of ``icenlpy warmup``.
+
+Usage: python benchmarks/jvm_startup.py [REPEAT]
+
+Every call spawns a new JVM (the worker pool is bypassed), so the numbers are
+what a one-off call pays. The archives are generated first if they are
+missing. Needs java and IceNLPCore.jar.
+"""
+
+import sys
+import statistics
+
+from time import perf_counter
+
+from icenlpy import get_jar_path, jvm, utils
+
+SHORT_TEXT = "Hundurinn gelti á köttinn."
+
+
+def run(jar_path: str, target: str, repeat: int):
+    java_args, _ = jvm.WARMUP_RUNS[target]
+    timings = []
+    for _ in range(repeat):
+        start = perf_counter()
+        utils.call_icenlp_jar(jar_path, target, SHORT_TEXT, java_args, use_pool=False)
+        timings.append(perf_counter() - start)
+    return statistics.median(timings), min(timings)
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    jar_path = get_jar_path()
+    if jar_path is None or utils.find_java() is None:
+        print("skipped, java or IceNLPCore.jar was not found")
+        return
+    jvm.warmup(jar_path=jar_path)
+
+    print(f"{'runner':<10} {'profile':<11} {'cds':<4} {'median ms':>10} {'best ms':>8}")
+    for target in jvm.WARMUP_RUNS:
+        for profile in jvm.PROFILES:
+            for cds in (False, True):
+                jvm.configure_jvm(profile=profile, cds=cds)
+                median, best = run(jar_path, target, repeat)
+                print(
+                    f"{target:<10} {profile:<11} {'on' if cds else 'off':<4} "
+                    f"{median * 1000:>10.1f} {best * 1000:>8.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
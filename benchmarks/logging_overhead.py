@@ -0,0 +1,70 @@
+"""
+Measure what logging costs on the path between Python and the IceNLP runners.
+
+Usage: python benchmarks/logging_overhead.py [REPEAT]
+
+The runners are replaced by a stub that returns the bundled tagged and parsed
+dev corpus at once, so only the Python side is timed: run_icetagger,
+run_iceparser, batch parsing in iceparser and building the sentence trees.
+Each workload runs with logging disabled, at INFO and at DEBUG (written to an
+in-memory stream). At INFO the timings should match those with logging
+disabled, as no log message is built.
+"""
+
+import io
+import sys
+import logging
+
+from time import perf_counter
+
+import icenlpy.utils as utils
+
+from icenlpy import benchmark, iceparser, icetagger
+from icenlpy.tree import IceNLPySentence
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    corpus = benchmark.CORPORA["dev"]
+    tagged = corpus.path.read_text(encoding="utf-8")
+    parsed = corpus.parsed.read_text(encoding="utf-8")
+    tagged_lines = [line for line in tagged.split("\n") if line.strip()]
+    raw = "\n".join(" ".join(line.split()[::2]) for line in tagged_lines)
+    parsed_lines = [line for line in parsed.split("\n") if line.strip()]
+    print(f"{len(tagged_lines)} sentences, {len(tagged) + len(parsed):,} characters of output")
+
+    outputs = {"tagger": tagged, "parser": parsed}
+    utils.call_icenlp_jar = lambda jar_path, target, text, java_args={}, **kwargs: outputs[target]
+
+    workloads = {
+        "run_icetagger": lambda: icetagger.run_icetagger(None, raw),
+        "run_iceparser": lambda: iceparser.run_iceparser(None, tagged),
+        "parse batch": lambda: iceparser._parse_batch(tagged_lines),
+        "sentence trees": lambda: [IceNLPySentence(line) for line in parsed_lines],
+    }
+
+    stream = io.StringIO()
+    handler = logging.StreamHandler(stream)
+    logging.getLogger().addHandler(handler)
+    for mode in ("disabled", "INFO", "DEBUG"):
+        if mode == "disabled":
+            logging.disable(logging.CRITICAL)
+        else:
+            logging.disable(logging.NOTSET)
+            logging.getLogger().setLevel(getattr(logging, mode))
+        for name, workload in workloads.items():
+            stream.seek(0)
+            stream.truncate()
+            timings = []
+            for _ in range(repeat):
+                start = perf_counter()
+                workload()
+                timings.append(perf_counter() - start)
+            print(
+                f"{mode:>8} {name:>15}: best of {repeat}: {min(timings) * 1000:8.2f} ms, "
+                f"{len(stream.getvalue()) // repeat:>10,} characters logged per run"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+"""
+Run the IceNLPy benchmark suite, the same as ``icenlpy bench``.
+
+Usage: python benchmarks/run_benchmarks.py [--stages ...] [--batch-sizes ...]
+       [--corpus dev|test|200sent|mogginn] [--limit N] [-o results.json]
+       [--compare baseline.json]
+"""
+
+import sys
+import argparse
+
+from icenlpy import benchmark
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    benchmark.add_arguments(parser)
+    sys.exit(benchmark.main(parser.parse_args()))
@@ -0,0 +1,58 @@
+"""
+Compare the accuracy of IceTagger and the in-process HMM tagger.
+
+Usage: python benchmarks/tagger_accuracy.py [GOLD_FILE]
+
+GOLD_FILE has one token and tag per line, separated by a tab, with an empty
+line between sentences. It defaults to bat/iceparser/testData/test.gold, which
+uses the revised tagset, so the output of both taggers is mapped to that
+tagset first. The IceTagger run is skipped if IceNLPCore.jar or java is not
+available.
+"""
+
+import sys
+
+from pathlib import Path
+from time import perf_counter
+
+from icenlpy import benchmark, icetagger, tritagger
+
+DEFAULT_GOLD = benchmark.BAT_DIR / "iceparser/testData/test.gold"
+
+
+def read_gold(path: Path):
+    blocks = path.read_text(encoding="utf-8").strip().split("\n\n")
+    return [[line.split("\t") for line in block.split("\n")] for block in blocks]
+
+
+def evaluate(gold, backend: str):
+    sentences = [" ".join(token for token, _ in sentence) for sentence in gold]
+    start = perf_counter()
+    predicted = icetagger.tag_text(
+        sentences, args={"lf": 2}, return_tags_only=True, backend=backend
+    )
+    elapsed = perf_counter() - start
+
+    correct = total = 0
+    for sentence, tags in zip(gold, predicted):
+        for (token, gold_tag), tag in zip(sentence, tags):
+            # Both taggers use the original tagset, the gold corpus the revised one
+            correct += gold_tag.strip() == tritagger.to_revised_tag(token, tag)
+            total += 1
+    print(
+        f"{backend:>4}: accuracy {correct / total:.2%} on {total} tokens, "
+        f"{elapsed:.2f} s ({total / elapsed:,.0f} tokens/s)"
+    )
+
+
+def main():
+    gold = read_gold(Path(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_GOLD)
+    evaluate(gold, "hmm")
+    if benchmark.jvm_available():
+        evaluate(gold, "jvm")
+    else:
+        print(" jvm: skipped, IceNLPCore.jar or java was not found")
+
+
+if __name__ == "__main__":
+    main()
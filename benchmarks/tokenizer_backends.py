@@ -0,0 +1,54 @@
+"""
+Compare the JVM and the in-process tokenizer backends.
+
+Usage: python benchmarks/tokenizer_backends.py [FILE] [REPEAT]
+
+FILE defaults to the raw text of the bundled IceTagger test corpus. The JVM
+backend is skipped if IceNLPCore.jar or java is not available.
+"""
+
+import sys
+
+from pathlib import Path
+from time import perf_counter
+
+from icenlpy import JAR_FOUND, tokenizer
+
+DEFAULT_CORPUS = (
+    Path(tokenizer.__file__).parent / "resources/IceNLP/bat/icetagger/mogginn.txt"
+)
+
+
+def run(text: str, backend: str, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        start = perf_counter()
+        n_tokens = sum(len(list(s)) for s in tokenizer.tokenize(text, backend=backend))
+        timings.append(perf_counter() - start)
+    best = min(timings)
+    print(
+        f"{backend:>6}: {n_tokens} tokens, best of {repeat}: {best * 1000:.1f} ms, "
+        f"{n_tokens / best:,.0f} tokens/s"
+    )
+
+
+def main():
+    path = Path(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_CORPUS
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    text = path.read_text(encoding="utf-8")
+    if path == DEFAULT_CORPUS:
+        # The corpus is one token per line, turn it back into running text
+        text = "\n".join(" ".join(s.split("\n")) for s in text.split("\n\n"))
+
+    run(text, "python", repeat)
+    short = "Ég á stóran hund. Sá er a.m.k. 10 kíló."
+    run(short, "python", repeat)
+    if JAR_FOUND:
+        run(text, "jvm", repeat)
+        run(short, "jvm", repeat)
+    else:
+        print("   jvm: skipped, IceNLPCore.jar was not found")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,67 @@
-import sys
+"""
+IceNLPy, a Python wrapper for IceNLP.
+
+Importing the package is kept cheap: submodules are loaded on first access
+(``icenlpy.iceparser`` works after a plain ``import icenlpy``), and the
+IceNLP jar is only looked up when ``JAR_PATH`` or ``JAR_FOUND`` is first read.
+The package doesn't configure logging, that is left to the application.
+"""
+
 import logging
+import importlib
+
+from functools import lru_cache
 from pathlib import Path
-from os.path import exists
+from typing import Optional
 
 logger = logging.getLogger(__name__)
 
-try:
-    package_dir = Path(__file__).parent
-    ice_nlp_dir = package_dir / "resources/IceNLP/"
-    jar_path = ice_nlp_dir / "dist/IceNLPCore.jar"
-    jar_path = jar_path.resolve()
-    assert exists(jar_path)
-    JAR_PATH = str(jar_path)
-    JAR_FOUND = True
-    logger.debug(f"IceNLP JAR file is located at: {JAR_PATH}")
-except Exception as e:
-    logger.error(f"Failed to locate IceNLPCore.jar within the icenlpy package: {e}")
-    JAR_PATH = None
-    JAR_FOUND = False
+_SUBMODULES = {
+    "benchmark",
+    "bridge",
+    "cache",
+    "cli",
+    "evaluate",
+    "iceparser",
+    "icetagger",
+    "jvm",
+    "lexicon",
+    "metrics",
+    "parallel",
+    "pipeline",
+    "pytokenizer",
+    "query",
+    "server",
+    "store",
+    "stream",
+    "tokenizer",
+    "tree",
+    "tritagger",
+    "utils",
+    "workers",
+}
+
+
+@lru_cache(maxsize=None)
+def get_jar_path() -> Optional[str]:
+    """Return the path of the IceNLPCore.jar bundled with the package, or None if it is missing."""
+    jar_path = (Path(__file__).parent / "resources/IceNLP/dist/IceNLPCore.jar").resolve()
+    if not jar_path.exists():
+        logger.error(f"Failed to locate IceNLPCore.jar within the icenlpy package: {jar_path}")
+        return None
+    logger.debug(f"IceNLP JAR file is located at: {jar_path}")
+    return str(jar_path)
+
+
+def __getattr__(name: str):
+    if name == "JAR_PATH":
+        return get_jar_path()
+    if name == "JAR_FOUND":
+        return get_jar_path() is not None
+    if name in _SUBMODULES:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | _SUBMODULES | {"JAR_PATH", "JAR_FOUND"})
@@ -0,0 +1,387 @@
+"""
+Throughput and latency benchmarks over the corpora bundled with IceNLP.
+
+Each stage (tokenizer, tagger, parser and tree construction) is run over a
+corpus in batches of different sizes. For every stage and batch size the
+results contain tokens and sentences per second, the median and 99th
+percentile latency of a batch, and the peak resident memory of the Python
+process and of its child processes (the JVMs). ``run_benchmarks`` returns a
+JSON serializable dictionary, so results can be stored and compared between
+releases with ``compare_results``.
+
+Usage from the command line:
+
+    icenlpy bench --stages tokenizer-python tree --batch-sizes 1 100 -o bench.json
+"""
+
+import sys
+import json
+import logging
+import importlib.util
+import platform
+
+from datetime import datetime, timezone
+from pathlib import Path
+from time import perf_counter
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+import icenlpy.utils as utils
+
+from icenlpy import get_jar_path
+
+logger = logging.getLogger(__name__)
+
+BAT_DIR = Path(__file__).parent / "resources/IceNLP/bat"
+
+
+class Corpus(NamedTuple):
+    """A bundled corpus. ``parsed`` is the IceParser output for the same sentences, if it ships."""
+
+    path: Path
+    tagged: bool
+    parsed: Optional[Path] = None
+
+
+CORPORA: Dict[str, Corpus] = {
+    "dev": Corpus(
+        BAT_DIR / "iceparser/testData/dev.tags.sent",
+        tagged=True,
+        parsed=BAT_DIR / "iceparser/testData/dev.tags.sent.parsed",
+    ),
+    "test": Corpus(
+        BAT_DIR / "iceparser/testData/test.gold.sent",
+        tagged=True,
+        parsed=BAT_DIR / "iceparser/testData/test.gold.sent.parsed",
+    ),
+    "200sent": Corpus(
+        BAT_DIR / "iceparser/200sent.txt",
+        tagged=True,
+        parsed=BAT_DIR / "iceparser/200sent_func.gdc",
+    ),
+    # One token per line, with an empty line between sentences
+    "mogginn": Corpus(BAT_DIR / "icetagger/mogginn.txt", tagged=False),
+}
+
+STAGES = ("tokenizer", "tokenizer-python", "tagger", "tagger-hmm", "parser", "tree")
+# Stages which start a JVM
+JVM_STAGES = {"tokenizer", "tagger", "parser"}
+DEFAULT_BATCH_SIZES = (1, 10, 100, 1000)
+
+
+class Sentence(NamedTuple):
+    tokens: List[str]
+    tags: Optional[List[str]]
+
+    @property
+    def text(self) -> str:
+        return " ".join(self.tokens)
+
+    @property
+    def tagged_text(self) -> str:
+        return " ".join(f"{token} {tag}" for token, tag in zip(self.tokens, self.tags))
+
+
+def load_corpus(name: str, limit: Optional[int] = None) -> List[Sentence]:
+    """
+    Read one of the bundled corpora.
+
+    :param name: One of the keys of ``CORPORA``.
+    :param limit: Read at most this many sentences.
+    :return: A list of sentences, with tags if the corpus is tagged.
+    """
+    corpus = CORPORA[name]
+    text = corpus.path.read_text(encoding="utf-8")
+    if corpus.tagged:
+        lines = (line.split() for line in text.split("\n"))
+        sentences = [Sentence(words[::2], words[1::2]) for words in lines if words]
+    else:
+        sentences = [
+            Sentence(block.split("\n"), None) for block in text.strip().split("\n\n")
+        ]
+    return sentences[:limit]
+
+
+def load_parsed(name: str, limit: Optional[int] = None) -> List[str]:
+    """Read the bundled IceParser output of a corpus, one sentence per line."""
+    parsed = CORPORA[name].parsed
+    if parsed is None:
+        raise ValueError(f"No parsed version of the {name} corpus is bundled")
+    lines = [line for line in parsed.read_text(encoding="utf-8").split("\n") if line.strip()]
+    return lines[:limit]
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Return the ``q``-th percentile of ``values``, interpolating between the closest ranks."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def peak_rss() -> Dict[str, Optional[int]]:
+    """Peak resident set size in kilobytes of this process and of its finished children."""
+    if resource is None:
+        return {"self_kb": None, "children_kb": None}
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    scale = 1024 if sys.platform == "darwin" else 1
+    return {
+        "self_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // scale,
+        "children_kb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // scale,
+    }
+
+
+def jvm_available() -> bool:
+    """Whether the IceNLP jar and a java executable can be found."""
+    return get_jar_path() is not None and utils.find_java() is not None
+
+
+def _stage_function(stage: str) -> Callable[[List[Sentence]], object]:
+    """Return a function which runs ``stage`` on a batch of sentences."""
+    from icenlpy import iceparser, icetagger, tokenizer
+
+    if stage == "tokenizer":
+        return lambda batch: [list(s) for s in tokenizer.tokenize([s.text for s in batch])]
+    if stage == "tokenizer-python":
+        return lambda batch: [
+            list(s)
+            for s in tokenizer.tokenize([s.text for s in batch], backend="python")
+        ]
+    if stage == "tagger":
+        return lambda batch: icetagger.tag_text([s.text for s in batch], args={"lf": 2})
+    if stage == "tagger-hmm":
+        return lambda batch: icetagger.tag_text(
+            [s.text for s in batch], args={"lf": 2}, backend="hmm"
+        )
+    if stage == "parser":
+        return lambda batch: iceparser.parse_text(
+            [s.tagged_text for s in batch], batch_size=len(batch)
+        )
+    raise ValueError(f"Unknown stage: {stage}")
+
+
+def _batches(items: List, batch_size: int) -> Iterable[List]:
+    for start in range(0, len(items), batch_size):
+        yield items[start : start + batch_size]
+
+
+def run_stage(
+    run: Callable[[List], object],
+    items: List,
+    batch_size: int,
+    count_tokens: Callable[[object], int],
+) -> Dict[str, object]:
+    """
+    Time ``run`` over ``items`` in batches of ``batch_size``.
+
+    :param run: Called with each batch.
+    :param items: The input items, one per sentence.
+    :param batch_size: Number of items per call.
+    :param count_tokens: Returns the number of tokens of an item.
+    :return: The measurements for this stage and batch size.
+    """
+    latencies: List[float] = []
+    start = perf_counter()
+    for batch in _batches(items, batch_size):
+        batch_start = perf_counter()
+        run(batch)
+        latencies.append(perf_counter() - batch_start)
+    elapsed = perf_counter() - start
+    tokens = sum(count_tokens(item) for item in items)
+    return {
+        "batch_size": batch_size,
+        "sentences": len(items),
+        "tokens": tokens,
+        "batches": len(latencies),
+        "seconds": elapsed,
+        "sentences_per_sec": len(items) / elapsed if elapsed else None,
+        "tokens_per_sec": tokens / elapsed if elapsed else None,
+        "latency_p50_ms": percentile(latencies, 50) * 1000,
+        "latency_p99_ms": percentile(latencies, 99) * 1000,
+        "peak_rss": peak_rss(),
+    }
+
+
+def run_benchmarks(
+    stages: Sequence[str] = STAGES,
+    batch_sizes: Sequence[int] = DEFAULT_BATCH_SIZES,
+    corpus: str = "dev",
+    limit: Optional[int] = None,
+) -> Dict[str, object]:
+    """
+    Run the benchmark suite.
+
+    Stages that need Java are reported as skipped if the jar or java is missing,
+    as are stages the corpus has no input for (``parser`` and ``tree`` need a
+    tagged and a parsed corpus respectively).
+
+    :param stages: The stages to run, see ``STAGES``.
+    :param batch_sizes: Number of sentences per call.
+    :param corpus: One of the keys of ``CORPORA``.
+    :param limit: Use at most this many sentences of the corpus.
+    :return: A JSON serializable dictionary of results.
+    """
+    for stage in stages:
+        if stage not in STAGES:
+            raise ValueError(f"Unknown stage: {stage}")
+    if corpus not in CORPORA:
+        raise ValueError(f"Unknown corpus: {corpus}")
+
+    sentences = load_corpus(corpus, limit)
+    results: Dict[str, object] = {
+        "metadata": _metadata(corpus, len(sentences)),
+        "stages": {},
+    }
+    for stage in stages:
+        if stage in JVM_STAGES and not jvm_available():
+            results["stages"][stage] = {"skipped": "IceNLPCore.jar or java was not found"}
+            continue
+        if stage == "parser" and not CORPORA[corpus].tagged:
+            results["stages"][stage] = {"skipped": f"The {corpus} corpus is not tagged"}
+            continue
+        if stage == "tagger-hmm" and importlib.util.find_spec("numpy") is None:
+            results["stages"][stage] = {"skipped": "NumPy is not installed"}
+            continue
+        if stage == "tree" and CORPORA[corpus].parsed is None:
+            results["stages"][stage] = {"skipped": f"No parsed version of {corpus} is bundled"}
+            continue
+
+        if stage == "tree":
+            from icenlpy.tree import IceNLPySentence
+
+            items = load_parsed(corpus, limit)
+
+            def run(batch):
+                return [IceNLPySentence(line) for line in batch]
+
+            def count_tokens(line):
+                return sum(1 for _ in IceNLPySentence(line).tokens())
+
+        else:
+            items = sentences
+            run = _stage_function(stage)
+
+            def count_tokens(sentence):
+                return len(sentence.tokens)
+
+        runs = []
+        for batch_size in batch_sizes:
+            logger.info(f"Benchmarking {stage} with batch size {batch_size}")
+            runs.append(run_stage(run, items, batch_size, count_tokens))
+        results["stages"][stage] = {"runs": runs}
+    return results
+
+
+def _metadata(corpus: str, sentences: int) -> Dict[str, object]:
+    try:
+        from importlib.metadata import version
+
+        icenlpy_version = version("icenlpy")
+    except Exception:
+        icenlpy_version = "unknown"
+    return {
+        "icenlpy_version": icenlpy_version,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "corpus": corpus,
+        "corpus_sentences": sentences,
+        "jvm_available": jvm_available(),
+    }
+
+
+def compare_results(
+    baseline: Dict[str, object], current: Dict[str, object], threshold: float = 0.1
+) -> List[str]:
+    """
+    Find throughput regressions between two benchmark results.
+
+    :param baseline: Results of an earlier run.
+    :param current: Results of the run to check.
+    :param threshold: Relative drop in tokens per second that counts as a regression.
+    :return: A description of each regression, empty if there are none.
+    """
+    regressions = []
+    for stage, result in current["stages"].items():
+        before = baseline["stages"].get(stage, {})
+        before_runs = {run["batch_size"]: run for run in before.get("runs", [])}
+        for run in result.get("runs", []):
+            old = before_runs.get(run["batch_size"])
+            if not old or not old["tokens_per_sec"] or not run["tokens_per_sec"]:
+                continue
+            change = run["tokens_per_sec"] / old["tokens_per_sec"] - 1
+            if change < -threshold:
+                regressions.append(
+                    f"{stage} (batch size {run['batch_size']}): "
+                    f"{old['tokens_per_sec']:.0f} -> {run['tokens_per_sec']:.0f} tokens/s "
+                    f"({change:+.1%})"
+                )
+    return regressions
+
+
+def add_arguments(parser):
+    """Add the benchmark options to an argparse parser."""
+    parser.add_argument(
+        "--stages",
+        nargs="+",
+        default=list(STAGES),
+        choices=STAGES,
+        help="The stages to benchmark.",
+    )
+    parser.add_argument(
+        "--batch-sizes",
+        nargs="+",
+        type=int,
+        default=list(DEFAULT_BATCH_SIZES),
+        help="Number of sentences per call.",
+    )
+    parser.add_argument(
+        "--corpus", default="dev", choices=sorted(CORPORA), help="The corpus to run on."
+    )
+    parser.add_argument(
+        "--limit", type=int, default=None, help="Use at most this many sentences."
+    )
+    parser.add_argument("-o", "--output", type=str, help="Write the JSON results to this file.")
+    parser.add_argument(
+        "--compare",
+        type=str,
+        help="A JSON file of earlier results. Exits with status 1 on a throughput regression.",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Relative throughput drop reported as a regression by --compare.",
+    )
+
+
+def main(args) -> int:
+    """Run the benchmarks for parsed command line arguments and return an exit status."""
+    results = run_benchmarks(
+        stages=args.stages,
+        batch_sizes=args.batch_sizes,
+        corpus=args.corpus,
+        limit=args.limit,
+    )
+    output = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = compare_results(baseline, results, args.threshold)
+        for regression in regressions:
+            print(f"Regression: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
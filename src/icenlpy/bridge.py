@@ -0,0 +1,234 @@
+"""
+An in-process backend that runs IceNLP in an embedded JVM through JPype.
+
+With the optional JPype package installed (``pip install JPype1``), the
+first call to IceNLP starts a JVM inside the Python process, with
+IceNLPCore.jar and the jars of its ``lib`` directory on the class path, and
+loads the tokenizer, IceTagger and IceParser once. From then on text is
+passed to the Java objects as Java strings and the tokens and tags are read
+straight from the Java token objects: no process is started, and nothing is
+written to or parsed from a runner's stdout.
+
+``utils.call_icenlp_jar`` goes through the bridge whenever it is available
+and supports the runner arguments of the call, so ``tokenizer``,
+``icetagger`` and ``iceparser`` use it without any change. Arguments the
+bridge does not support, e.g. IceParser's ``-l``, fall back to a runner
+process, as does everything if JPype is missing or the JVM fails to start.
+
+The JVM is started with the options of the launch profile in use, see
+``icenlpy.jvm``. A JVM can only be started once per process and can not be
+unloaded, so the bridge costs the memory of the JVM for the lifetime of the
+process. Turn it off with ``configure_bridge(enabled=False)`` or
+``ICENLPY_BRIDGE=0``.
+"""
+
+import os
+import logging
+import threading
+import importlib.util
+
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import icenlpy.jvm as jvm
+
+from icenlpy import get_jar_path
+
+logger = logging.getLogger(__name__)
+
+# The runner arguments each target needs to go through the bridge, and the
+# flags it may have on top of them. Anything else is left to a runner process.
+REQUIRED_ARGS = {"tokenizer": {"of": 2}, "tagger": {"lf": 3}, "parser": {}}
+OPTIONAL_FLAGS = {"tokenizer": set(), "tagger": set(), "parser": {"f"}}
+
+TaggedSentence = List[Tuple[str, str]]
+
+
+def jpype_installed() -> bool:
+    return importlib.util.find_spec("jpype") is not None
+
+
+def supports_args(target: str, java_args: dict) -> bool:
+    """Whether a runner call with these arguments can go through the bridge."""
+    required = REQUIRED_ARGS.get(target)
+    if required is None or set(java_args) - set(required) - OPTIONAL_FLAGS[target]:
+        return False
+    for name, value in required.items():
+        if name not in java_args or str(java_args[name]) != str(value):
+            return False
+    flags = OPTIONAL_FLAGS[target] & set(java_args)
+    return all(java_args[flag] in (True, False) for flag in flags)
+
+
+class Bridge:
+    """
+    IceNLP's tokenizer, IceTagger and IceParser loaded into an embedded JVM.
+
+    Created by ``get_bridge``, which starts the JVM. The Java objects are not
+    thread-safe, so calls are serialized by a lock.
+
+    :param jar_path: Path to the IceNLPCore.jar file.
+    """
+
+    def __init__(self, jar_path: str):
+        import jpype
+
+        self._jpype = jpype
+        if not jpype.isJVMStarted():
+            lib_dir = Path(jar_path).parent.parent / "lib"
+            classpath = [jar_path] + sorted(str(path) for path in lib_dir.glob("*.jar"))
+            # Strings are converted explicitly, so that results stay Java objects until read
+            jpype.startJVM(*jvm.profile_options(), classpath=classpath, convertStrings=False)
+        self._lock = threading.Lock()
+
+        JClass = jpype.JClass
+        tokenizer_resources = JClass("is.iclt.icenlp.core.utils.TokenizerResources")()
+        lexicon = JClass("is.iclt.icenlp.core.tokenizer.Lexicon")(tokenizer_resources.isLexicon)
+        Tokenizer = JClass("is.iclt.icenlp.core.tokenizer.Tokenizer")
+        self._tokenizer = Tokenizer(Tokenizer.typeToken, True, lexicon)
+        self._segmentizer = JClass("is.iclt.icenlp.core.tokenizer.Segmentizer")(lexicon)
+
+        tagger_lexicons = JClass("is.iclt.icenlp.core.utils.IceTaggerLexicons")(
+            JClass("is.iclt.icenlp.core.utils.IceTaggerResources")()
+        )
+        self._tagger = JClass("is.iclt.icenlp.facade.IceTaggerFacade")(tagger_lexicons, lexicon)
+        self._parser = JClass("is.iclt.icenlp.facade.IceParserFacade")()
+
+    def _sentences(self, text: str) -> List[str]:
+        segmentizer = self._segmentizer
+        segmentizer.segmentize(self._jpype.JString(text))
+        sentences = []
+        while segmentizer.hasMoreSentences():
+            sentences.append(segmentizer.getNextSentence())
+        return sentences
+
+    def tokenize(self, text: str) -> List[List[str]]:
+        """Split running text into sentences of tokens."""
+        sentences = []
+        with self._lock:
+            for sentence in self._sentences(text):
+                self._tokenizer.tokenize(sentence)
+                tokens = [str(token.lexeme) for token in self._tokenizer.tokens]
+                if tokens:
+                    sentences.append(tokens)
+        return sentences
+
+    def tag(self, text: str) -> List[TaggedSentence]:
+        """Tokenize and tag running text, as IceTagger does with ``-lf 3``."""
+        tagged = []
+        with self._lock:
+            result = self._tagger.tag(self._jpype.JString(text))
+            for sentence in result.getSentences():
+                tokens = [
+                    (str(token.lexeme), str(token.getFirstTagStr()))
+                    for token in sentence.getTokens()
+                ]
+                if tokens:
+                    tagged.append(tokens)
+        return tagged
+
+    def parse(self, tagged_text: str, functions=False) -> List[str]:
+        """Parse tagged sentences, one per line of ``word tag`` pairs, into brackets."""
+        with self._lock:
+            parsed = str(self._parser.parse(self._jpype.JString(tagged_text), functions, False))
+        return [line for line in parsed.split("\n") if line.strip()]
+
+    def run(self, target: str, input_text: str, java_args={}) -> str:
+        """
+        Do what the runner for ``target`` would, and return what it would write to stdout.
+
+        :raises ValueError: If the bridge doesn't support the arguments, see ``supports_args``.
+        """
+        if not supports_args(target, java_args):
+            raise ValueError(f"The bridge does not support {target} with {java_args}")
+        if target == "tokenizer":
+            return "".join(" ".join(tokens) + "\n" for tokens in self.tokenize(input_text))
+        if target == "tagger":
+            return "".join(
+                " ".join(f"{word} {tag}" for word, tag in sentence) + "\n"
+                for sentence in self.tag(input_text)
+            )
+        functions = bool(java_args.get("f", False))
+        return "".join(line + "\n" for line in self.parse(input_text, functions=functions))
+
+
+_bridge: Optional[Bridge] = None
+_bridge_failed = False
+_bridge_lock = threading.Lock()
+_bridge_enabled = os.environ.get("ICENLPY_BRIDGE", "1") != "0"
+
+
+def get_bridge() -> Optional[Bridge]:
+    """
+    Return the process-wide bridge, starting the JVM on first use.
+
+    Returns ``None``, and IceNLP is run in separate processes, if JPype is not
+    installed, the jar is missing, the bridge has been turned off with
+    ``configure_bridge`` or ``ICENLPY_BRIDGE=0``, or the JVM failed to start.
+    """
+    global _bridge, _bridge_failed
+    if not _bridge_enabled or _bridge_failed:
+        return None
+    if _bridge is not None:
+        return _bridge
+    with _bridge_lock:
+        if _bridge is None and not _bridge_failed:
+            jar_path = get_jar_path()
+            if jar_path is None or not jpype_installed():
+                _bridge_failed = True
+                return None
+            try:
+                _bridge = Bridge(jar_path)
+                logger.debug("Loaded IceNLP into an embedded JVM")
+            except Exception as e:
+                _bridge_failed = True
+                logger.warning(
+                    "Could not load IceNLP through JPype, using runner processes: %s", e
+                )
+    return _bridge
+
+
+def configure_bridge(enabled: bool = True) -> Optional[Bridge]:
+    """
+    Turn the bridge on or off. A JVM that has been started keeps running.
+
+    :return: The bridge, or ``None`` if it is off or not available.
+    """
+    global _bridge_enabled
+    _bridge_enabled = enabled
+    return get_bridge()
+
+
+def disable_after_error(error: BaseException):
+    """Stop using the bridge after it failed, so that the runners take over."""
+    global _bridge_failed
+    logger.warning(
+        "IceNLP failed in the embedded JVM, using runner processes from now on: %s", error
+    )
+    _bridge_failed = True
+
+
+def available(target: str, java_args: dict) -> bool:
+    """Whether a runner call with these arguments would go through the bridge."""
+    return supports_args(target, java_args) and get_bridge() is not None
+
+
+def attempt(target: str, java_args: dict, method: str, *args):
+    """
+    Call a method of the bridge if it is available and supports the runner arguments.
+
+    :param target: The runner the call stands in for, one of ``REQUIRED_ARGS``.
+    :param java_args: The arguments the runner would have been given.
+    :param method: The name of the ``Bridge`` method, e.g. ``"tag"``.
+    :return: What the method returns, or ``None`` if the caller should start a runner instead.
+    """
+    if not supports_args(target, java_args):
+        return None
+    bridge = get_bridge()
+    if bridge is None:
+        return None
+    try:
+        return getattr(bridge, method)(*args)
+    except Exception as e:
+        disable_after_error(e)
+        return None
@@ -0,0 +1,286 @@
+"""
+A content-addressed cache for the results of the IceNLP runners.
+
+Results are stored per sentence under a hash of the stage, the sentence, the
+runner arguments and the version of the IceNLP resources, so a changed
+argument or an updated jar never returns a stale result. Every cache has a
+bounded in-memory LRU tier. Given a path, it also has an on-disk tier in a
+sqlite database, which can be shared by several processes.
+
+The cache is off by default. Turn it on with ``configure_cache`` or by setting
+the ``ICENLPY_CACHE=1`` environment variable (``ICENLPY_CACHE_PATH`` adds the
+on-disk tier).
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+import icenlpy.metrics as metrics
+
+from icenlpy import get_jar_path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 100_000
+
+# Number of keys looked up in a single sqlite query
+_SQLITE_CHUNK = 500
+
+
+@lru_cache(maxsize=None)
+def resource_version() -> str:
+    """Identify the IceNLP resources in use, so results are not shared across versions."""
+    jar_path = get_jar_path()
+    if jar_path is None:
+        return "no-jar"
+    stat = os.stat(jar_path)
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+
+def make_key(stage: str, text: str, java_args={}) -> str:
+    """
+    Return the cache key of one input.
+
+    :param stage: The name of the processing stage, e.g. ``"tagger"``.
+    :param text: The input, usually a single sentence.
+    :param java_args: The arguments the runner is called with.
+    :return: A hex digest.
+    """
+    payload = json.dumps(
+        [stage, text, sorted((str(k), str(v)) for k, v in java_args.items()), resource_version()],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    A two-tier key-value cache of runner results.
+
+    :param max_entries: Maximum number of entries kept in memory.
+    :param path: Path to a sqlite database for the on-disk tier. It is created if missing.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, path=None):
+        if max_entries < 0:
+            raise ValueError("max_entries must be zero or a positive integer")
+        self.max_entries = max_entries
+        self.path = path
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional["sqlite3.Connection"] = None
+        if path is not None:
+            # Only the disk cache needs sqlite3
+            import sqlite3
+
+            path = os.path.expanduser(str(path))
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+            )
+            self._db.commit()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+    def _remember(self, key: str, value: str):
+        if self.max_entries == 0:
+            return
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, str]:
+        """Look up several keys at once. Missing keys are left out of the result."""
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, str] = {}
+        with self._lock:
+            missing = []
+            for key in keys:
+                value = self._memory.get(key)
+                if value is None:
+                    missing.append(key)
+                else:
+                    self._memory.move_to_end(key)
+                    found[key] = value
+            if missing and self._db is not None:
+                for start in range(0, len(missing), _SQLITE_CHUNK):
+                    chunk = missing[start : start + _SQLITE_CHUNK]
+                    rows = self._db.execute(
+                        f"SELECT key, value FROM results WHERE key IN ({','.join('?' * len(chunk))})",
+                        chunk,
+                    ).fetchall()
+                    for key, value in rows:
+                        found[key] = value
+                        self._remember(key, value)
+                        self.disk_hits += 1
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def get(self, key: str) -> Optional[str]:
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items: Dict[str, str]):
+        """Store several results at once, in both tiers."""
+        with self._lock:
+            for key, value in items.items():
+                self._remember(key, value)
+            if self._db is not None and items:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO results (key, value) VALUES (?, ?)",
+                    items.items(),
+                )
+                self._db.commit()
+
+    def put(self, key: str, value: str):
+        self.put_many({key: value})
+
+    def clear(self):
+        """Remove every entry, including those on disk, and reset the counters."""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM results")
+                self._db.commit()
+            self.hits = self.misses = self.disk_hits = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "memory_entries": len(self._memory),
+            }
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def __len__(self):
+        return len(self._memory)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def cached_apply(
+    cache: Optional[ResultCache],
+    stage: str,
+    inputs: Sequence[str],
+    compute: Callable[[List[str]], Optional[List[str]]],
+    java_args={},
+) -> Optional[List[str]]:
+    """
+    Map ``compute`` over ``inputs``, serving what it can from the cache.
+
+    Only the unique inputs missing from the cache are passed to ``compute``,
+    in a single call, and their results are stored.
+
+    :param cache: The cache, or ``None`` to compute everything.
+    :param stage: The name of the processing stage, part of the cache key.
+    :param inputs: The inputs, one per sentence.
+    :param compute: Returns one result per input it is given, or ``None`` if it
+        could not produce aligned results.
+    :param java_args: The runner arguments, part of the cache key.
+    :return: One result per input, or ``None`` if ``compute`` returned ``None``.
+    """
+    if cache is None:
+        return compute(list(inputs))
+
+    keys = [make_key(stage, text, java_args) for text in inputs]
+    found = cache.get_many(keys)
+    # Unique misses, in order of appearance
+    missing: Dict[str, str] = {}
+    for key, text in zip(keys, inputs):
+        if key not in found and key not in missing:
+            missing[key] = text
+
+    metrics.inc("icenlpy_cache_hits_total", len(inputs) - len(missing), stage=stage)
+    metrics.inc("icenlpy_cache_misses_total", len(missing), stage=stage)
+
+    if missing:
+        logger.debug(
+            "%s cache: %d of %d inputs served from the cache",
+            stage,
+            len(inputs) - len(missing),
+            len(inputs),
+        )
+        results = compute(list(missing.values()))
+        if results is None:
+            return None
+        computed = dict(zip(missing, results))
+        cache.put_many(computed)
+        found.update(computed)
+    return [found[key] for key in keys]
+
+
+_cache: Optional[ResultCache] = None
+_cache_lock = threading.Lock()
+_cache_enabled = os.environ.get("ICENLPY_CACHE", "0") == "1"
+
+
+def get_cache() -> Optional[ResultCache]:
+    """
+    Return the process-wide cache, creating it on first use.
+
+    Returns ``None`` unless caching has been turned on with ``configure_cache``
+    or the ``ICENLPY_CACHE=1`` environment variable.
+    """
+    global _cache
+    if not _cache_enabled:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache(
+                max_entries=int(os.environ.get("ICENLPY_CACHE_SIZE", DEFAULT_MAX_ENTRIES)),
+                path=os.environ.get("ICENLPY_CACHE_PATH"),
+            )
+        return _cache
+
+
+def configure_cache(
+    max_entries: int = DEFAULT_MAX_ENTRIES,
+    path=None,
+    enabled: bool = True,
+) -> Optional[ResultCache]:
+    """
+    Replace the process-wide cache.
+
+    :param max_entries: Maximum number of entries kept in memory.
+    :param path: Path to a sqlite database for the on-disk tier, shared between processes.
+    :param enabled: Set to ``False`` to turn caching off.
+    :return: The new cache, or ``None`` if caching is turned off.
+    """
+    global _cache, _cache_enabled
+    with _cache_lock:
+        if _cache is not None:
+            _cache.close()
+        _cache_enabled = enabled
+        _cache = ResultCache(max_entries=max_entries, path=path) if enabled else None
+        return _cache
+
+
+def resolve_cache(cache) -> Optional[ResultCache]:
+    """Resolve the ``cache`` argument of the public API: ``None`` is the default cache, ``False`` none."""
+    if cache is None:
+        return get_cache()
+    if cache is False:
+        return None
+    return cache
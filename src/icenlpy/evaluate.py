@@ -0,0 +1,355 @@
+"""
+Evaluation of IceParser output against gold standard brackets.
+
+Every sentence is reduced, in one pass over its tokens, to the words, the tags
+and the spans of its phrases and of its grammatical functions. A span is the
+label and the positions of the first and last word it covers. Scores are
+computed from these spans as in evalb:
+
+* labeled brackets: a phrase is correct if the gold sentence has a phrase with
+  the same label over the same words,
+* unlabeled brackets: as above, but the label is ignored,
+* functions: the same for the function markers of ``-f`` output (``{*SUBJ ... }``),
+* tagging accuracy: the share of gold words with the same tag in the parse.
+
+Spans are compared as multisets, so a unary chain of two NPs over the same
+words needs two NPs in the parse. Files are read line by line and scored in
+chunks, by a pool of processes for large files, so they are never held in
+memory whole.
+
+Usage from the command line:
+
+    icenlpy evaluate test.gold.sent.gold test.gold.sent.parsed
+"""
+
+import os
+import re
+import json
+import logging
+
+from collections import Counter
+from itertools import zip_longest
+from operator import eq
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from icenlpy.parallel import PathType, iter_chunks, read_sentences
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 2000
+
+# A "]" followed by a punctuation tag is a word, as in IceNLPySentence
+_PUNCTUATION_TAG = re.compile(r"p[a-z]")
+
+Span = Tuple[str, int, int]
+LinesSource = Union[PathType, Iterable[str]]
+
+
+class SentenceSpans(NamedTuple):
+    """The words, tags, phrase spans and function spans of a parsed sentence."""
+
+    words: List[str]
+    tags: List[str]
+    phrases: List[Span]
+    functions: List[Span]
+
+
+def extract_spans(line: str) -> SentenceSpans:
+    """
+    Read the words, tags and spans of one sentence of IceParser output.
+
+    :param line: A bracketed sentence, with or without function markers.
+    """
+    tokens = line.split()
+    last = len(tokens) - 1
+    words: List[str] = []
+    tags: List[str] = []
+    phrases: List[Span] = []
+    functions: List[Span] = []
+    # Labels and first word positions of the phrases and functions still open
+    open_phrases: List[Tuple[str, int]] = []
+    open_functions: List[Tuple[str, int]] = []
+    position = 0
+    expect_tag = False
+    for idx, token in enumerate(tokens):
+        if expect_tag:
+            tags.append(token)
+            expect_tag = False
+            continue
+        first = token[0]
+        if first == "[" and len(token) > 1:
+            open_phrases.append((token[1:], position))
+        elif (
+            token == "]"
+            and open_phrases
+            and not (idx < last and _PUNCTUATION_TAG.fullmatch(tokens[idx + 1]))
+        ):
+            label, start = open_phrases.pop()
+            phrases.append((label, start, position))
+        elif first == "{" and len(token) > 1:
+            open_functions.append((token[1:], position))
+        elif token == "}" and open_functions:
+            label, start = open_functions.pop()
+            functions.append((label, start, position))
+        else:
+            words.append(token)
+            position += 1
+            expect_tag = True
+    if expect_tag:
+        tags.append("")
+    # Unclosed phrases end with the sentence
+    for label, start in open_phrases:
+        phrases.append((label, start, position))
+    for label, start in open_functions:
+        functions.append((label, start, position))
+    return SentenceSpans(words, tags, phrases, functions)
+
+
+def _matched(gold: List, test: List) -> int:
+    gold_set, test_set = set(gold), set(test)
+    if len(gold_set) == len(gold) and len(test_set) == len(test):
+        return len(gold_set & test_set)
+    # Repeated spans, e.g. unary chains, are matched as many times as they occur in both
+    return sum((Counter(gold) & Counter(test)).values())
+
+
+class Counts:
+    """
+    Counts of matched, gold and parsed spans, and of correct tags.
+
+    Counts of different parts of a corpus are added up with ``update``.
+    Precision, recall and F1 are computed from the totals.
+    """
+
+    KINDS = ("labeled", "unlabeled", "functions")
+
+    __slots__ = (
+        "sentences",
+        "length_mismatches",
+        "matched",
+        "gold",
+        "test",
+        "correct_tags",
+        "gold_tags",
+    )
+
+    def __init__(self):
+        self.sentences = 0
+        # Sentences whose parse doesn't have the same words as the gold sentence
+        self.length_mismatches = 0
+        self.matched: Dict[str, int] = dict.fromkeys(self.KINDS, 0)
+        self.gold: Dict[str, int] = dict.fromkeys(self.KINDS, 0)
+        self.test: Dict[str, int] = dict.fromkeys(self.KINDS, 0)
+        self.correct_tags = 0
+        self.gold_tags = 0
+
+    def add_sentence(self, gold_line: str, test_line: str):
+        """Score one parsed sentence against its gold standard."""
+        self.sentences += 1
+        gold = extract_spans(gold_line)
+        if gold_line.split() == test_line.split():
+            # A parse identical to the gold standard, every span and tag is correct
+            for kind, spans in (
+                ("labeled", gold.phrases),
+                ("unlabeled", gold.phrases),
+                ("functions", gold.functions),
+            ):
+                self.matched[kind] += len(spans)
+                self.gold[kind] += len(spans)
+                self.test[kind] += len(spans)
+            self.correct_tags += len(gold.tags)
+            self.gold_tags += len(gold.tags)
+            return
+        test = extract_spans(test_line)
+
+        pairs = {
+            "labeled": (gold.phrases, test.phrases),
+            "unlabeled": (
+                [span[1:] for span in gold.phrases],
+                [span[1:] for span in test.phrases],
+            ),
+            "functions": (gold.functions, test.functions),
+        }
+        for kind, (gold_spans, test_spans) in pairs.items():
+            self.matched[kind] += _matched(gold_spans, test_spans)
+            self.gold[kind] += len(gold_spans)
+            self.test[kind] += len(test_spans)
+
+        self.gold_tags += len(gold.tags)
+        if gold.words == test.words:
+            self.correct_tags += sum(map(eq, gold.tags, test.tags))
+        else:
+            self.length_mismatches += 1
+            self.correct_tags += sum(
+                1
+                for gold_word, gold_tag, test_word, test_tag in zip(
+                    gold.words, gold.tags, test.words, test.tags
+                )
+                if gold_tag == test_tag and gold_word == test_word
+            )
+
+    def update(self, other: "Counts"):
+        """Add the counts of another part of the corpus."""
+        self.sentences += other.sentences
+        self.length_mismatches += other.length_mismatches
+        for kind in self.KINDS:
+            self.matched[kind] += other.matched[kind]
+            self.gold[kind] += other.gold[kind]
+            self.test[kind] += other.test[kind]
+        self.correct_tags += other.correct_tags
+        self.gold_tags += other.gold_tags
+
+    def precision(self, kind: str = "labeled") -> float:
+        return self.matched[kind] / self.test[kind] if self.test[kind] else 0.0
+
+    def recall(self, kind: str = "labeled") -> float:
+        return self.matched[kind] / self.gold[kind] if self.gold[kind] else 0.0
+
+    def f1(self, kind: str = "labeled") -> float:
+        precision, recall = self.precision(kind), self.recall(kind)
+        return 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+
+    @property
+    def tag_accuracy(self) -> float:
+        return self.correct_tags / self.gold_tags if self.gold_tags else 0.0
+
+    def as_dict(self) -> dict:
+        """The counts and scores, as a JSON serializable dictionary."""
+        results = {
+            "sentences": self.sentences,
+            "length_mismatches": self.length_mismatches,
+            "tag_accuracy": self.tag_accuracy,
+        }
+        for kind in self.KINDS:
+            results[kind] = {
+                "precision": self.precision(kind),
+                "recall": self.recall(kind),
+                "f1": self.f1(kind),
+                "matched": self.matched[kind],
+                "gold": self.gold[kind],
+                "test": self.test[kind],
+            }
+        return results
+
+    def __repr__(self):
+        return (
+            f"Counts(sentences={self.sentences}, labeled_f1={self.f1('labeled'):.4f}, "
+            f"tag_accuracy={self.tag_accuracy:.4f})"
+        )
+
+
+def _score_chunk(pairs: List[Tuple[str, str]]) -> Counts:
+    counts = Counts()
+    for gold_line, test_line in pairs:
+        counts.add_sentence(gold_line, test_line)
+    return counts
+
+
+def _lines_from(source: LinesSource) -> Iterator[str]:
+    if isinstance(source, (str, os.PathLike)):
+        return read_sentences([source])
+    return iter(source)
+
+
+def _sentence_pairs(gold: LinesSource, parsed: LinesSource) -> Iterator[Tuple[str, str]]:
+    """Pair the gold and parsed sentences, skipping lines that are empty in both."""
+    missing = object()
+    for number, (gold_line, test_line) in enumerate(
+        zip_longest(_lines_from(gold), _lines_from(parsed), fillvalue=missing), start=1
+    ):
+        if gold_line is missing or test_line is missing:
+            raise ValueError(f"The gold and parsed sentences differ in number at line {number}")
+        if gold_line.strip() or test_line.strip():
+            yield gold_line, test_line
+
+
+def evaluate(
+    gold: LinesSource,
+    parsed: LinesSource,
+    workers: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Counts:
+    """
+    Score parsed sentences against the gold standard.
+
+    :param gold: The gold standard, a file with one bracketed sentence per
+        line or an iterable of such lines.
+    :param parsed: The parser's output for the same sentences, in the same form.
+    :param workers: The number of processes. Defaults to the number of CPUs.
+        With 1, or if the input fits in one chunk, everything is scored in
+        this process.
+    :param chunk_size: The number of sentences scored at a time by a process.
+    :return: The counts, from which precision, recall, F1 and tagging
+        accuracy are read.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = iter_chunks(_sentence_pairs(gold, parsed), chunk_size)
+    total = Counts()
+    first = next(chunks, None)
+    if first is None:
+        return total
+    if workers == 1 or len(first) < chunk_size:
+        total.update(_score_chunk(first))
+        for chunk in chunks:
+            total.update(_score_chunk(chunk))
+        return total
+
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # At most two chunks per process are read ahead
+        pending = {executor.submit(_score_chunk, first)}
+        for chunk in chunks:
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    total.update(future.result())
+            pending.add(executor.submit(_score_chunk, chunk))
+        for future in pending:
+            total.update(future.result())
+    logger.debug(f"Evaluated {total.sentences} sentences with {workers} processes")
+    return total
+
+
+def format_report(counts: Counts) -> str:
+    """A table of the scores, as printed by ``icenlpy evaluate``."""
+    lines = [
+        f"Sentences: {counts.sentences} ({counts.length_mismatches} with different words)",
+        f"{'':<12}{'precision':>10}{'recall':>10}{'f1':>10}",
+    ]
+    for kind in Counts.KINDS:
+        if counts.gold[kind] or counts.test[kind]:
+            lines.append(
+                f"{kind:<12}{counts.precision(kind):>10.2%}"
+                f"{counts.recall(kind):>10.2%}{counts.f1(kind):>10.2%}"
+            )
+    lines.append(f"Tagging accuracy: {counts.tag_accuracy:.2%}")
+    return "\n".join(lines)
+
+
+def add_arguments(parser):
+    """Add the evaluation options to an argparse parser."""
+    parser.add_argument(
+        "gold", type=str, help="The gold standard, one bracketed sentence per line."
+    )
+    parser.add_argument("parsed", type=str, help="The parser output for the same sentences.")
+    parser.add_argument(
+        "--workers", type=int, default=None, help="Number of processes. Defaults to the CPU count."
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help="Number of sentences scored at a time by a process.",
+    )
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+
+
+def main(args) -> int:
+    """Run the evaluation for parsed command line arguments and return an exit status."""
+    counts = evaluate(args.gold, args.parsed, workers=args.workers, chunk_size=args.chunk_size)
+    if args.json:
+        print(json.dumps(counts.as_dict(), indent=2))
+    else:
+        print(format_report(counts))
+    return 0
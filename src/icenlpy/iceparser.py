@@ -1,29 +1,21 @@
+import queue
 import logging
-import logging.config
+import itertools
 
-from typing import List
+from typing import Iterable, Iterator, List, Sequence, Tuple, Union
 
 import icenlpy.utils as utils
+import icenlpy.icetagger as icetagger
+import icenlpy.metrics as metrics
+import icenlpy.cache as caching
 
-from icenlpy import JAR_PATH
+from icenlpy import get_jar_path
 from icenlpy.tree import IceNLPySentence
 
-# logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
-ch = logging.StreamHandler()
-ch.setLevel(logging.INFO)
 
-# create formatter
-formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-
-# add formatter to ch
-ch.setFormatter(formatter)
-
-# add ch to logger
-logger.addHandler(ch)
-
-logger.debug(f"jar_path: {JAR_PATH}")
+# A sentence as text, as a sequence of tokens, or as a sequence of (word, tag) pairs
+Sentence = Union[str, Sequence[str], Sequence[Tuple[str, str]]]
 
 
 def run_iceparser(jar_path, input_text, legacy_tagger=False, java_args={}):
@@ -37,33 +29,370 @@ def run_iceparser(jar_path, input_text, legacy_tagger=False, java_args={}):
     """
 
     if legacy_tagger:
-        tagged = utils.call_icenlp_jar(jar_path, "tagger", input_text, java_args={})
-        logger.debug(f"IceTagger output: {tagged}")
+        # IceTagger's output goes straight into IceParser, see icenlpy.pipeline
+        _, parsed_output = utils.pipe_icenlp_jars(
+            jar_path, [("tagger", {}), ("parser", java_args)], input_text
+        )
     else:
-        tagged = input_text
-        logger.debug(f"Tagged input: {tagged}")
+        logger.debug("Tagged input: %s", utils.Preview(input_text))
+        parsed_output = utils.call_icenlp_jar(jar_path, "parser", input_text, java_args)
 
-    parsed_output = utils.call_icenlp_jar(jar_path, "parser", tagged, java_args)
-
-    logger.debug(f"IceParser output: {parsed_output}")
+    logger.debug("IceParser output: %s", utils.Preview(parsed_output))
 
     return parsed_output
 
 
-def parse_text(input_text: List[str], legacy_tagger=False, args={}):
+def _as_sentences(input_text: Iterable[Sentence]) -> list:
+    """Return the sentences as a list, with the sequences among them as lists."""
+    return [sentence if isinstance(sentence, str) else list(sentence) for sentence in input_text]
+
+
+def _is_tagged(sentence) -> bool:
+    """Whether a sentence given as a list is made of ``(word, tag)`` pairs."""
+    return bool(sentence) and not isinstance(sentence[0], str)
+
+
+def _needs_token_tagging(sentences: list, legacy_tagger: bool) -> bool:
+    """Whether the sentences are tokens to be tagged one token per line, see ``_tag_tokens``."""
+    if not legacy_tagger or not icetagger._is_tokenized(sentences):
+        return False
+    if any(not isinstance(sentence, str) and _is_tagged(sentence) for sentence in sentences):
+        raise ValueError("The sentences are already tagged, leave out legacy_tagger")
+    return True
+
+
+def _tag_tokens(sentences: list, cache=None) -> List[str]:
     """
-    Parses the given text using IceParser and returns the output in the specified format.
+    Tag sentences of tokens with IceTagger, one token per line (``lf=1``).
 
-    :param input_text: The text to parse.
-    :param output_format: The desired output format ('json' or 'xml').
-    :return: Parsed output from IceParser.
+    IceTagger does not tokenize them again, so each sentence keeps its tokens,
+    which with ``lf=2`` a token containing a space would not.
     """
+    return icetagger._tag_tokens(sentences, True, {}, cache, "jvm")
 
-    parsed_sents = [
-        run_iceparser(JAR_PATH, sent, legacy_tagger=legacy_tagger, java_args=args)
-        for sent in input_text
-    ]
+
+def _sentence_line(sentence: Sentence, legacy_tagger=False) -> str:
+    """
+    Return a sentence as a line of runner input.
+
+    ``(word, tag)`` pairs become a line of IceParser's input. Sentences of
+    tokens are tagged by ``_tag_tokens`` before they get here.
+    """
+    if isinstance(sentence, str):
+        return sentence
+    items = list(sentence)
+    if not items:
+        return ""
+    if _is_tagged(items):
+        if legacy_tagger:
+            raise ValueError("The sentences are already tagged, leave out legacy_tagger")
+        return " ".join(f"{word} {tag}" for word, tag in items)
+    raise ValueError("Sentences of tokens without tags need legacy_tagger=True")
+
+
+def _split_output(output: str) -> List[str]:
+    """Split runner output into non-empty lines, one per sentence."""
+    return [line for line in output.split("\n") if line.strip()]
+
+
+def _parse_batch_steps(sentences: List[str], legacy_tagger=False, args={}):
+    """
+    Parse a batch of sentences with a single tagger call and a single parser call.
+
+    Empty sentences are never sent to IceNLP and come back as empty strings. If
+    the output can not be aligned with the input line by line (e.g. because the
+    tagger split a sentence in two, or the parser writes one phrase per line),
+    the batch is parsed again one sentence at a time.
+
+    This is a generator so that it can be driven both synchronously and from
+    asyncio: it yields a ``(target, input_text, java_args)`` tuple for every JVM
+    call it needs and expects the runner output to be sent back in.
+
+    :return: The raw IceParser output for each input sentence.
+    """
+    # One sentence per line, so stray newlines within a sentence are flattened
+    lines = [" ".join(sent.split()) for sent in sentences]
+    positions = [idx for idx, line in enumerate(lines) if line]
+    results = [""] * len(lines)
+    if not positions:
+        return results
+
+    def parse_one_by_one():
+        # The same calls as run_iceparser, one sentence at a time
+        for idx in positions:
+            tagged = lines[idx]
+            if legacy_tagger:
+                tagged = yield ("tagger", tagged, {})
+            results[idx] = yield ("parser", tagged, args)
+        return results
+
+    # With -l the parser writes one phrase per line, which can not be aligned
+    if args.get("l"):
+        return (yield from parse_one_by_one())
+
+    batch = "\n".join(lines[idx] for idx in positions) + "\n"
+    if legacy_tagger:
+        tagged = yield ("tagger", batch, {"lf": 2})
+        logger.debug("IceTagger output: %s", utils.Preview(tagged))
+        tagged_lines = _split_output(tagged)
+        if len(tagged_lines) != len(positions):
+            logger.debug("IceTagger output is not aligned with the input, parsing one by one")
+            return (yield from parse_one_by_one())
+        batch = "\n".join(tagged_lines) + "\n"
+
+    parsed_output = yield ("parser", batch, args)
+    logger.debug("IceParser output: %s", utils.Preview(parsed_output))
+
+    parsed_lines = _split_output(parsed_output)
+    if len(parsed_lines) != len(positions):
+        logger.debug("IceParser output is not aligned with the input, parsing one by one")
+        return (yield from parse_one_by_one())
+
+    for idx, parsed in zip(positions, parsed_lines):
+        results[idx] = parsed
+    return results
+
+
+def _parse_batch(sentences: List[str], legacy_tagger=False, args={}) -> List[str]:
+    """Run ``_parse_batch_steps`` with blocking JVM calls."""
+    steps = _parse_batch_steps(sentences, legacy_tagger=legacy_tagger, args=args)
+    try:
+        request = next(steps)
+        while True:
+            target, text, java_args = request
+            request = steps.send(
+                utils.call_icenlp_jar(get_jar_path(), target, text, java_args=java_args)
+            )
+    except StopIteration as stop:
+        return stop.value
+
+
+async def _aparse_batch(
+    sentences: List[str], legacy_tagger=False, args={}, timeout=None
+) -> List[str]:
+    """Run ``_parse_batch_steps`` with asyncio subprocesses."""
+    steps = _parse_batch_steps(sentences, legacy_tagger=legacy_tagger, args=args)
+    try:
+        request = next(steps)
+        while True:
+            target, text, java_args = request
+            output = await utils.acall_icenlp_jar(
+                get_jar_path(), target, text, java_args=java_args, timeout=timeout
+            )
+            request = steps.send(output)
+    except StopIteration as stop:
+        return stop.value
+
+
+def _check_parsed(input_text: List[str], parsed_sents: List[str]):
     if [text.strip for text in input_text] == [sent.strip() for sent in parsed_sents]:
         raise Exception("IceParser failed to parse the input text.")
-    parsed_sents = [IceNLPySentence(sent) for sent in parsed_sents]
+
+
+def parse_text(
+    input_text: Sequence[Sentence], legacy_tagger=False, args={}, batch_size=1000, cache=None
+):
+    """
+    Parses the given text using IceParser and returns the output in the specified format.
+
+    The sentences are sent to IceNLP in batches, one JVM call per stage and batch,
+    and exactly one sentence is returned for each input sentence. With a result
+    cache, sentences seen before are not sent to IceNLP at all, and a sentence
+    repeated within the input is sent only once.
+
+    Sentences can also be given as sequences of ``(word, tag)`` pairs, e.g. from
+    a gold standard, or with ``legacy_tagger`` as sequences of tokens, e.g. from
+    ``tokenizer.tokenize``. Their tokens are passed on as they are, never
+    tokenized again, so the trees line up with the input tokens: sentences of
+    tokens are sent to IceTagger one token per line (``lf=1``).
+
+    :param input_text: The text to parse. The standard format is a list of strings, where each string is a sentence.
+        Alternatively, sequences of ``(word, tag)`` pairs or of tokens, one per sentence.
+    :param legacy_tagger: Tag the input with IceTagger before parsing.
+    :param args: Arguments passed on to IceParser.
+    :param batch_size: Maximum number of sentences sent to IceNLP at a time.
+    :param cache: A ``ResultCache``, ``False`` for no caching, or ``None`` for the
+        process-wide cache (see ``icenlpy.cache.configure_cache``).
+    :return: A list of IceNLPySentence objects, aligned with the input.
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be a positive integer")
+
+    input_text = _as_sentences(input_text)
+    tag_tokens = _needs_token_tagging(input_text, legacy_tagger)
+
+    def parse_all(sentences: List[str]) -> List[str]:
+        parsed = []
+        for start in range(0, len(sentences), batch_size):
+            parsed.extend(
+                _parse_batch(
+                    sentences[start : start + batch_size],
+                    legacy_tagger=legacy_tagger and not tag_tokens,
+                    args=args,
+                )
+            )
+        return parsed
+
+    with metrics.span("parse_text", legacy_tagger=legacy_tagger) as span:
+        if tag_tokens:
+            input_text = _tag_tokens(input_text, cache)
+        else:
+            input_text = [_sentence_line(sentence, legacy_tagger) for sentence in input_text]
+        # The same normalization as in _parse_batch_steps, so that the keys match
+        normalized = [" ".join(sent.split()) for sent in input_text]
+        parsed_sents = caching.cached_apply(
+            caching.resolve_cache(cache),
+            "tagger+parser" if legacy_tagger and not tag_tokens else "parser",
+            normalized,
+            parse_all,
+            java_args=args,
+        )
+        _check_parsed(input_text, parsed_sents)
+        with metrics.span("tree"):
+            parsed_sents = [IceNLPySentence(sent) for sent in parsed_sents]
+        if span.recording:
+            span.set(
+                sentences=len(parsed_sents),
+                tokens=sum(sent.count(" ") + 1 for sent in normalized if sent),
+            )
     return parsed_sents
+
+
+async def aparse_text(
+    input_text: Sequence[Sentence], legacy_tagger=False, args={}, batch_size=1000, timeout=None
+):
+    """
+    Asynchronous version of ``parse_text``.
+
+    Batches are parsed concurrently, within the limit set by
+    ``utils.set_async_concurrency``. If the call is cancelled or a JVM call
+    takes longer than ``timeout`` seconds, the running JVMs are killed.
+
+    :param timeout: Maximum number of seconds for each JVM call.
+    :return: A list of IceNLPySentence objects, aligned with the input.
+    """
+    import asyncio
+
+    if batch_size < 1:
+        raise ValueError("batch_size must be a positive integer")
+
+    input_text = _as_sentences(input_text)
+    if _needs_token_tagging(input_text, legacy_tagger):
+        # One token per line, as in parse_text
+        input_text = await icetagger._atag_tokens(input_text, {}, timeout=timeout)
+        legacy_tagger = False
+    input_text = [_sentence_line(sentence, legacy_tagger) for sentence in input_text]
+    tasks = [
+        asyncio.ensure_future(
+            _aparse_batch(
+                input_text[start : start + batch_size],
+                legacy_tagger=legacy_tagger,
+                args=args,
+                timeout=timeout,
+            )
+        )
+        for start in range(0, len(input_text), batch_size)
+    ]
+    try:
+        batches = await asyncio.gather(*tasks)
+    except BaseException:
+        # Don't leave the other batches running when one of them fails
+        for task in tasks:
+            task.cancel()
+        raise
+    parsed_sents = [sent for batch in batches for sent in batch]
+    _check_parsed(input_text, parsed_sents)
+    return [IceNLPySentence(sent) for sent in parsed_sents]
+
+
+def iter_parse(
+    input_text: Iterable[Sentence], legacy_tagger=False, args={}
+) -> Iterator[IceNLPySentence]:
+    """
+    Parses a stream of sentences, yielding each one as soon as IceParser emits it.
+
+    The input is fed to the JVM from a writer thread and, with ``legacy_tagger``,
+    the tagger output is piped straight into the parser, so memory use stays flat
+    regardless of corpus size. Exactly one sentence is yielded per input item,
+    empty items included.
+
+    :param input_text: An iterable of strings, e.g. an open file, one sentence per item,
+        or of sentences in the other formats of ``parse_text``.
+    :param legacy_tagger: Tag the input with IceTagger before parsing.
+    :param args: Arguments passed on to IceParser.
+    :return: A generator of IceNLPySentence objects, aligned with the input.
+    """
+    if args.get("l"):
+        raise ValueError("iter_parse requires one sentence per line, -l is not supported")
+
+    # Sentences of tokens are tagged one token per line, as in parse_text
+    sentences = iter(input_text)
+    first = next(sentences, None)
+    if first is None:
+        return
+    if not isinstance(first, str):
+        first = list(first)
+    sentences = itertools.chain([first], sentences)
+    tag_tokens = _needs_token_tagging([first], legacy_tagger)
+
+    # Empty sentences are not sent to IceNLP, this queue tells the reader which is which.
+    # It ends with None, or with the error that stopped the input
+    sent_markers = queue.Queue()
+
+    def non_empty_lines():
+        end = None
+        try:
+            for sent in sentences:
+                if not isinstance(sent, str):
+                    sent = list(sent)
+                # Every sentence in the format of the first, as parse_text checks them all
+                if _needs_token_tagging([sent], legacy_tagger) != tag_tokens:
+                    raise TypeError("Give either strings or token sequences, not both")
+                if tag_tokens:
+                    block = icetagger._token_block(sent)
+                    sent_markers.put(bool(block))
+                    if block:
+                        # An empty line ends the sentence
+                        yield block + "\n\n"
+                    continue
+                line = " ".join(_sentence_line(sent, legacy_tagger).split())
+                sent_markers.put(bool(line))
+                if line:
+                    yield line
+        except GeneratorExit:
+            raise
+        except BaseException as e:
+            # Raised in the writer thread, the reader raises it again
+            end = e
+            raise
+        finally:
+            sent_markers.put(end)
+
+    lines = non_empty_lines()
+    if legacy_tagger:
+        tagger_args = icetagger._token_args({}) if tag_tokens else {"lf": 2}
+        tagged = utils.stream_icenlp_jar(get_jar_path(), "tagger", lines, java_args=tagger_args)
+        lines = (line for line in tagged if line.strip())
+
+    parser_output = utils.stream_icenlp_jar(get_jar_path(), "parser", lines, java_args=args)
+    parsed = (line for line in parser_output if line.strip())
+
+    try:
+        while True:
+            marker = sent_markers.get()
+            if marker is None:
+                break
+            if isinstance(marker, BaseException):
+                raise marker
+            if marker:
+                try:
+                    yield IceNLPySentence(next(parsed))
+                except StopIteration:
+                    raise Exception("IceParser output ended before the input did.")
+            else:
+                yield IceNLPySentence("")
+        # Drain the pipeline so that runner errors are raised
+        for line in parsed:
+            logger.warning("Unexpected IceParser output: %s", utils.Preview(line))
+    finally:
+        parser_output.close()
@@ -1,64 +1,326 @@
-import subprocess
-import shlex
-import tomlkit
-import json
-import os
+import re
 import logging
 
-from icenlpy import JAR_PATH
-
-from typing import List
+from typing import Iterable, Iterator, List, Sequence, Union
 
 import icenlpy.utils as utils
+import icenlpy.bridge as bridge
+import icenlpy.metrics as metrics
+import icenlpy.cache as caching
+import icenlpy.pytokenizer as pytokenizer
 
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
-# ice_nlp_path = utils.get_ice_nlp_path()
-# jar_path = ice_nlp_path / "dist/IceNLPCore.jar"
+from icenlpy import get_jar_path
 
-# abs_path_to_icenlp_jar = os.path.join(ice_nlp_path, jar_path)
-
-logger.debug(f"jar_path: {JAR_PATH}")
+logger = logging.getLogger(__name__)
 
 
 def run_icetagger(jar_path, input_text, legacy_tagger=False, java_args={}):
     """
-    Runs the IceParser Java application with the given input text and JAR path.
+    Runs the IceTagger Java application with the given input text and JAR path.
 
     :param jar_path: Path to the IceNLPCore.jar file.
-    :param input_text: Text to parse.
-    :param output_format: The desired output format ('json' or 'xml').
-    :return: The output from IceParser.
+    :param input_text: Text to tag.
+    :param java_args: Arguments passed on to IceTagger.
+    :return: The output from IceTagger.
     """
-    logger.debug(f"Running IceTagger with input: {input_text}")
+    logger.debug("Running IceTagger with input: %s", utils.Preview(input_text))
 
     tagged = utils.call_icenlp_jar(jar_path, "tagger", input_text, java_args=java_args)
-    logger.debug(f"IceTagger output: {tagged}")
+    logger.debug("IceTagger output: %s", utils.Preview(tagged))
 
     return tagged
 
 
 def tag_text(
-    input_text: List[str],
+    input_text: Union[List[str], Sequence[Sequence[str]]],
     legacy_tagger=True,
     args={"lf": 3},
     return_tags_only=False,
+    cache=None,
+    backend="jvm",
 ):
     """
-    Parses the given text using IceParser and returns the output in the specified format.
+    Tags the given text with IceTagger.
+
+    With ``backend="hmm"`` the text is tagged in-process by a trigram HMM using
+    the TriTagger model shipped with IceNLP (see ``icenlpy.tritagger``), which
+    avoids starting a JVM and suits short requests. It is less accurate than
+    IceTagger and requires NumPy.
+
+    With a result cache, each sentence is looked up on its own and only the
+    unique sentences missing from the cache are sent to IceTagger. If IceTagger
+    does not return exactly one sentence per input sentence (e.g. when a string
+    holds two sentences), the whole input is tagged again without the cache.
 
-    :param input_text: The text to parse. The standard format is a list of strings, where each string is a sentence.
-    :param output_format: The desired output format ('json' or 'xml').
-    :return: Parsed output from IceParser.
+    Sentences that are already tokenized, e.g. by ``tokenizer.tokenize`` or in a
+    gold standard, can be given as sequences of tokens. They are sent to
+    IceTagger one token per line (``lf=1``), so they are not tokenized again,
+    and exactly one result is returned per sentence, with the same tokens.
+
+    :param input_text: The text to tag. The standard format is a list of strings, where each string is a sentence.
+        Alternatively, a sequence of token sequences, one per sentence.
+    :param args: Arguments passed on to IceTagger.
+    :param return_tags_only: Return a tuple of tags for each sentence instead of the tagged string.
+    :param cache: A ``ResultCache``, ``False`` for no caching, or ``None`` for the
+        process-wide cache (see ``icenlpy.cache.configure_cache``).
+    :param backend: ``"jvm"`` runs IceTagger, in the embedded JVM of
+        ``icenlpy.bridge`` if JPype is installed, ``"hmm"`` the in-process HMM tagger.
+    :return: A list of tagged sentences, each a line of ``word tag`` pairs, or tuples of tags
+        with ``return_tags_only``.
     """
+    input_text = list(input_text)
+    with metrics.span("tag_text", backend=backend) as span:
+        tagged = _tag_text(input_text, legacy_tagger, args, return_tags_only, cache, backend)
+        if span.recording:
+            span.set(sentences=len(input_text), tokens=_count_tokens(tagged, return_tags_only))
+    return tagged
+
+
+def _count_tokens(tagged, return_tags_only: bool) -> int:
+    if return_tags_only:
+        return sum(map(len, tagged))
+    # Every token is a word and its tag
+    return sum(len(sentence.split()) for sentence in tagged) // 2
+
+
+def _tag_text(input_text, legacy_tagger, args, return_tags_only, cache, backend):
+    if _is_tokenized(input_text):
+        tagged_lines = _tag_tokens(input_text, legacy_tagger, args, cache, backend)
+        if return_tags_only:
+            return tuple(tuple(line.split()[1::2]) for line in tagged_lines)
+        return [line + "\n" for line in tagged_lines]
+    if backend == "hmm":
+        return _format_tagged(_tag_hmm(input_text, args), return_tags_only)
+    if backend != "jvm":
+        raise ValueError(f"Unknown tagger backend: {backend}")
+
+    result_cache = caching.resolve_cache(cache)
+    if result_cache is not None:
+        tagged_lines = _tag_cached(input_text, legacy_tagger, args, result_cache)
+        if tagged_lines is not None:
+            return _format_tagged("\n".join(tagged_lines), return_tags_only)
+        logger.debug("IceTagger output is not aligned with the input, tagging without the cache")
+
     text = "\n".join(input_text)
+    if result_cache is None:
+        # In the embedded JVM the tokens and tags are read directly, not from text
+        sentences = bridge.attempt("tagger", args, "tag", text)
+        if sentences is not None:
+            if return_tags_only:
+                return tuple(tuple(tag for _, tag in sentence) for sentence in sentences)
+            return [
+                " ".join(f"{word} {tag}" for word, tag in sentence) + "\n" for sentence in sentences
+            ]
+
     tagged_text = run_icetagger(
-        JAR_PATH, text, legacy_tagger=legacy_tagger, java_args=args
+        get_jar_path(), text, legacy_tagger=legacy_tagger, java_args=args
     )
+    return _format_tagged(tagged_text, return_tags_only)
+
+
+async def atag_text(
+    input_text: List[str],
+    args={"lf": 3},
+    return_tags_only=False,
+    timeout=None,
+):
+    """
+    Asynchronous version of ``tag_text``.
+
+    The JVM is run with ``asyncio.create_subprocess_exec``, so the event loop is
+    not blocked while it works. If the call is cancelled or takes longer than
+    ``timeout`` seconds, the JVM is killed.
+
+    :param timeout: Maximum number of seconds to wait for IceTagger.
+    """
+    text = "\n".join(input_text)
+    tagged_text = await utils.acall_icenlp_jar(
+        get_jar_path(), "tagger", text, java_args=args, timeout=timeout
+    )
+    return _format_tagged(tagged_text, return_tags_only)
+
+
+def _is_tokenized(input_text: list) -> bool:
+    """Whether the sentences are sequences of tokens rather than strings."""
+    return any(not isinstance(sentence, str) for sentence in input_text)
+
+
+def _token_args(args: dict) -> dict:
+    """Return the tagger arguments for tokenized sentences, one token per line (``lf=1``)."""
+    # The output is read one sentence per line, as with the other line formats
+    if str(args.get("of", 2)) != "2":
+        raise ValueError("Tokenized sentences are tagged one sentence per line, of must be 2")
+    return {**args, "lf": 1, "of": 2}
+
+
+def _token_block(tokens: Sequence[str]) -> str:
+    """Return a tokenized sentence as the tagger's ``lf=1`` input, one token per line."""
+    if isinstance(tokens, str):
+        raise TypeError("Give either strings or token sequences, not both")
+    return "\n".join(tokens)
+
+
+def _tag_tokens(sentences, legacy_tagger, args, cache, backend) -> List[str]:
+    """
+    Tag tokenized sentences, fed to the tagger one token per line.
+
+    :return: One line of ``word tag`` pairs per sentence, empty for an empty sentence.
+    """
+    if backend not in ("jvm", "hmm"):
+        raise ValueError(f"Unknown tagger backend: {backend}")
+    args = _token_args(args)
+
+    blocks = [_token_block(tokens) for tokens in sentences]
+    positions = [idx for idx, block in enumerate(blocks) if block]
+    tagged_lines = [""] * len(blocks)
+    if not positions:
+        return tagged_lines
+
+    def tag_all(missing: List[str]) -> List[str]:
+        text = "\n\n".join(missing) + "\n"
+        if backend == "hmm":
+            return _tag_hmm([text], args).split("\n")
+        tagged_lines = _split_lines(
+            run_icetagger(get_jar_path(), text, legacy_tagger=legacy_tagger, java_args=args)
+        )
+        if len(tagged_lines) == len(missing):
+            return tagged_lines
+        logger.debug("IceTagger output is not aligned with the input, tagging one by one")
+        return [
+            " ".join(
+                run_icetagger(
+                    get_jar_path(), block + "\n", legacy_tagger=legacy_tagger, java_args=args
+                ).split()
+            )
+            for block in missing
+        ]
+
+    # Like text, only IceTagger's output is cached
+    result_cache = caching.resolve_cache(cache) if backend == "jvm" else None
+    tagged = caching.cached_apply(
+        result_cache, "tagger", [blocks[idx] for idx in positions], tag_all, java_args=args
+    )
+    for idx, line in zip(positions, tagged):
+        tagged_lines[idx] = line
+    return tagged_lines
+
+
+async def _atag_tokens(sentences, args, timeout=None) -> List[str]:
+    """
+    Asynchronous version of ``_tag_tokens`` with IceTagger, without the cache.
+
+    IceTagger is run with ``utils.acall_icenlp_jar``, so it is killed if the call
+    is cancelled or takes longer than ``timeout`` seconds.
+    """
+    import asyncio
+
+    args = _token_args(args)
+    blocks = [_token_block(tokens) for tokens in sentences]
+    missing = [block for block in blocks if block]
+    if not missing:
+        return [""] * len(blocks)
+
+    def tag(text: str):
+        return utils.acall_icenlp_jar(
+            get_jar_path(), "tagger", text, java_args=args, timeout=timeout
+        )
+
+    tagged_lines = _split_lines(await tag("\n\n".join(missing) + "\n"))
+    if len(tagged_lines) != len(missing):
+        logger.debug("IceTagger output is not aligned with the input, tagging one by one")
+        outputs = await asyncio.gather(*(tag(block + "\n") for block in missing))
+        tagged_lines = [" ".join(output.split()) for output in outputs]
+    tagged = iter(tagged_lines)
+    return [next(tagged) if block else "" for block in blocks]
+
+
+def _split_lines(output: str) -> List[str]:
+    return [line for line in output.split("\n") if line.strip()]
+
+
+def _tag_hmm(input_text: List[str], args) -> str:
+    """Tag with the HMM tagger, returning the same output IceTagger would for ``args``."""
+    # Imported here, as it imports numpy
+    import icenlpy.tritagger as tritagger
+
+    unsupported = set(args) - {"lf", "of"}
+    if unsupported:
+        raise ValueError(
+            f"Arguments not supported by the hmm tagger: {', '.join(sorted(unsupported))}"
+        )
+    text = "\n".join(input_text)
+    line_format = int(args.get("lf", 3))
+    if line_format == 1:
+        # One token per line, with an empty line between sentences
+        sentences = [block.split() for block in re.split(r"\n\s*\n", text)]
+    elif line_format == 2:
+        sentences = [line.split() for line in text.split("\n")]
+    else:
+        sentences = pytokenizer.get_tokenizer().tokenize(text)
+
+    tagger = tritagger.get_tagger()
+    tagged = []
+    for tokens in sentences:
+        if not tokens:
+            continue
+        tags = [
+            tritagger.to_icetagger_tag(token, tag)
+            for token, tag in zip(tokens, tagger.tag(tokens))
+        ]
+        tagged.append(list(zip(tokens, tags)))
+
+    if int(args.get("of", 2)) == 1:
+        return "\n\n".join(
+            "\n".join(f"{token} {tag}" for token, tag in sentence) for sentence in tagged
+        )
+    return "\n".join(
+        " ".join(f"{token} {tag}" for token, tag in sentence) for sentence in tagged
+    )
+
+
+def _tag_cached(input_text: List[str], legacy_tagger, args, result_cache):
+    """Tag the sentences through the cache, or return ``None`` if the output is not aligned."""
+    sentences = [line for line in (" ".join(sent.split()) for sent in input_text) if line]
+
+    def tag_all(missing: List[str]):
+        tagged = run_icetagger(
+            get_jar_path(), "\n".join(missing), legacy_tagger=legacy_tagger, java_args=args
+        )
+        tagged_lines = [line for line in tagged.split("\n") if line.strip()]
+        return tagged_lines if len(tagged_lines) == len(missing) else None
+
+    return caching.cached_apply(result_cache, "tagger", sentences, tag_all, java_args=args)
+
+
+def _format_tagged(tagged_text: str, return_tags_only=False):
     tagged_text = tagged_text.strip().split("\n")
     tagged_text = [sentence + "\n" for sentence in tagged_text]
     if return_tags_only:
         return tuple([tuple(sentence.split()[1::2]) for sentence in tagged_text])
     else:
         return tagged_text
+
+
+def iter_tag(
+    input_text: Iterable[str],
+    args={"lf": 3},
+    return_tags_only=False,
+) -> Iterator:
+    """
+    Tags a stream of sentences with IceTagger, yielding results as they are produced.
+
+    Unlike ``tag_text`` the input is never joined into one string and the output
+    is never buffered as a whole, so memory use stays flat for corpora of any size.
+
+    :param input_text: An iterable of strings, e.g. an open file, one sentence per item.
+    :param args: Arguments passed on to IceTagger.
+    :param return_tags_only: Yield a tuple of tags for each sentence instead of the tagged string.
+    :return: A generator of tagged sentences, in the same format as ``tag_text``.
+    """
+    for sentence in utils.stream_icenlp_jar(get_jar_path(), "tagger", input_text, java_args=args):
+        if not sentence.strip():
+            continue
+        if return_tags_only:
+            yield tuple(sentence.split()[1::2])
+        else:
+            yield sentence + "\n"
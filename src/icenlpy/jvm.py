@@ -0,0 +1,293 @@
+"""
+Launch options for the JVMs running IceNLP.
+
+Every runner is started with the options of a launch profile, see
+``PROFILES``: ``"default"`` leaves everything to the JVM, ``"latency"`` is
+tuned for short calls where JVM startup dominates, and ``"throughput"`` for
+long inputs and warm workers. Pick one with ``configure_jvm`` or the
+``ICENLPY_JVM_PROFILE`` environment variable, override its heap limit with
+``ICENLPY_JVM_HEAP`` and add options of your own with ``ICENLPY_JVM_OPTIONS``.
+
+On top of the profile, the runners use an Application Class-Data Sharing
+(AppCDS) archive if one has been generated with ``icenlpy warmup`` (or
+``warmup``). The archive holds the classes a runner loaded while tagging and
+parsing a sample text, already parsed and verified, so a new JVM maps them
+instead of loading them from IceNLPCore.jar. Archives are stored in the cache
+directory, one per runner, and are named after the jar and the java
+executable, so an upgrade of either makes the launcher ignore the old ones
+until ``warmup`` is run again. ``ICENLPY_CDS=0`` turns them off.
+"""
+
+import os
+import sys
+import shlex
+import hashlib
+import logging
+import subprocess
+
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+from icenlpy import get_jar_path
+
+logger = logging.getLogger(__name__)
+
+
+class JVMProfile(NamedTuple):
+    """JVM options for a kind of workload. ``heap`` is the maximum heap size, e.g. ``"1g"``."""
+
+    name: str
+    options: Tuple[str, ...] = ()
+    heap: Optional[str] = None
+    description: str = ""
+
+
+PROFILES: Dict[str, JVMProfile] = {
+    "default": JVMProfile("default", description="The JVM's own defaults."),
+    "latency": JVMProfile(
+        "latency",
+        # Only the quick C1 compiler and a single-threaded GC: less work at startup
+        ("-XX:TieredStopAtLevel=1", "-XX:+UseSerialGC"),
+        heap="1g",
+        description="Short calls, where JVM startup dominates.",
+    ),
+    "throughput": JVMProfile(
+        "throughput",
+        # A heap sized up front is not grown during a long run
+        ("-XX:+UseParallelGC", "-Xms1g"),
+        heap="4g",
+        description="Long inputs and warm workers, where compiled code pays off.",
+    ),
+}
+
+# Sample input for the runs that record the classes of an AppCDS archive,
+# with the runner arguments the archive is generated with
+WARMUP_TEXT = "Hundurinn gelti á köttinn. Ég á stóran hund, a.m.k. 10 kíló.\n"
+WARMUP_RUNS = {
+    "tokenizer": ({"of": 2}, WARMUP_TEXT),
+    "tagger": ({"lf": 3}, WARMUP_TEXT),
+    "parser": ({"f": True}, "Hundurinn nkeng gelti sfg3eþ á ao köttinn nkeog . .\n"),
+}
+
+# Looked up on first use, so that a bad name fails a call rather than the import
+_profile: Union[str, JVMProfile] = os.environ.get("ICENLPY_JVM_PROFILE", "default")
+_heap: Optional[str] = os.environ.get("ICENLPY_JVM_HEAP") or None
+_extra_options: Tuple[str, ...] = tuple(shlex.split(os.environ.get("ICENLPY_JVM_OPTIONS", "")))
+_cds_enabled = os.environ.get("ICENLPY_CDS", "1") != "0"
+
+
+def _lookup_profile(profile: Union[str, JVMProfile]) -> JVMProfile:
+    if isinstance(profile, JVMProfile):
+        return profile
+    try:
+        return PROFILES[profile]
+    except KeyError:
+        raise ValueError(
+            f"Unknown JVM profile {profile!r}, use one of {', '.join(PROFILES)}"
+        ) from None
+
+
+def get_profile() -> JVMProfile:
+    """Return the launch profile in use, with the heap limit set by ``configure_jvm``."""
+    profile = _lookup_profile(_profile)
+    if _heap is not None:
+        return profile._replace(heap=_heap)
+    return profile
+
+
+def configure_jvm(
+    profile: Union[str, JVMProfile, None] = None,
+    heap: Optional[str] = None,
+    options: Optional[Iterable[str]] = None,
+    cds: Optional[bool] = None,
+) -> JVMProfile:
+    """
+    Change how the runners are launched. Settings that are not given are kept.
+
+    Runners that are already running, e.g. idle workers of the pool, keep
+    their options; calls with the new options are served by new workers.
+
+    :param profile: The name of one of ``PROFILES``, or a ``JVMProfile``.
+    :param heap: Maximum heap size, e.g. ``"2g"``, overriding the profile's.
+    :param options: Extra JVM options added after those of the profile.
+    :param cds: Set to ``False`` to not use AppCDS archives.
+    :return: The profile in use.
+    """
+    global _profile, _heap, _extra_options, _cds_enabled
+    if profile is not None:
+        _profile = _lookup_profile(profile)
+    if heap is not None:
+        _heap = heap
+    if options is not None:
+        _extra_options = tuple(options)
+    if cds is not None:
+        _cds_enabled = cds
+    return get_profile()
+
+
+def profile_options() -> List[str]:
+    """Return the JVM options of the current profile, its heap limit and the extra options."""
+    profile = get_profile()
+    options = list(profile.options)
+    if profile.heap:
+        options.append(f"-Xmx{profile.heap}")
+    options.extend(_extra_options)
+    return options
+
+
+def archive_dir() -> Path:
+    """Return the directory AppCDS archives are stored in, ``cds`` in the cache directory."""
+    # Imported here, as the launcher only needs it once an archive is looked up
+    from icenlpy.lexicon import cache_dir
+
+    return cache_dir() / "cds"
+
+
+def archive_path(jar_path: str, target: str, java: str) -> Path:
+    """
+    Return where the AppCDS archive of a runner is stored, named after the jar and java.
+
+    :param jar_path: Path to the IceNLPCore.jar file.
+    :param target: One of the runners, e.g. ``"tagger"``.
+    :param java: The java executable the runner is started with.
+    """
+    jar = Path(jar_path).resolve()
+    jar_stat = jar.stat()
+    java_path = os.path.realpath(java)
+    try:
+        java_mtime = os.stat(java_path).st_mtime_ns
+    except OSError:
+        java_mtime = 0
+    key = f"{jar}:{jar_stat.st_size}:{jar_stat.st_mtime_ns}:{java_path}:{java_mtime}"
+    fingerprint = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+    return archive_dir() / f"{target}-{fingerprint}.jsa"
+
+
+def cds_options(archive: Path) -> List[str]:
+    """Return the JVM options that start a runner with an AppCDS archive."""
+    return [
+        f"-XX:SharedArchiveFile={archive}",
+        # The JVM ignores an archive it can't use, with a warning that would
+        # otherwise be written to stdout, among the runner's output
+        "-Xlog:disable",
+        "-Xlog:all=warning:stderr",
+    ]
+
+
+def launch_options(jar_path: str, target: str, java: str) -> List[str]:
+    """
+    Return the JVM options a runner is started with.
+
+    These are the options of the current profile, followed by those that use
+    the runner's AppCDS archive if it has been generated.
+    """
+    options = profile_options()
+    if _cds_enabled and jar_path is not None:
+        try:
+            archive = archive_path(jar_path, target, java)
+        except OSError:
+            # No jar to fingerprint, starting the runner fails with a clear error
+            return options
+        if archive.exists():
+            options.extend(cds_options(archive))
+    return options
+
+
+def generate_archive(jar_path: str, target: str, force=False, timeout: float = 600) -> Path:
+    """
+    Generate the AppCDS archive of a runner by running it over ``WARMUP_RUNS``.
+
+    Needs Java 13 or later, which can dump the classes a program loaded into
+    an archive when it exits (``-XX:ArchiveClassesAtExit``).
+
+    :param jar_path: Path to the IceNLPCore.jar file.
+    :param target: One of the keys of ``WARMUP_RUNS``.
+    :param force: Generate the archive even if it exists.
+    :param timeout: Seconds the run may take.
+    :return: The path of the archive.
+    :raises RuntimeError: If the JVM fails or does not write an archive.
+    """
+    # utils builds its commands with this module
+    import icenlpy.utils as utils
+
+    java = utils.find_java() or "java"
+    path = archive_path(jar_path, target, java)
+    if path.exists() and not force:
+        logger.debug("Using the existing AppCDS archive %s", path)
+        return path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+
+    java_args, input_text = WARMUP_RUNS[target]
+    command = utils.build_command(
+        jar_path,
+        target,
+        java_args,
+        jvm_options=profile_options() + [f"-XX:ArchiveClassesAtExit={tmp_path}"],
+    )
+    logger.debug("Generating an AppCDS archive with: %s", utils.format_command(command))
+    try:
+        result = subprocess.run(
+            command,
+            input=input_text,
+            capture_output=True,
+            text=True,
+            encoding="utf-8",
+            timeout=timeout,
+        )
+        if result.returncode != 0 or not tmp_path.exists():
+            raise RuntimeError(
+                f"Could not generate an AppCDS archive for {target} "
+                f"(Java 13 or later is needed): {result.stderr.strip()}"
+            )
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    logger.info("Generated the AppCDS archive %s", path)
+    return path
+
+
+def warmup(targets: Optional[Iterable[str]] = None, jar_path=None, force=False) -> Dict[str, Path]:
+    """
+    Generate the AppCDS archives of the runners, which are then used automatically.
+
+    :param targets: The runners to generate archives for, all of ``WARMUP_RUNS`` by default.
+    :param jar_path: Path to the IceNLPCore.jar file, the bundled one by default.
+    :param force: Regenerate archives that exist.
+    :return: The archive of each runner.
+    """
+    jar_path = jar_path or get_jar_path()
+    if jar_path is None:
+        raise FileNotFoundError("IceNLPCore.jar was not found")
+    return {
+        target: generate_archive(jar_path, target, force=force)
+        for target in (targets or WARMUP_RUNS)
+    }
+
+
+def add_arguments(parser):
+    """Add the warmup options to an argparse parser."""
+    parser.add_argument(
+        "--targets",
+        nargs="+",
+        choices=list(WARMUP_RUNS),
+        default=None,
+        help="Runners to generate archives for. Defaults to all of them.",
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="Regenerate archives that already exist."
+    )
+
+
+def main(args) -> int:
+    """Generate the archives for parsed command line arguments."""
+    try:
+        archives = warmup(args.targets, force=args.force)
+    except (OSError, RuntimeError, subprocess.TimeoutExpired) as e:
+        print(f"icenlpy warmup: {e}", file=sys.stderr)
+        return 1
+    for target, path in archives.items():
+        print(f"{target}: {path}")
+    return 0
@@ -0,0 +1,364 @@
+"""
+Compiled, memory-mapped versions of IceTagger's dictionaries.
+
+The dictionaries in ``resources/IceNLP/dict/icetagger`` are text files with one
+``word=tags`` line per entry, the tags separated by ``_``. Each is compiled
+once into a binary file in the cache directory (``$ICENLPY_CACHE_DIR``, or
+``icenlpy`` in ``$XDG_CACHE_HOME``, by default ``~/.cache/icenlpy``) and then
+opened with ``mmap``. Opening a compiled dictionary does no parsing at all,
+and since the file is mapped read-only, every process using it shares the
+same pages.
+
+The binary format is a header, two offset tables and two blobs::
+
+    magic (8 bytes) | format version (uint32) | number of entries n (uint32)
+    key offsets (n + 1 x uint32) | value offsets (n + 1 x uint32)
+    keys (UTF-8, sorted by bytes) | values (UTF-8)
+
+All integers are little-endian. The keys are found by binary search.
+"""
+
+import os
+import sys
+import mmap
+import bisect
+import struct
+import hashlib
+import logging
+import tempfile
+import threading
+
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DICT_DIR = Path(__file__).parent / "resources/IceNLP/dict/icetagger"
+
+# The dictionaries that can be opened by name with ``get_lexicon``
+DICTIONARIES = {
+    "otb": "otb.dict",
+    "base": "baseDict.dict",
+    "endings": "otb.endings.dict",
+    "endings_proper": "otb.endingsProper.dict",
+    "base_endings": "baseEndings.dict",
+    "prefixes": "prefixes.dict",
+}
+
+MAGIC = b"ICELEX\x00\x00"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<8sII")
+# Separator of the tags of an entry
+TAG_SEPARATOR = "_"
+
+
+def cache_dir() -> Path:
+    """Return the directory compiled dictionaries are stored in."""
+    path = os.environ.get("ICENLPY_CACHE_DIR")
+    if path:
+        return Path(path).expanduser()
+    xdg = os.environ.get("XDG_CACHE_HOME")
+    base = Path(xdg).expanduser() if xdg else Path.home() / ".cache"
+    return base / "icenlpy"
+
+
+def read_dict(path) -> Iterator[Tuple[str, str]]:
+    """
+    Read the entries of a dictionary in IceNLP's text format.
+
+    Empty lines and lines starting with ``#`` are skipped. A key can itself
+    contain ``=``, so each line is split on its last ``=``. Lines without one,
+    as in ``prefixes.dict``, are keys with an empty value.
+
+    :param path: Path to the dictionary.
+    :return: A generator of ``(key, value)`` pairs.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            key, separator, value = line.rpartition("=")
+            if not separator:
+                key, value = value, ""
+            if key:
+                yield key, value
+
+
+def _offsets(parts: List[bytes]) -> array:
+    offsets = array("I", [0])
+    total = 0
+    for part in parts:
+        total += len(part)
+        offsets.append(total)
+    if sys.byteorder != "little":
+        offsets.byteswap()
+    return offsets
+
+
+def compile_entries(entries: Iterable[Tuple[str, str]]) -> bytes:
+    """
+    Compile dictionary entries into the binary format.
+
+    If a key occurs more than once, its last value is kept.
+
+    :param entries: ``(key, value)`` pairs.
+    :return: The compiled dictionary.
+    """
+    table: Dict[bytes, bytes] = {}
+    for key, value in entries:
+        table[key.encode("utf-8")] = value.encode("utf-8")
+    keys = sorted(table)
+    values = [table[key] for key in keys]
+    return b"".join(
+        [
+            _HEADER.pack(MAGIC, FORMAT_VERSION, len(keys)),
+            _offsets(keys).tobytes(),
+            _offsets(values).tobytes(),
+            *keys,
+            *values,
+        ]
+    )
+
+
+def compile_dict(source, target) -> Path:
+    """
+    Compile a dictionary file into the binary format.
+
+    The compiled file is written to a temporary file first and then moved into
+    place, so concurrent processes never see a partly written dictionary.
+
+    :param source: Path to a dictionary in IceNLP's text format.
+    :param target: Path of the compiled file.
+    :return: The path of the compiled file.
+    """
+    target = Path(target)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    data = compile_entries(read_dict(source))
+    fd, tmp_path = tempfile.mkstemp(dir=target.parent, prefix=target.name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+        # Readable by everyone, like any other cache file
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, target)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    logger.debug(f"Compiled {source} to {target}")
+    return target
+
+
+def compiled_path(source, directory=None) -> Path:
+    """Return where the compiled version of ``source`` is stored, named after its size and mtime."""
+    source = Path(source).resolve()
+    stat = source.stat()
+    fingerprint = hashlib.sha1(
+        f"{FORMAT_VERSION}:{source}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8")
+    ).hexdigest()[:16]
+    return Path(directory or cache_dir()) / f"{source.stem}-{fingerprint}.lex"
+
+
+class _Keys:
+    """The sorted keys of a compiled dictionary as a sequence of bytes, for ``bisect``."""
+
+    __slots__ = ("_offsets", "_blob")
+
+    def __init__(self, offsets, blob):
+        self._offsets = offsets
+        self._blob = blob
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, idx: int) -> bytes:
+        return bytes(self._blob[self._offsets[idx] : self._offsets[idx + 1]])
+
+
+class Lexicon:
+    """
+    A read-only dictionary of words and their tags.
+
+    :param data: A compiled dictionary, as returned by ``compile_entries``, or
+        any buffer holding one such as an ``mmap``.
+    """
+
+    def __init__(self, data):
+        self._data = data
+        magic, version, count = _HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("Not a compiled dictionary of a supported format version")
+        self._view = memoryview(data)
+        start = _HEADER.size
+        size = (count + 1) * 4
+        key_offsets = self._offset_table(start, size)
+        value_offsets = self._offset_table(start + size, size)
+        keys_start = start + 2 * size
+        values_start = keys_start + key_offsets[count]
+        self._value_offsets = value_offsets
+        self._values = self._view[values_start : values_start + value_offsets[count]]
+        self._keys = _Keys(key_offsets, self._view[keys_start:values_start])
+
+    def _offset_table(self, start: int, size: int):
+        table = self._view[start : start + size]
+        if sys.byteorder == "little":
+            return table.cast("I")
+        offsets = array("I")
+        offsets.frombytes(table)
+        offsets.byteswap()
+        return offsets
+
+    @classmethod
+    def open(cls, path) -> "Lexicon":
+        """Map a compiled dictionary file into memory."""
+        with open(path, "rb") as file:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(data)
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[Tuple[str, str]]) -> "Lexicon":
+        """Build a dictionary in memory, without a file."""
+        return cls(compile_entries(entries))
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _index(self, key: bytes, lo: int = 0) -> int:
+        """Return the index of ``key``, or -1 if it is missing."""
+        idx = bisect.bisect_left(self._keys, key, lo)
+        if idx < len(self._keys) and self._keys[idx] == key:
+            return idx
+        return -1
+
+    def _value(self, idx: int) -> str:
+        return str(self._values[self._value_offsets[idx] : self._value_offsets[idx + 1]], "utf-8")
+
+    def __contains__(self, word: str) -> bool:
+        return self._index(word.encode("utf-8")) >= 0
+
+    def get(self, word: str) -> Optional[str]:
+        """Return the raw value of ``word``, e.g. ``"nkeo_nken"``, or ``None`` if it is missing."""
+        idx = self._index(word.encode("utf-8"))
+        return self._value(idx) if idx >= 0 else None
+
+    def lookup(self, word: str) -> Optional[List[str]]:
+        """
+        Look up the tags of a word.
+
+        :param word: The word, which is matched exactly, including its case.
+        :return: The tags of the word, or ``None`` if it is missing.
+        """
+        value = self.get(word)
+        if value is None:
+            return None
+        return value.split(TAG_SEPARATOR) if value else []
+
+    def lookup_many(self, words: Iterable[str]) -> List[Optional[List[str]]]:
+        """
+        Look up the tags of several words at once.
+
+        The words are searched for in sorted order, so each search starts
+        where the previous one ended.
+
+        :param words: The words.
+        :return: The tags of each word, as ``lookup`` returns them.
+        """
+        words = list(words)
+        found: Dict[str, Optional[List[str]]] = {}
+        lo = 0
+        for key, word in sorted({word.encode("utf-8"): word for word in words}.items()):
+            idx = bisect.bisect_left(self._keys, key, lo)
+            if idx < len(self._keys) and self._keys[idx] == key:
+                value = self._value(idx)
+                found[word] = value.split(TAG_SEPARATOR) if value else []
+            else:
+                found[word] = None
+            lo = idx
+        return [found[word] for word in words]
+
+    def lookup_ending(self, word: str, min_length: int = 1) -> Optional[Tuple[str, List[str]]]:
+        """
+        Find the longest ending of a word that is in the dictionary.
+
+        This is how the endings dictionaries (``otb.endings.dict`` and the
+        like) are used to guess the tags of unknown words.
+
+        :param word: The word.
+        :param min_length: The shortest ending that is considered.
+        :return: A tuple of the ending and its tags, or ``None`` if no ending matches.
+        """
+        for start in range(0, len(word) - min_length + 1):
+            ending = word[start:]
+            tags = self.lookup(ending)
+            if tags is not None:
+                return ending, tags
+        return None
+
+    def keys(self) -> Iterator[str]:
+        for idx in range(len(self._keys)):
+            yield self._keys[idx].decode("utf-8")
+
+    def items(self) -> Iterator[Tuple[str, str]]:
+        for idx in range(len(self._keys)):
+            yield self._keys[idx].decode("utf-8"), self._value(idx)
+
+    def __iter__(self):
+        return self.keys()
+
+    def close(self):
+        """Release the memory map. The dictionary can't be used afterwards."""
+        self._keys = _Keys(array("I", [0]), b"")
+        self._values = self._value_offsets = None
+        self._view.release()
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_lexicons: Dict[str, Lexicon] = {}
+_lexicons_lock = threading.Lock()
+
+
+def load_lexicon(source, directory=None) -> Lexicon:
+    """
+    Open the compiled version of a dictionary, compiling it first if needed.
+
+    If the cache directory is not writable, the dictionary is compiled in
+    memory instead.
+
+    :param source: Path to a dictionary in IceNLP's text format.
+    :param directory: Where compiled dictionaries are stored, ``cache_dir()`` by default.
+    :return: The dictionary.
+    """
+    target = compiled_path(source, directory)
+    if not target.exists():
+        try:
+            compile_dict(source, target)
+        except OSError as e:
+            logger.warning(f"Could not store the compiled dictionary in {target.parent}: {e}")
+            return Lexicon.from_entries(read_dict(source))
+    return Lexicon.open(target)
+
+
+def get_lexicon(name: str = "otb") -> Lexicon:
+    """
+    Return one of IceTagger's dictionaries, opening it only once per process.
+
+    :param name: One of the keys of ``DICTIONARIES``.
+    :return: The dictionary.
+    """
+    if name not in DICTIONARIES:
+        raise ValueError(
+            f"Unknown dictionary: {name}. Choose one of {', '.join(DICTIONARIES)}"
+        )
+    with _lexicons_lock:
+        lexicon = _lexicons.get(name)
+        if lexicon is None:
+            lexicon = _lexicons[name] = load_lexicon(DICT_DIR / DICTIONARIES[name])
+        return lexicon
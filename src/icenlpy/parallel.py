@@ -0,0 +1,246 @@
+import os
+import sys
+import logging
+
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from itertools import islice
+from time import perf_counter
+from typing import (
+    Callable,
+    ContextManager,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    TextIO,
+    TypeVar,
+    Union,
+)
+
+from icenlpy.tree import IceNLPySentence
+
+logger = logging.getLogger(__name__)
+
+PathType = Union[str, "os.PathLike[str]"]
+CorpusSource = Union[PathType, Iterable[PathType], Iterable[str]]
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class ShardResult(NamedTuple):
+    """The parsed sentences of one shard, along with how long it took."""
+
+    index: int
+    sentences: List[IceNLPySentence]
+    elapsed: float
+    attempts: int
+
+
+def open_text(path: PathType, mode: str = "r") -> ContextManager[TextIO]:
+    """
+    Open a UTF-8 text file for reading (``"r"``) or writing (``"w"``).
+
+    Files ending in ``.gz`` are decompressed or compressed on the fly, and
+    ``"-"`` stands for stdin or stdout, which are left open afterwards.
+    """
+    if str(path) == "-":
+        return nullcontext(sys.stdin if mode == "r" else sys.stdout)
+    if str(path).endswith(".gz"):
+        import gzip
+
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def read_sentences(paths: Iterable[PathType]) -> Iterator[str]:
+    """Yield the lines of the given files one by one, without their newline. See ``open_text``."""
+    for path in paths:
+        with open_text(path) as file:
+            for line in file:
+                yield line.rstrip("\n")
+
+
+def _sentences_from(source: CorpusSource) -> Iterator[str]:
+    """
+    Resolve the input of ``parse_corpus`` to an iterator of sentences.
+
+    A single ``str`` or path-like object is read as a file, as is a list or tuple
+    of path-like objects. Any other iterable is taken to yield the sentences
+    themselves, so a list of strings is a list of sentences, not of file names.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        return read_sentences([source])
+    if isinstance(source, (list, tuple)) and source and all(
+        isinstance(item, os.PathLike) for item in source
+    ):
+        return read_sentences(source)
+    return iter(source)
+
+
+def iter_chunks(sentences: Iterable[str], chunk_size: int) -> Iterator[List[str]]:
+    """Split a stream of sentences into lists of at most ``chunk_size`` items."""
+    iterator = iter(sentences)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _parse_shard(
+    index: int, shard: List[str], legacy_tagger: bool, args: dict, retries: int
+) -> ShardResult:
+    # Imported here, so that the helpers of this module can be used without it
+    import icenlpy.iceparser as iceparser
+
+    attempts = 0
+    while True:
+        attempts += 1
+        start = perf_counter()
+        try:
+            sentences = iceparser.parse_text(
+                shard, legacy_tagger=legacy_tagger, args=args, batch_size=len(shard)
+            )
+        except Exception as e:
+            if attempts > retries:
+                raise
+            logger.warning(f"Shard {index} failed on attempt {attempts}, retrying: {e}")
+            continue
+        return ShardResult(index, sentences, perf_counter() - start, attempts)
+
+
+def parse_shards(
+    paths_or_iterable: CorpusSource,
+    workers: Optional[int] = None,
+    chunk_size: int = 500,
+    legacy_tagger=False,
+    args={},
+    ordered=True,
+    retries=2,
+) -> Iterator[ShardResult]:
+    """
+    Parse a corpus in shards across concurrent tagger/parser JVMs.
+
+    Each shard of ``chunk_size`` sentences goes through one ``iceparser.parse_text``
+    call, i.e. its own JVM processes, so up to ``workers`` JVMs run at the same
+    time. Only ``2 * workers`` shards are in flight or waiting to be yielded at
+    once, which keeps memory bounded for corpora of any size.
+
+    :param paths_or_iterable: A file path, a list of ``Path`` objects, or an iterable of sentences.
+    :param workers: Number of shards parsed concurrently. Defaults to the CPU count.
+    :param chunk_size: Number of sentences per shard.
+    :param legacy_tagger: Tag the input with IceTagger before parsing.
+    :param args: Arguments passed on to IceParser.
+    :param ordered: Yield shards in input order. If ``False`` they are yielded as they finish.
+    :param retries: How often a failed shard is retried before the error is raised.
+    :return: A generator of ShardResult objects.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be a positive integer")
+    shards = iter_chunks(_sentences_from(paths_or_iterable), chunk_size)
+    return map_bounded(
+        lambda index, shard: _parse_shard(index, shard, legacy_tagger, args, retries),
+        shards,
+        workers=workers,
+        ordered=ordered,
+    )
+
+
+def map_bounded(
+    function: Callable[[int, T], R],
+    items: Iterable[T],
+    workers: Optional[int] = None,
+    ordered=True,
+) -> Iterator[R]:
+    """
+    Call ``function(index, item)`` for every item on a pool of threads and yield the results.
+
+    Items are taken from ``items`` only as threads become free, with at most
+    ``2 * workers`` calls in flight or finished but waiting for an earlier one
+    to be yielded, so a stream of any length is processed in bounded memory. Closing the generator early cancels the calls not yet started.
+
+    :param function: Called with the position of each item and the item.
+    :param items: The items, e.g. chunks of sentences.
+    :param workers: Number of threads. Defaults to the CPU count.
+    :param ordered: Yield results in input order. If ``False`` they are yielded as they finish.
+    :return: A generator of results.
+    """
+    workers = workers or os.cpu_count() or 1
+    indexed = enumerate(items)
+    max_in_flight = 2 * workers
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="icenlpy") as pool:
+        in_flight: Dict[Future, int] = {}
+        finished: Dict[int, R] = {}
+        next_index = 0
+        exhausted = False
+
+        def submit_more():
+            nonlocal exhausted
+            # Results held back for an earlier one count too, or a slow item lets them pile up
+            while not exhausted and len(in_flight) + len(finished) < max_in_flight:
+                try:
+                    index, item = next(indexed)
+                except StopIteration:
+                    exhausted = True
+                    return
+                in_flight[pool.submit(function, index, item)] = index
+
+        try:
+            submit_more()
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = in_flight.pop(future)
+                    result = future.result()
+                    if ordered:
+                        finished[index] = result
+                    else:
+                        yield result
+                while next_index in finished:
+                    yield finished.pop(next_index)
+                    next_index += 1
+                submit_more()
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+
+def parse_corpus(
+    paths_or_iterable: CorpusSource,
+    workers: Optional[int] = None,
+    chunk_size: int = 500,
+    legacy_tagger=False,
+    args={},
+    ordered=True,
+    retries=2,
+    on_shard: Optional[Callable[[ShardResult], None]] = None,
+) -> Iterator[IceNLPySentence]:
+    """
+    Parse a corpus across several concurrent JVMs and yield the sentences.
+
+    See ``parse_shards`` for the parameters. ``on_shard`` is called with each
+    ShardResult before its sentences are yielded, which is the place to collect
+    per-shard timings.
+
+    Example:
+
+    >>> for sent in parallel.parse_corpus(Path("corpus.txt"), workers=8):
+    ...     print(sent)
+    """
+    for result in parse_shards(
+        paths_or_iterable,
+        workers=workers,
+        chunk_size=chunk_size,
+        legacy_tagger=legacy_tagger,
+        args=args,
+        ordered=ordered,
+        retries=retries,
+    ):
+        if on_shard is not None:
+            on_shard(result)
+        yield from result.sentences
@@ -0,0 +1,100 @@
+"""
+Tokenizing, tagging and parsing of raw text in a single call.
+
+IceTagger tokenizes its input itself when it is given running text (``lf=3``),
+so the whole analysis takes two runners: IceTagger and IceParser. They are
+started together with IceTagger's stdout connected straight to IceParser's
+stdin, as in ``icetagger.sh | iceparser.sh``. Python writes the raw text once
+and reads back only the parse, one sentence per line. No separate tokenizer
+process is started and the tagged text never passes through Python.
+
+With ``layers=True`` the tagged text is also kept. It is then relayed from
+IceTagger to IceParser line by line by a Python thread, and each sentence is
+returned with its tokens, tags and brackets.
+"""
+
+import logging
+
+from typing import Iterable, List, NamedTuple, Union
+
+import icenlpy.utils as utils
+
+from icenlpy import get_jar_path
+from icenlpy.tree import IceNLPySentence
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TAGGER_ARGS = {"lf": 3}
+
+
+class AnalyzedSentence(NamedTuple):
+    """A sentence with every layer of the analysis."""
+
+    tokens: List[str]
+    tags: List[str]
+    brackets: str
+    tree: IceNLPySentence
+
+
+def _split_output(output: str) -> List[str]:
+    return [line for line in output.split("\n") if line.strip()]
+
+
+def _check_args(tagger_args, parser_args):
+    if int(tagger_args.get("of", 2)) != 2:
+        raise ValueError("IceParser needs one sentence per line, the tagger's -of must be 2")
+    if parser_args.get("l"):
+        raise ValueError("The pipeline needs one sentence per line, -l is not supported")
+
+
+def analyze(
+    input_text: Union[str, Iterable[str]],
+    layers=False,
+    tagger_args=DEFAULT_TAGGER_ARGS,
+    parser_args={},
+) -> Union[List[IceNLPySentence], List[AnalyzedSentence]]:
+    """
+    Tokenize, tag and parse raw text with IceTagger piped into IceParser.
+
+    :param input_text: The text, either a string or an iterable of strings (e.g. paragraphs).
+    :param layers: Return every layer of the analysis rather than the parse only.
+    :param tagger_args: Arguments passed on to IceTagger. With the default
+        ``lf=3`` IceTagger also tokenizes and splits the text into sentences.
+    :param parser_args: Arguments passed on to IceParser, e.g. ``{"f": True}``
+        for grammatical functions.
+    :return: A list of IceNLPySentence objects, or of AnalyzedSentence objects
+        with ``layers=True``, one per sentence.
+    """
+    _check_args(tagger_args, parser_args)
+    text = input_text if isinstance(input_text, str) else "\n".join(input_text)
+    if not text.strip():
+        return []
+
+    tagged, parsed = utils.pipe_icenlp_jars(
+        get_jar_path(),
+        [("tagger", tagger_args), ("parser", parser_args)],
+        text if text.endswith("\n") else text + "\n",
+        keep_intermediate=layers,
+    )
+    parsed_lines = _split_output(parsed)
+    if not layers:
+        return [IceNLPySentence(line) for line in parsed_lines]
+
+    tagged_lines = _split_output(tagged)
+    if len(tagged_lines) != len(parsed_lines):
+        raise Exception(
+            f"IceParser returned {len(parsed_lines)} sentences "
+            f"for {len(tagged_lines)} tagged sentences."
+        )
+    sentences = []
+    for tagged_line, parsed_line in zip(tagged_lines, parsed_lines):
+        words = tagged_line.split()
+        sentences.append(
+            AnalyzedSentence(
+                tokens=words[::2],
+                tags=words[1::2],
+                brackets=parsed_line.strip(),
+                tree=IceNLPySentence(parsed_line),
+            )
+        )
+    return sentences
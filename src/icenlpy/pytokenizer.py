@@ -0,0 +1,188 @@
+"""
+An in-process tokenizer following the conventions of IceNLP's Java tokenizer.
+
+The abbreviation and multiword expression lexicon used by the Java tokenizer is
+shipped in ``resources/IceNLP/dict/tokenizer/lexicon.txt``. It is loaded once
+per process and the text is split into tokens and sentences with compiled
+regular expressions, so no JVM is started.
+"""
+
+import re
+import logging
+
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+LEXICON_PATH = Path(__file__).parent / "resources/IceNLP/dict/tokenizer/lexicon.txt"
+
+# Lexicon entry types
+ABBREV = "ABBREV"  # An abbreviation, which can end a sentence
+ABBREV2 = "ABBREV2"  # An abbreviation which never ends a sentence
+MWE = "MWE"  # A multiword expression, its words are joined with "_"
+
+# A paragraph break always ends a sentence
+_PARAGRAPHS = re.compile(r"\n\s*\n")
+# Abbreviations that are not in the lexicon, e.g. "u.þ.b." or "s.s."
+_LETTER_ABBREVIATION = re.compile(r"(?:[^\W\d_]\.){2,}")
+# Punctuation that can precede or follow an abbreviation in a chunk
+_LEADING_PUNCTUATION = re.compile(r"^[(\[{\"'„“‚‘«»]+")
+_TRAILING_PUNCTUATION = re.compile(r"[)\]}\"'“”‘’«»,;:!?]+$")
+
+_TOKEN = re.compile(
+    r"""
+    (?:https?://|www\.)[^\s<>"]+?(?=[.,;:!?)\]"'»“”]*$)     # URLs
+    | [\w.+-]+@[\w-]+(?:\.[\w-]+)+                          # E-mail addresses
+    | \w+(?:[.-]\w+)*\.(?:is|com|net|org|edu|eu)\b          # Domain names, e.g. mbl.is
+    | [-+]?\d+(?:[.,:/]\d+)*%?(?!\w)                        # 1,7  2.000  10:30  9%
+    | \w+(?:[-'’]\w+)*(?:-$)?                               # Words, incl. "barna- og ..."
+    | \.{2,} | …                                            # Ellipses
+    | [!?]+                                                 # "?!" and the like
+    | \S                                                    # Any other symbol on its own
+    """,
+    re.VERBOSE,
+)
+# In non-strict mode, only sentence punctuation is split off at the end of a chunk
+_NON_STRICT_TOKEN = re.compile(
+    r"""
+    \S+?(?=[.,;:!?"'»“”…]*$)
+    | \.{2,} | …
+    | [!?]+
+    | \S
+    """,
+    re.VERBOSE,
+)
+
+# Tokens which end a sentence, e.g. ".", "?!" or "..."
+_SENTENCE_END = re.compile(r"[.?!…]+")
+# Closing punctuation which still belongs to the sentence that just ended
+_CLOSING = {'"', "'", "”", "“", "’", "«", ")", "]", "}"}
+
+
+def load_lexicon(path=LEXICON_PATH) -> Dict[str, str]:
+    """
+    Read the tokenizer lexicon.
+
+    :param path: Path to a lexicon file with one ``entry=TYPE`` line per entry.
+    :return: A dictionary mapping each entry to its type.
+    """
+    lexicon: Dict[str, str] = {}
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            # The first line is a bracketed comment
+            if not line or line.startswith("["):
+                continue
+            entry, _, entry_type = line.rpartition("=")
+            if entry:
+                lexicon[entry] = entry_type
+    return lexicon
+
+
+class Tokenizer:
+    """
+    Splits raw text into sentences of tokens without starting a JVM.
+
+    :param lexicon: A lexicon as returned by ``load_lexicon``. The bundled lexicon is used by default.
+    :param strict: Split punctuation inside words, e.g. ``delta$(4)`` into ``delta $ ( 4 )``,
+        as the Java tokenizer does unless it is given ``-ns``.
+    """
+
+    def __init__(self, lexicon: Optional[Dict[str, str]] = None, strict: bool = True):
+        if lexicon is None:
+            lexicon = load_lexicon()
+        self.strict = strict
+        self.abbreviations: Set[str] = {
+            entry for entry, entry_type in lexicon.items() if entry_type == ABBREV
+        }
+        self.non_final_abbreviations: Set[str] = {
+            entry for entry, entry_type in lexicon.items() if entry_type == ABBREV2
+        }
+        self._token = _TOKEN if strict else _NON_STRICT_TOKEN
+
+    def _abbreviation(self, word: str) -> Optional[str]:
+        """Return the lexicon type of ``word`` if it is an abbreviation."""
+        for candidate in (word, word[:1].lower() + word[1:]):
+            if candidate in self.non_final_abbreviations:
+                return ABBREV2
+            if candidate in self.abbreviations:
+                return ABBREV
+        if _LETTER_ABBREVIATION.fullmatch(word):
+            return ABBREV
+        return None
+
+    def _split_chunk(self, chunk: str, tokens: List[str], kinds: List[Optional[str]]):
+        """Split a whitespace-delimited chunk into tokens."""
+        if "." in chunk:
+            leading = _LEADING_PUNCTUATION.search(chunk)
+            start = leading.end() if leading else 0
+            trailing = _TRAILING_PUNCTUATION.search(chunk, start)
+            end = trailing.start() if trailing else len(chunk)
+            kind = self._abbreviation(chunk[start:end])
+            if kind is not None:
+                self._split_chunk(chunk[:start], tokens, kinds)
+                tokens.append(chunk[start:end])
+                kinds.append(kind)
+                self._split_chunk(chunk[end:], tokens, kinds)
+                return
+        for match in self._token.finditer(chunk):
+            tokens.append(match.group())
+            kinds.append(None)
+
+    def _sentences(self, text: str) -> Iterator[List[str]]:
+        tokens: List[str] = []
+        kinds: List[Optional[str]] = []
+        for chunk in text.split():
+            self._split_chunk(chunk, tokens, kinds)
+
+        sentence: List[str] = []
+        idx = 0
+        while idx < len(tokens):
+            token = tokens[idx]
+            idx += 1
+            if (
+                token == "."
+                and sentence
+                and sentence[-1].isdigit()
+                and idx < len(tokens)
+                and tokens[idx][:1].islower()
+            ):
+                # An ordinal number, e.g. "28. desember"
+                sentence[-1] += "."
+                continue
+            sentence.append(token)
+            ends = _SENTENCE_END.fullmatch(token) is not None
+            if kinds[idx - 1] == ABBREV and idx < len(tokens):
+                # An abbreviation ends the sentence if a capitalized word follows it
+                ends = tokens[idx][:1].isupper()
+            if ends:
+                while idx < len(tokens) and tokens[idx] in _CLOSING:
+                    sentence.append(tokens[idx])
+                    idx += 1
+                yield sentence
+                sentence = []
+        if sentence:
+            yield sentence
+
+    def tokenize(self, text: str) -> Iterator[List[str]]:
+        """
+        Tokenize raw text.
+
+        :param text: The text. Line breaks are treated as spaces, an empty line ends a sentence.
+        :return: A generator of sentences, each a list of tokens.
+        """
+        for paragraph in _PARAGRAPHS.split(text):
+            yield from self._sentences(paragraph)
+
+    def split_into_sentences(self, text: str) -> List[str]:
+        """Return the sentences of ``text``, with the tokens separated by spaces."""
+        return [" ".join(sentence) for sentence in self.tokenize(text)]
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer(strict: bool = True) -> Tokenizer:
+    """Return a Tokenizer using the bundled lexicon, loading the lexicon only once."""
+    logger.debug(f"Loading tokenizer lexicon from {LEXICON_PATH}")
+    return Tokenizer(load_lexicon(), strict=strict)
@@ -0,0 +1,446 @@
+"""
+Structural queries over parsed corpora, backed by inverted indexes.
+
+``CorpusIndex`` maps every phrase label, tag and word of a corpus to the
+sentences and nodes where it occurs. A query is a tree pattern built with
+``phrase`` and ``terminal``, e.g. a PP with an NP child that holds a dative
+noun::
+
+    >>> pattern = phrase("PP", child=phrase("NP", child=terminal(tag=re.compile("n..þ.*"))))
+    >>> list(index.search(pattern))
+    [Match(sentence=12, node=5), ...]
+
+A query is answered in two steps. First the indexes give, for every label,
+tag and word the pattern requires, the set of sentences where it occurs, and
+only sentences in all of them are candidates. Then the pattern is checked in
+each candidate, starting only from the nodes the index lists for its root.
+Sentences that can't match are never read.
+
+Nodes are numbered in pre-order, as in ``PackedSentence``. The sentences are
+read from the sequence the index was built from, which can be a list of
+sentences or a ``CorpusReader`` (see ``icenlpy.store``).
+"""
+
+import re
+import abc
+import pickle
+import logging
+
+from array import array
+from collections import defaultdict
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Pattern,
+    Sequence,
+    Set,
+    Union,
+)
+
+from icenlpy.store import CorpusReader
+from icenlpy.tree import PHRASE, IceNLPySentence, PackedSentence
+
+logger = logging.getLogger(__name__)
+
+# A label, tag or word: an exact string or a regular expression matching the whole of it
+Matcher = Union[str, Pattern]
+
+LABELS, TAGS, WORDS = "labels", "tags", "words"
+
+
+class Match(NamedTuple):
+    """A node matching a query: the number of the sentence and of the node within it."""
+
+    sentence: int
+    node: int
+
+
+def _matches(matcher: Optional[Matcher], value: str) -> bool:
+    if matcher is None:
+        return True
+    if isinstance(matcher, str):
+        return matcher == value
+    return matcher.fullmatch(value) is not None
+
+
+def _as_list(patterns) -> List["NodePattern"]:
+    if patterns is None:
+        return []
+    if isinstance(patterns, NodePattern):
+        return [patterns]
+    return list(patterns)
+
+
+class NodePattern(abc.ABC):
+    """
+    A pattern matching a node and, optionally, its children and descendants.
+
+    Use ``phrase`` and ``terminal`` to create patterns.
+
+    :param child: A pattern, or a list of patterns, each of which some child must match.
+    :param descendant: A pattern, or a list of patterns, each of which some descendant must match.
+    :param where: A function of a PackedSentence and a node index, for any
+        further condition the node must meet.
+    """
+
+    def __init__(self, child=None, descendant=None, where=None):
+        self.children: List[NodePattern] = _as_list(child)
+        self.descendants: List[NodePattern] = _as_list(descendant)
+        self.where: Optional[Callable[[PackedSentence, int], bool]] = where
+
+    @abc.abstractmethod
+    def _index_terms(self):
+        """The ``(index name, matcher)`` pairs that a node matching this pattern must have."""
+
+    @abc.abstractmethod
+    def _matches_node(self, sentence: PackedSentence, index: int) -> bool:
+        """Whether node ``index`` itself matches, without its children and descendants."""
+
+    def matches(self, sentence: PackedSentence, index: int) -> bool:
+        """Whether node ``index`` of ``sentence`` matches the pattern."""
+        if not self._matches_node(sentence, index):
+            return False
+        for pattern in self.children:
+            if not any(pattern.matches(sentence, child) for child in sentence.children(index)):
+                return False
+        for pattern in self.descendants:
+            if not any(
+                pattern.matches(sentence, node)
+                for node in range(index + 1, sentence.ends[index])
+            ):
+                return False
+        return self.where is None or self.where(sentence, index)
+
+
+class PhrasePattern(NodePattern):
+    def __init__(self, label: Optional[Matcher] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.label = label
+
+    def _index_terms(self):
+        return [(LABELS, self.label)] if self.label is not None else []
+
+    def _matches_node(self, sentence: PackedSentence, index: int) -> bool:
+        return sentence.kinds[index] == PHRASE and _matches(self.label, sentence.values[index])
+
+    def __repr__(self):
+        return f"phrase({self.label!r})"
+
+
+class TerminalPattern(NodePattern):
+    def __init__(self, tag: Optional[Matcher] = None, word: Optional[Matcher] = None, **kwargs):
+        super().__init__(**kwargs)
+        if self.children or self.descendants:
+            raise ValueError("Terminal nodes have no children")
+        self.tag = tag
+        self.word = word
+
+    def _index_terms(self):
+        terms = []
+        if self.tag is not None:
+            terms.append((TAGS, self.tag))
+        if self.word is not None:
+            terms.append((WORDS, self.word))
+        return terms
+
+    def _matches_node(self, sentence: PackedSentence, index: int) -> bool:
+        return (
+            sentence.kinds[index] != PHRASE
+            and _matches(self.tag, sentence.tags[index])
+            and _matches(self.word, sentence.values[index])
+        )
+
+    def __repr__(self):
+        return f"terminal(tag={self.tag!r}, word={self.word!r})"
+
+
+def phrase(
+    label: Optional[Matcher] = None, child=None, descendant=None, where=None
+) -> PhrasePattern:
+    """
+    A pattern matching a phrase.
+
+    :param label: The phrase label, e.g. ``"NP"`` or ``re.compile("NP.*")``. Any label by default.
+    :param child: A pattern, or a list of patterns, each of which some child must match.
+    :param descendant: A pattern, or a list of patterns, each of which some descendant must match.
+    :param where: A function of a PackedSentence and a node index, for any further condition.
+    """
+    return PhrasePattern(label, child=child, descendant=descendant, where=where)
+
+
+def terminal(
+    tag: Optional[Matcher] = None, word: Optional[Matcher] = None, where=None
+) -> TerminalPattern:
+    """
+    A pattern matching a word, including punctuation.
+
+    :param tag: The tag, e.g. ``"nkeþ"`` or ``re.compile("n..þ.*")``. Any tag by default.
+    :param word: The word. Any word by default.
+    :param where: A function of a PackedSentence and a node index, for any further condition.
+    """
+    return TerminalPattern(tag, word, where=where)
+
+
+class Postings:
+    """The occurrences of one label, tag or word, in corpus order."""
+
+    __slots__ = ("sentences", "nodes")
+
+    def __init__(self):
+        self.sentences = array("I")
+        self.nodes = array("I")
+
+    def add(self, sentence: int, node: int):
+        self.sentences.append(sentence)
+        self.nodes.append(node)
+
+    def __len__(self):
+        return len(self.sentences)
+
+    def __getstate__(self):
+        return (self.sentences, self.nodes)
+
+    def __setstate__(self, state):
+        self.sentences, self.nodes = state
+
+
+class CorpusIndex:
+    """
+    Inverted indexes of the labels, tags and words of a parsed corpus.
+
+    :param sentences: The corpus, a sequence of IceNLPySentence or
+        PackedSentence objects such as a ``CorpusReader``. It is kept to check
+        candidate sentences against queries, so it must not change.
+    """
+
+    def __init__(self, sentences: Sequence[Union[IceNLPySentence, PackedSentence]]):
+        self.sentences = sentences
+        self.indexes: Dict[str, Dict[str, Postings]] = {LABELS: {}, TAGS: {}, WORDS: {}}
+        self._build()
+
+    def _build(self):
+        labels: Dict[str, Postings] = defaultdict(Postings)
+        tags: Dict[str, Postings] = defaultdict(Postings)
+        words: Dict[str, Postings] = defaultdict(Postings)
+        for sentence_index in range(len(self.sentences)):
+            sentence = self._packed(sentence_index)
+            for node, kind in enumerate(sentence.kinds):
+                if kind == PHRASE:
+                    labels[sentence.values[node]].add(sentence_index, node)
+                else:
+                    tags[sentence.tags[node]].add(sentence_index, node)
+                    words[sentence.values[node]].add(sentence_index, node)
+        self.indexes = {LABELS: dict(labels), TAGS: dict(tags), WORDS: dict(words)}
+        logger.debug(
+            f"Indexed {len(self.sentences)} sentences: {len(labels)} labels, "
+            f"{len(tags)} tags, {len(words)} words"
+        )
+
+    def _packed(self, sentence_index: int) -> PackedSentence:
+        sentence = self.sentences[sentence_index]
+        if isinstance(sentence, PackedSentence):
+            return sentence
+        return sentence.pack()
+
+    def __len__(self):
+        return len(self.sentences)
+
+    def keys(self, index: str, matcher: Optional[Matcher] = None) -> List[str]:
+        """
+        The labels, tags or words in the corpus.
+
+        :param index: ``"labels"``, ``"tags"`` or ``"words"``.
+        :param matcher: Only return keys matching this string or regular expression.
+        """
+        keys = self.indexes[index]
+        if matcher is None:
+            return list(keys)
+        if isinstance(matcher, str):
+            return [matcher] if matcher in keys else []
+        return [key for key in keys if matcher.fullmatch(key)]
+
+    def postings(self, index: str, matcher: Matcher) -> List[Postings]:
+        """The postings of every key of ``index`` matching ``matcher``."""
+        keys = self.indexes[index]
+        return [keys[key] for key in self.keys(index, matcher)]
+
+    def frequency(self, index: str, matcher: Matcher) -> int:
+        """The number of nodes with a label, tag or word matching ``matcher``."""
+        return sum(len(postings) for postings in self.postings(index, matcher))
+
+    def _sentences_with(self, index: str, matcher: Matcher) -> Set[int]:
+        found: Set[int] = set()
+        for postings in self.postings(index, matcher):
+            found.update(postings.sentences)
+        return found
+
+    def candidates(self, pattern: NodePattern) -> Optional[Set[int]]:
+        """
+        The sentences that may contain a match of ``pattern``, according to the indexes.
+
+        :return: A set of sentence numbers, or ``None`` if the pattern requires
+            nothing the indexes know of, so every sentence is a candidate.
+        """
+        found: Optional[Set[int]] = None
+        for index, matcher in pattern._index_terms():
+            sentences = self._sentences_with(index, matcher)
+            found = sentences if found is None else found & sentences
+            if not found:
+                return found
+        for sub_pattern in pattern.children + pattern.descendants:
+            sentences = self.candidates(sub_pattern)
+            if sentences is not None:
+                found = sentences if found is None else found & sentences
+                if not found:
+                    return found
+        return found
+
+    def _roots(self, pattern: NodePattern, sentences: Optional[Set[int]]) -> Iterator[Match]:
+        """The nodes where a match of ``pattern`` may start, in corpus order."""
+        terms = pattern._index_terms()
+        if terms:
+            # The rarest term is the cheapest place to start
+            index, matcher = min(terms, key=lambda term: self.frequency(*term))
+            starts = set()
+            for postings in self.postings(index, matcher):
+                for sentence, node in zip(postings.sentences, postings.nodes):
+                    if sentences is None or sentence in sentences:
+                        starts.add(Match(sentence, node))
+            yield from sorted(starts)
+            return
+        for sentence in sorted(sentences) if sentences is not None else range(len(self)):
+            for node in range(len(self._packed(sentence))):
+                yield Match(sentence, node)
+
+    def search(self, pattern: NodePattern, limit: Optional[int] = None) -> Iterator[Match]:
+        """
+        Find the nodes matching a pattern.
+
+        :param pattern: A pattern made with ``phrase`` or ``terminal``.
+        :param limit: Stop after this many matches.
+        :return: A generator of matches, in corpus order.
+        """
+        sentences = self.candidates(pattern)
+        if sentences is not None and not sentences:
+            return
+        found = 0
+        current, packed = -1, None
+        for match in self._roots(pattern, sentences):
+            if match.sentence != current:
+                current, packed = match.sentence, self._packed(match.sentence)
+            if pattern.matches(packed, match.node):
+                yield match
+                found += 1
+                if limit is not None and found >= limit:
+                    return
+
+    def count(self, pattern: NodePattern) -> int:
+        """The number of nodes matching a pattern."""
+        return sum(1 for _ in self.search(pattern))
+
+    def node(self, match: Match):
+        """Return the node of a match, as a view into its sentence."""
+        return self._packed(match.sentence).node(match.node)
+
+    def sentence(self, match: Match) -> PackedSentence:
+        """Return the sentence of a match."""
+        return self._packed(match.sentence)
+
+    def save(self, path):
+        """
+        Store the indexes in a file, to be loaded with ``CorpusIndex.load``.
+
+        The file is a pickle, so only load files you wrote yourself.
+        """
+        with open(path, "wb") as file:
+            pickle.dump(
+                {"sentences": len(self.sentences), "indexes": self.indexes},
+                file,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+
+    @classmethod
+    def load(cls, path, sentences: Sequence) -> "CorpusIndex":
+        """
+        Load indexes stored with ``save``.
+
+        :param path: The file written by ``save``.
+        :param sentences: The corpus the indexes were built from.
+        """
+        with open(path, "rb") as file:
+            data = pickle.load(file)
+        if data["sentences"] != len(sentences):
+            raise ValueError(
+                f"The index is of {data['sentences']} sentences, the corpus has {len(sentences)}"
+            )
+        index = cls.__new__(cls)
+        index.sentences = sentences
+        index.indexes = data["indexes"]
+        return index
+
+
+# Prepositions and the case they govern, in the original tagset: "ao" for accusative and so on
+_PREPOSITION = re.compile("a[oþe]")
+_NOUN = re.compile("n.{3,}")
+
+
+def _pp_case_mismatch(sentence: PackedSentence, index: int) -> bool:
+    """Whether the preposition of a PP governs a different case than the head of its object."""
+    children = list(sentence.children(index))
+    preposition = next(
+        (child for child in children if _PREPOSITION.fullmatch(sentence.tags[child])), None
+    )
+    # The object is the first noun phrase, a later one is a genitive qualifier
+    noun_phrase = next(
+        (
+            child
+            for child in children
+            if sentence.kinds[child] == PHRASE and sentence.values[child].startswith("NP")
+        ),
+        None,
+    )
+    if preposition is None or noun_phrase is None:
+        return False
+    # The head is the first noun, nouns after it are qualifiers as well
+    head = next(
+        (
+            node
+            for node in range(noun_phrase + 1, sentence.ends[noun_phrase])
+            if sentence.kinds[node] != PHRASE and _NOUN.fullmatch(sentence.tags[node])
+        ),
+        None,
+    )
+    return head is not None and sentence.tags[head][3] != sentence.tags[preposition][1]
+
+
+# Patterns for suspicious phrases, in the spirit of IceNLP's errorSearch tools
+PP_CASE_MISMATCH = phrase(
+    "PP",
+    child=[terminal(tag=_PREPOSITION), phrase(re.compile("NP.*"), descendant=terminal(tag=_NOUN))],
+    where=_pp_case_mismatch,
+)
+
+
+def build_index(
+    sentences: Union[CorpusReader, Iterable[Union[IceNLPySentence, PackedSentence, str]]]
+) -> CorpusIndex:
+    """
+    Index a corpus.
+
+    :param sentences: A ``CorpusReader``, which is read from as needed, or
+        IceNLPySentence or PackedSentence objects or bracketed strings, which
+        are packed and kept in memory.
+    """
+    if not isinstance(sentences, CorpusReader):
+        packed = []
+        for sentence in sentences:
+            if isinstance(sentence, str):
+                sentence = IceNLPySentence(sentence)
+            packed.append(sentence if isinstance(sentence, PackedSentence) else sentence.pack())
+        sentences = packed
+    return CorpusIndex(sentences)
@@ -0,0 +1,597 @@
+"""
+A local tagging and parsing service, for applications that share one set of warm JVMs.
+
+``icenlpy serve`` listens on a TCP port or a Unix socket and answers JSON
+requests over HTTP:
+
+* ``POST /tag`` with ``{"sentences": ["Hann fór heim.", ...]}`` tags running
+  text with IceTagger, as ``icetagger.tag_text`` does,
+* ``POST /parse`` with ``{"sentences": [...], "tagged": false}`` parses
+  tokenized sentences, tagging them first unless ``tagged`` is true, as
+  ``iceparser.parse_text`` does,
+* ``GET /health`` returns the state of the queues, ``GET /metrics`` the
+  metrics of ``icenlpy.metrics`` in the Prometheus text format.
+
+Both return ``{"sentences": [...]}``, one object per input sentence with its
+``tokens``, ``tags`` and, when parsed, ``brackets``.
+
+Concurrent requests are gathered into micro-batches by a ``MicroBatcher``:
+a batch is sent to IceNLP when it holds ``max_batch_size`` sentences or when
+its first request has waited ``max_wait`` seconds, whichever comes first, and
+each request gets back its own part of the result. Up to ``workers`` batches
+are processed at the same time. At most ``max_queue`` sentences wait at a
+time; further requests are turned away with ``503 Service Unavailable`` so
+that callers can back off, instead of piling up behind a queue that never
+drains.
+
+``Client`` talks to the service from Python::
+
+    >>> client = server.Client(socket_path="/run/icenlpy.sock")
+    >>> client.parse(["Hann fór heim ."])[0].tree
+"""
+
+import os
+import json
+import logging
+import threading
+
+from collections import deque
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from time import monotonic
+from typing import Callable, Deque, Dict, List, NamedTuple, Optional
+
+import icenlpy.metrics as metrics
+
+from icenlpy.stream import StreamedSentence
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+DEFAULT_MAX_BATCH_SIZE = 64
+DEFAULT_MAX_WAIT = 0.005
+DEFAULT_MAX_QUEUE = 1000
+DEFAULT_TIMEOUT = 60.0
+
+
+class ServerError(Exception):
+    """An error answered by the service, with its HTTP status."""
+
+    def __init__(self, message: str, status: int = 500):
+        super().__init__(message)
+        self.status = status
+
+
+class ServerBusy(ServerError):
+    """The queue is full. The request may be tried again later."""
+
+    def __init__(self, message: str = "The queue is full, try again later"):
+        super().__init__(message, status=503)
+
+
+class _Request(NamedTuple):
+    items: list
+    future: Future
+
+
+class MicroBatcher:
+    """
+    Gathers the items of concurrent requests into batches for a single call each.
+
+    :param process: Called with a list of items, returns one result per item.
+    :param max_batch_size: Most items in a batch. A larger request is a batch of its own.
+    :param max_wait: Seconds the first request of a batch waits for others to join it.
+    :param max_queue: Most items waiting at a time, see ``submit``.
+    :param workers: Number of batches processed at the same time.
+    :param name: The name of the batcher in logs and metrics.
+    """
+
+    def __init__(
+        self,
+        process: Callable[[list], list],
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        max_wait: float = DEFAULT_MAX_WAIT,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        workers: int = 1,
+        name: str = "batch",
+    ):
+        if max_batch_size < 1 or max_queue < 1 or workers < 1:
+            raise ValueError("max_batch_size, max_queue and workers must be positive integers")
+        self.process = process
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.name = name
+        self._queue: Deque[_Request] = deque()
+        self._queued = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self.batches = 0
+        self.requests = 0
+        self.rejected = 0
+        self._threads = [
+            threading.Thread(target=self._run, name=f"icenlpy-{name}-{idx}", daemon=True)
+            for idx in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, items: list) -> Future:
+        """
+        Queue the items of one request.
+
+        :return: A future of the results, one per item.
+        :raises ServerBusy: If the items don't fit in the queue.
+        """
+        future: Future = Future()
+        if not items:
+            future.set_result([])
+            return future
+        with self._condition:
+            if self._closed:
+                raise RuntimeError(f"The {self.name} batcher has been closed")
+            # A request larger than the queue is let in when the queue is empty,
+            # otherwise it could never be served
+            if self._queued and self._queued + len(items) > self.max_queue:
+                self.rejected += 1
+                metrics.inc("icenlpy_server_rejected_total", endpoint=self.name)
+                raise ServerBusy()
+            self._queue.append(_Request(list(items), future))
+            self._queued += len(items)
+            self.requests += 1
+            self._condition.notify()
+        return future
+
+    def _next_batch(self) -> Optional[List[_Request]]:
+        with self._condition:
+            while not self._queue and not self._closed:
+                self._condition.wait()
+            if not self._queue:
+                return None
+            # The first request waits a little for others to join it
+            deadline = monotonic() + self.max_wait
+            while self._queued < self.max_batch_size and not self._closed:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            batch: List[_Request] = []
+            size = 0
+            while self._queue and (
+                not batch or size + len(self._queue[0].items) <= self.max_batch_size
+            ):
+                request = self._queue.popleft()
+                self._queued -= len(request.items)
+                # Requests whose caller gave up are dropped
+                if request.future.set_running_or_notify_cancel():
+                    batch.append(request)
+                    size += len(request.items)
+            if self._queue:
+                # There is more for the other workers
+                self._condition.notify()
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            if batch:
+                self._dispatch(batch)
+
+    def _dispatch(self, batch: List[_Request]):
+        items = [item for request in batch for item in request.items]
+        try:
+            with metrics.span(f"server.{self.name}", sentences=len(items), requests=len(batch)):
+                results = self.process(items)
+            if len(results) != len(items):
+                raise ServerError(f"Got {len(results)} results for {len(items)} items")
+        except Exception as e:
+            if len(batch) > 1:
+                # One bad request should not fail the others, so each is retried alone
+                logger.debug("A %s batch failed, retrying its requests one by one", self.name)
+                for request in batch:
+                    self._dispatch([request])
+                return
+            batch[0].future.set_exception(e)
+            return
+        self.batches += 1
+        start = 0
+        for request in batch:
+            end = start + len(request.items)
+            request.future.set_result(results[start:end])
+            start = end
+
+    def stats(self) -> Dict[str, int]:
+        with self._condition:
+            return {
+                "queued": self._queued,
+                "requests": self.requests,
+                "batches": self.batches,
+                "rejected": self.rejected,
+            }
+
+    def close(self):
+        """Stop taking requests, finish the queued ones and stop the workers."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+
+def tag_sentences(sentences: List[str]) -> List[StreamedSentence]:
+    """
+    Tag running text, one result per input string.
+
+    IceTagger may split a string into several sentences. The batch is then
+    tagged again one string at a time, and the sentences of each are joined.
+    """
+    from icenlpy import icetagger
+
+    lines = [" ".join(sentence.split()) for sentence in sentences]
+    results = [StreamedSentence([], []) for _ in lines]
+    positions = [idx for idx, line in enumerate(lines) if line]
+    if not positions:
+        return results
+    tagged = icetagger.tag_text([lines[idx] for idx in positions])
+    if len(tagged) != len(positions):
+        tagged = [" ".join(icetagger.tag_text([lines[idx]])) for idx in positions]
+    for idx, tagged_line in zip(positions, tagged):
+        words = tagged_line.split()
+        results[idx] = StreamedSentence(words[::2], words[1::2])
+    return results
+
+
+def parse_sentences(sentences: List[str], tagged=False) -> List[StreamedSentence]:
+    """Parse tokenized sentences, tagging them first unless they are ``tagged``."""
+    from icenlpy import iceparser
+
+    trees = iceparser.parse_text(sentences, legacy_tagger=not tagged)
+    return [StreamedSentence.from_tree(tree) for tree in trees]
+
+
+def _warm_workers(workers: int):
+    """Start the runners the endpoints use, so that the first requests don't wait for them."""
+    import icenlpy.utils as utils
+    import icenlpy.workers as workers_module
+
+    from icenlpy import get_jar_path
+
+    pool = workers_module.configure_pool(size=workers)
+    if pool is None:
+        return
+    for target, java_args in (("tagger", {"lf": 3}), ("tagger", {"lf": 2}), ("parser", {})):
+        try:
+            pool.warm(utils.build_command(get_jar_path(), target, java_args))
+        except OSError as e:
+            logger.warning("Could not start the %s ahead of the first request: %s", target, e)
+
+
+def _handler_class():
+    # http.server is slow to import, so the handler is only defined when a server is started
+    from http.server import BaseHTTPRequestHandler
+
+    class Handler(BaseHTTPRequestHandler):
+        server_version = "icenlpy"
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            logger.debug("%s", format % args)
+
+        def _send(self, status: int, body: bytes, content_type="application/json", headers={}):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_json(self, status: int, data, headers={}):
+            self._send(status, json.dumps(data, ensure_ascii=False).encode("utf-8"), headers=headers)
+
+        def _send_error(self, error: ServerError):
+            headers = {"Retry-After": "1"} if isinstance(error, ServerBusy) else {}
+            self._send_json(error.status, {"error": str(error)}, headers)
+
+        def do_GET(self):
+            service: Server = self.server.service
+            if self.path == "/health":
+                self._send_json(200, service.health())
+            elif self.path == "/metrics":
+                registry = metrics.get_registry()
+                text = registry.to_prometheus() if registry is not None else ""
+                self._send(200, text.encode("utf-8"), "text/plain; version=0.0.4")
+            else:
+                self._send_error(ServerError(f"Unknown path: {self.path}", 404))
+
+        def do_POST(self):
+            service: Server = self.server.service
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError as e:
+                self._send_error(ServerError(f"Invalid request: {e}", 400))
+                return
+            sentences = request.get("sentences") if isinstance(request, dict) else None
+            if not isinstance(sentences, list) or not all(
+                isinstance(sentence, str) for sentence in sentences
+            ):
+                self._send_error(ServerError('Expected {"sentences": [strings]}', 400))
+                return
+            try:
+                results = service.handle(self.path, sentences, request)
+            except ServerError as e:
+                self._send_error(e)
+            except Exception as e:
+                logger.exception("Failed to answer a request to %s", self.path)
+                self._send_error(ServerError(f"{type(e).__name__}: {e}", 500))
+            else:
+                self._send_json(200, {"sentences": [result.as_dict() for result in results]})
+
+    return Handler
+
+
+class Server:
+    """
+    The tagging and parsing service. See the module documentation.
+
+    :param host: The address to listen on, unless ``socket_path`` is given.
+    :param port: The TCP port. 0 picks a free one, see ``address``.
+    :param socket_path: Listen on a Unix socket at this path instead of a TCP port.
+    :param workers: Number of batches processed at the same time, per endpoint,
+        and of warm JVMs kept per runner.
+    :param max_batch_size: Most sentences in a batch.
+    :param max_wait: Seconds a request waits for others to join its batch.
+    :param max_queue: Most sentences waiting at a time, per endpoint.
+    :param timeout: Seconds a request may take before ``504 Gateway Timeout`` is answered.
+    :param warm: Start the JVMs before the first request.
+    """
+
+    def __init__(
+        self,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        socket_path: Optional[str] = None,
+        workers: int = 1,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        max_wait: float = DEFAULT_MAX_WAIT,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        timeout: float = DEFAULT_TIMEOUT,
+        warm: bool = True,
+    ):
+        import socketserver
+
+        from http.server import ThreadingHTTPServer
+
+        self.timeout = timeout
+        self.socket_path = socket_path
+        if warm:
+            _warm_workers(workers)
+
+        def batcher(name, process):
+            return MicroBatcher(process, max_batch_size, max_wait, max_queue, workers, name)
+
+        self.batchers: Dict[str, MicroBatcher] = {
+            "tag": batcher("tag", tag_sentences),
+            "parse": batcher("parse", parse_sentences),
+            "parse-tagged": batcher(
+                "parse-tagged", lambda sentences: parse_sentences(sentences, tagged=True)
+            ),
+        }
+
+        handler = _handler_class()
+        if socket_path is not None:
+
+            class UnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+                daemon_threads = True
+
+            if os.path.exists(socket_path):
+                # Left behind by a server that did not shut down cleanly
+                os.unlink(socket_path)
+            self.httpd = UnixHTTPServer(socket_path, handler)
+        else:
+            self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.service = self
+        self._serving = False
+
+    @property
+    def address(self) -> str:
+        """The URL or socket path the server listens on."""
+        if self.socket_path is not None:
+            return self.socket_path
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def handle(self, path: str, sentences: List[str], request: dict) -> List[StreamedSentence]:
+        """Answer a request to one of the POST endpoints."""
+        if path == "/tag":
+            batcher = self.batchers["tag"]
+        elif path == "/parse":
+            batcher = self.batchers["parse-tagged" if request.get("tagged") else "parse"]
+        else:
+            raise ServerError(f"Unknown path: {path}", 404)
+        future = batcher.submit(sentences)
+        try:
+            return future.result(self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise ServerError(f"No result within {self.timeout} seconds", 504)
+
+    def health(self) -> dict:
+        return {
+            "status": "ok",
+            "batchers": {name: batcher.stats() for name, batcher in self.batchers.items()},
+        }
+
+    def serve_forever(self):
+        """Answer requests until ``shutdown`` is called, e.g. from a signal handler."""
+        logger.info("Serving on %s", self.address)
+        self._serving = True
+        self.httpd.serve_forever()
+
+    def start(self) -> "Server":
+        """Answer requests from a background thread."""
+        # Set here as well, so that a shutdown right away waits for the thread
+        self._serving = True
+        threading.Thread(target=self.serve_forever, name="icenlpy-server", daemon=True).start()
+        return self
+
+    def shutdown(self):
+        """Stop taking requests, finish the queued ones and close the socket."""
+        if self._serving:
+            # Returns once serve_forever has returned
+            self.httpd.shutdown()
+        self.httpd.server_close()
+        for batcher in self.batchers.values():
+            batcher.close()
+        if self.socket_path is not None and os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+
+class Client:
+    """
+    A client of the service, which can be shared between threads.
+
+    :param url: The URL of a server listening on TCP.
+    :param socket_path: The socket of a server listening on a Unix socket, instead of ``url``.
+    :param timeout: Seconds to wait for an answer.
+    """
+
+    def __init__(
+        self,
+        url: str = f"http://{DEFAULT_HOST}:{DEFAULT_PORT}",
+        socket_path: Optional[str] = None,
+        timeout: float = DEFAULT_TIMEOUT,
+    ):
+        from urllib.parse import urlsplit
+
+        parts = urlsplit(url)
+        self.host = parts.hostname or DEFAULT_HOST
+        self.port = parts.port or DEFAULT_PORT
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def _connection(self):
+        import socket
+        import http.client
+
+        if self.socket_path is None:
+            return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+        socket_path = self.socket_path
+
+        class UnixConnection(http.client.HTTPConnection):
+            def connect(self):
+                self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                self.sock.settimeout(self.timeout)
+                self.sock.connect(socket_path)
+
+        return UnixConnection("localhost", timeout=self.timeout)
+
+    def _request(self, method: str, path: str, data=None):
+        connection = self._connection()
+        try:
+            body = json.dumps(data).encode("utf-8") if data is not None else None
+            headers = {"Content-Type": "application/json"} if body is not None else {}
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            payload = response.read()
+        finally:
+            connection.close()
+        if response.status == 503:
+            raise ServerBusy(json.loads(payload).get("error", "The server is busy"))
+        if response.status != 200:
+            try:
+                message = json.loads(payload).get("error", "")
+            except ValueError:
+                message = payload.decode("utf-8", errors="replace")
+            raise ServerError(message, response.status)
+        if response.getheader("Content-Type", "").startswith("application/json"):
+            return json.loads(payload)
+        return payload.decode("utf-8")
+
+    def tag(self, sentences: List[str]) -> List[StreamedSentence]:
+        """Tag running text, one result per string, as ``POST /tag``."""
+        response = self._request("POST", "/tag", {"sentences": list(sentences)})
+        return [StreamedSentence.from_dict(record) for record in response["sentences"]]
+
+    def parse(self, sentences: List[str], tagged=False) -> List[StreamedSentence]:
+        """Parse tokenized sentences, or tagged ones with ``tagged``, as ``POST /parse``."""
+        response = self._request(
+            "POST", "/parse", {"sentences": list(sentences), "tagged": tagged}
+        )
+        return [StreamedSentence.from_dict(record) for record in response["sentences"]]
+
+    def health(self) -> dict:
+        return self._request("GET", "/health")
+
+    def metrics(self) -> str:
+        """The metrics of the server, in the Prometheus text format."""
+        return self._request("GET", "/metrics")
+
+
+def add_arguments(parser):
+    """Add the server options to an argparse parser."""
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Address to listen on.")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="TCP port to listen on.")
+    parser.add_argument(
+        "--socket", type=str, default=None, help="Listen on a Unix socket instead of a port."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Batches processed at the same time per endpoint, and warm JVMs per runner.",
+    )
+    parser.add_argument(
+        "--max-batch-size",
+        type=int,
+        default=DEFAULT_MAX_BATCH_SIZE,
+        help="Most sentences sent to IceNLP in one batch.",
+    )
+    parser.add_argument(
+        "--max-wait-ms",
+        type=float,
+        default=DEFAULT_MAX_WAIT * 1000,
+        help="Milliseconds a request waits for others to join its batch.",
+    )
+    parser.add_argument(
+        "--max-queue",
+        type=int,
+        default=DEFAULT_MAX_QUEUE,
+        help="Most sentences waiting per endpoint. Beyond it requests get a 503.",
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=DEFAULT_TIMEOUT, help="Seconds a request may take."
+    )
+
+
+def main(args) -> int:
+    """Run the server for parsed command line arguments until it is interrupted."""
+    server = Server(
+        host=args.host,
+        port=args.port,
+        socket_path=args.socket,
+        workers=args.workers,
+        max_batch_size=args.max_batch_size,
+        max_wait=args.max_wait_ms / 1000,
+        max_queue=args.max_queue,
+        timeout=args.timeout,
+    )
+    print(f"Serving on {server.address}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+    return 0
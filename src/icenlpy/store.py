@@ -0,0 +1,282 @@
+"""
+A compact binary file format for parsed corpora, with random access.
+
+Parsing IceParser's bracketed output is slow, so a corpus that is read many
+times is better stored in this format once. A file holds every sentence as a
+``PackedSentence``:
+
+    header | sentence records | string table | index
+
+* The header holds a magic number, the format version, the number of
+  sentences and the offsets of the string table and the index.
+* Every phrase label, word and tag is stored once in the string table, as
+  UTF-8 strings separated by NUL bytes, and is referred to by its number.
+* A sentence record is a sequence of varints: the number of nodes and then,
+  for every node in pre-order, ``string number << 2 | node kind``, followed by
+  the tag's string number for a terminal or by the size of the subtree for a
+  phrase.
+* The index holds the offset of every record and the end of the last one, as
+  little-endian uint64.
+
+``CorpusReader`` maps the file into memory. Opening a file reads only the
+header, so it takes the same time for any corpus size. Sentence ``i`` is
+decoded on access, straight from its offset in the index.
+"""
+
+import sys
+import mmap
+import struct
+import logging
+
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+from icenlpy.tree import PHRASE, IceNLPySentence, PackedSentence
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"ICECORP\x00"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<8sIIQQQ")
+
+SentenceType = Union[IceNLPySentence, PackedSentence, str]
+
+
+def _write_varint(out: bytearray, value: int):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varints(data: bytes) -> List[int]:
+    """Decode a sequence of varints."""
+    values: List[int] = []
+    append = values.append
+    value = 0
+    shift = 0
+    for byte in data:
+        if byte < 0x80:
+            append(value | byte << shift)
+            value = 0
+            shift = 0
+        else:
+            value |= (byte & 0x7F) << shift
+            shift += 7
+    return values
+
+
+class CorpusWriter:
+    """
+    Writes sentences to a corpus file one at a time.
+
+    The string table and the index are written when the writer is closed, so
+    use it as a context manager or call ``close``.
+
+    :param path: Path of the file to write. An existing file is overwritten.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "wb")
+        self._file.write(_HEADER.pack(MAGIC, FORMAT_VERSION, 0, 0, 0, 0))
+        self._offsets = array("Q", [_HEADER.size])
+        self._string_ids: Dict[str, int] = {}
+
+    def _string_id(self, string: str) -> int:
+        string_id = self._string_ids.get(string)
+        if string_id is None:
+            if "\0" in string:
+                raise ValueError(f"Strings can't contain NUL characters: {string!r}")
+            string_id = self._string_ids[string] = len(self._string_ids)
+        return string_id
+
+    def write(self, sentence: SentenceType):
+        """
+        Append a sentence.
+
+        :param sentence: An IceNLPySentence, a PackedSentence or IceParser's
+            bracketed output for one sentence.
+        """
+        if isinstance(sentence, str):
+            sentence = IceNLPySentence(sentence)
+        if isinstance(sentence, IceNLPySentence):
+            sentence = sentence.pack()
+        record = bytearray()
+        _write_varint(record, len(sentence))
+        string_id = self._string_id
+        for index, kind in enumerate(sentence.kinds):
+            _write_varint(record, string_id(sentence.values[index]) << 2 | kind)
+            if kind == PHRASE:
+                _write_varint(record, sentence.ends[index] - index)
+            else:
+                _write_varint(record, string_id(sentence.tags[index]))
+        self._file.write(record)
+        self._offsets.append(self._offsets[-1] + len(record))
+
+    def write_many(self, sentences: Iterable[SentenceType]) -> int:
+        """Append several sentences and return how many were written."""
+        count = 0
+        for sentence in sentences:
+            self.write(sentence)
+            count += 1
+        return count
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def close(self):
+        if self._file.closed:
+            return
+        strings_offset = self._offsets[-1]
+        strings = "\0".join(self._string_ids).encode("utf-8")
+        self._file.write(strings)
+        offsets = array("Q", self._offsets)
+        if sys.byteorder != "little":
+            offsets.byteswap()
+        self._file.write(offsets.tobytes())
+        self._file.seek(0)
+        self._file.write(
+            _HEADER.pack(
+                MAGIC,
+                FORMAT_VERSION,
+                0,
+                len(self),
+                strings_offset,
+                strings_offset + len(strings),
+            )
+        )
+        self._file.close()
+        logger.debug(
+            f"Wrote {len(self)} sentences and {len(self._string_ids)} strings to {self.path}"
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CorpusReader:
+    """
+    Random access to the sentences of a corpus file.
+
+    Sentences are returned as PackedSentence objects, whose nodes are only
+    built when they are accessed. Use ``unpack()`` on a sentence to get a
+    regular IceNLPySentence.
+
+    :param path: Path to a file written by ``CorpusWriter``.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            self._data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, _, count, strings_offset, index_offset = _HEADER.unpack_from(
+                self._data, 0
+            )
+        except struct.error:
+            magic, version = None, None
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self._data.close()
+            raise ValueError(f"{path} is not a corpus file of a supported format version")
+        self._count = count
+        self._strings_offset = strings_offset
+        self._index_offset = index_offset
+        self._strings: Optional[List[str]] = None
+        index = memoryview(self._data)[index_offset : index_offset + (count + 1) * 8]
+        if sys.byteorder == "little":
+            self._index = index.cast("Q")
+        else:
+            self._index = array("Q")
+            self._index.frombytes(index)
+            self._index.byteswap()
+            index.release()
+
+    @property
+    def strings(self) -> List[str]:
+        """The string table, decoded on first use."""
+        if self._strings is None:
+            blob = self._data[self._strings_offset : self._index_offset]
+            # An empty table decodes to [""], which is harmless as nothing refers to it
+            self._strings = [sys.intern(s) for s in blob.decode("utf-8").split("\0")]
+        return self._strings
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _decode(self, record: bytes) -> PackedSentence:
+        strings = self.strings
+        numbers = _read_varints(record)
+        size = numbers[0]
+        heads = numbers[1::2]
+        extras = numbers[2::2]
+        kinds = bytes([head & 3 for head in heads])
+        values = [strings[head >> 2] for head in heads]
+        tags = [""] * size
+        parents = array("i", [-1]) * size
+        ends = array("i", [0]) * size
+        # The phrases enclosing the current node
+        open_phrases: List[int] = []
+        for index in range(size):
+            while open_phrases and ends[open_phrases[-1]] <= index:
+                open_phrases.pop()
+            if open_phrases:
+                parents[index] = open_phrases[-1]
+            if kinds[index] == PHRASE:
+                ends[index] = index + extras[index]
+                open_phrases.append(index)
+            else:
+                ends[index] = index + 1
+                tags[index] = strings[extras[index]]
+        return PackedSentence(kinds, values, tags, parents, ends)
+
+    def __getitem__(self, i: int) -> PackedSentence:
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._count))]
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError("sentence index out of range")
+        return self._decode(self._data[self._index[i] : self._index[i + 1]])
+
+    def __iter__(self) -> Iterator[PackedSentence]:
+        for i in range(self._count):
+            yield self[i]
+
+    def close(self):
+        if isinstance(self._index, memoryview):
+            self._index.release()
+        self._data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_corpus(path, sentences: Iterable[SentenceType]) -> int:
+    """
+    Write sentences to a corpus file.
+
+    :param path: Path of the file to write.
+    :param sentences: IceNLPySentence or PackedSentence objects, or IceParser's
+        output, one bracketed sentence per string.
+    :return: The number of sentences written.
+    """
+    with CorpusWriter(path) as writer:
+        return writer.write_many(sentences)
+
+
+def convert_parsed_file(source, target) -> int:
+    """Store a file of IceParser output, one sentence per line, as a corpus file."""
+    with open(source, "r", encoding="utf-8") as file:
+        return write_corpus(target, (line for line in file if line.strip()))
+
+
+def read_corpus(path) -> CorpusReader:
+    """Open a corpus file for reading."""
+    return CorpusReader(path)
@@ -0,0 +1,362 @@
+"""
+Streaming of text files through IceNLP, as done by the ``icenlpy`` commands.
+
+The input, stdin or any number of files and glob patterns (``.gz`` files are
+decompressed on the fly), is read line by line and cut into batches. Each
+batch is one call to IceNLP, and up to ``workers`` batches are processed at
+the same time, each by its own JVM. The results are written out in input
+order as soon as each batch is done, so neither the input nor the output is
+ever held in memory whole.
+
+Every line is a piece of running text. The tokenizer and IceTagger split it
+into sentences, so a line may give several sentences. Output formats:
+
+* ``text``: one sentence per line, as IceNLP prints it,
+* ``jsonl``: one JSON object per sentence, with its ``tokens`` and, where
+  there are any, ``tags`` and ``brackets``,
+* ``conll``: one token per line in the ten CoNLL-U columns, with the tag in
+  XPOS and the phrases around the token in MISC (``Phrases=PP>NP``), and an
+  empty line after each sentence.
+
+Usage from the command line:
+
+    icenlpy iceparser -i 'corpus/*.txt.gz' --format jsonl --workers 4 -o parsed.jsonl
+"""
+
+import os
+import sys
+import glob
+import json
+import logging
+
+from time import monotonic
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+if TYPE_CHECKING:
+    from icenlpy.tree import IceNLPySentence
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("text", "jsonl", "conll")
+DEFAULT_BATCH_SIZE = 500
+
+
+class StreamedSentence(NamedTuple):
+    """A sentence as it comes out of one of the commands."""
+
+    tokens: List[str]
+    tags: Optional[List[str]] = None
+    tree: Optional["IceNLPySentence"] = None
+
+    @classmethod
+    def from_tree(cls, tree: "IceNLPySentence") -> "StreamedSentence":
+        terminals = list(tree.terminals())
+        return cls([node.word for node in terminals], [node.tag for node in terminals], tree)
+
+    @classmethod
+    def from_dict(cls, record: dict) -> "StreamedSentence":
+        """The inverse of ``as_dict``."""
+        tree = None
+        if "brackets" in record:
+            from icenlpy.tree import IceNLPySentence
+
+            tree = IceNLPySentence(record["brackets"])
+        return cls(record["tokens"], record.get("tags"), tree)
+
+    def as_dict(self) -> dict:
+        """The tokens, and the tags and brackets where there are any, as in the jsonl format."""
+        record = {"tokens": self.tokens}
+        if self.tags is not None:
+            record["tags"] = self.tags
+        if self.tree is not None:
+            record["brackets"] = str(self.tree)
+        return record
+
+
+def expand_inputs(patterns: Iterable[str]) -> List[str]:
+    """
+    Resolve file names and glob patterns to a list of files, in the given order.
+
+    ``"-"`` stands for stdin. A pattern that matches nothing is an error, so a
+    typo does not go unnoticed as an empty corpus.
+    """
+    paths = []
+    for pattern in patterns:
+        if pattern == "-" or not glob.has_magic(pattern):
+            paths.append(pattern)
+            continue
+        matches = sorted(glob.glob(pattern, recursive=True))
+        if not matches:
+            raise FileNotFoundError(f"No files match {pattern}")
+        paths.extend(matches)
+    return paths
+
+
+def read_lines(paths: Iterable[str]) -> Iterator[str]:
+    """Yield the non-empty lines of the given files, see ``parallel.open_text``."""
+    from icenlpy.parallel import read_sentences
+
+    return (line for line in read_sentences(paths) if line.strip())
+
+
+def _tokenize_batch(lines: List[str]) -> List[StreamedSentence]:
+    from icenlpy import tokenizer
+
+    return [StreamedSentence(list(sentence)) for sentence in tokenizer.tokenize(lines)]
+
+
+def _tag_batch(lines: List[str]) -> List[StreamedSentence]:
+    from icenlpy import icetagger
+
+    sentences = []
+    for tagged in icetagger.tag_text(lines):
+        words = tagged.split()
+        if words:
+            sentences.append(StreamedSentence(words[::2], words[1::2]))
+    return sentences
+
+
+def _parse_batch(lines: List[str]) -> List[StreamedSentence]:
+    from icenlpy import pipeline
+
+    return [StreamedSentence.from_tree(tree) for tree in pipeline.analyze(lines)]
+
+
+# What each command does with a batch of lines
+PROCESSORS: Dict[str, Callable[[List[str]], List[StreamedSentence]]] = {
+    "tokenizer": _tokenize_batch,
+    "icetagger": _tag_batch,
+    "iceparser": _parse_batch,
+}
+
+
+class BatchResult(NamedTuple):
+    """The sentences made from one batch of input lines."""
+
+    lines: int
+    sentences: List[StreamedSentence]
+
+
+def process_lines(
+    command: str,
+    lines: Iterable[str],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    workers: int = 1,
+) -> Iterator[BatchResult]:
+    """
+    Run one of the commands over a stream of lines and yield the sentences of each batch.
+
+    :param command: One of the keys of ``PROCESSORS``.
+    :param lines: The input text, one piece of running text per item.
+    :param batch_size: Number of lines sent to IceNLP at a time.
+    :param workers: Number of batches processed at the same time.
+    :return: A generator of BatchResult objects, in input order.
+    """
+    from icenlpy.parallel import iter_chunks, map_bounded
+
+    if batch_size < 1:
+        raise ValueError("batch_size must be a positive integer")
+    process = PROCESSORS[command]
+    batches = iter_chunks(lines, batch_size)
+    if workers == 1:
+        return (BatchResult(len(batch), process(batch)) for batch in batches)
+    return map_bounded(
+        lambda index, batch: BatchResult(len(batch), process(batch)), batches, workers=workers
+    )
+
+
+def _phrase_paths(tree: "IceNLPySentence") -> List[str]:
+    """The labels of the phrases around each token of a parsed sentence, outermost first."""
+    from icenlpy.tree import Phrase
+
+    paths: List[str] = []
+
+    def walk(elements, labels):
+        for element in elements:
+            if isinstance(element, Phrase):
+                walk(element.elements, labels + [element.label])
+            else:
+                paths.append(">".join(labels))
+
+    walk(tree.top_level_elements, [])
+    return paths
+
+
+def format_sentence(
+    sentence: StreamedSentence, output_format="text", token_per_line=False, tree_view=False
+) -> str:
+    """
+    Render a sentence in one of ``FORMATS``, ending with a newline.
+
+    :param token_per_line: In the text format, write one token per line and an
+        empty line after the sentence.
+    :param tree_view: In the text format, write parsed sentences as an indented tree.
+    """
+    if output_format == "jsonl":
+        return json.dumps(sentence.as_dict(), ensure_ascii=False) + "\n"
+
+    if output_format == "conll":
+        tags = sentence.tags or ["_"] * len(sentence.tokens)
+        phrases = _phrase_paths(sentence.tree) if sentence.tree is not None else []
+        lines = []
+        for idx, (token, tag) in enumerate(zip(sentence.tokens, tags), start=1):
+            path = phrases[idx - 1] if idx <= len(phrases) else ""
+            misc = f"Phrases={path}" if path else "_"
+            lines.append(f"{idx}\t{token}\t_\t_\t{tag}\t_\t_\t_\t_\t{misc}\n")
+        return "".join(lines) + "\n"
+
+    if output_format != "text":
+        raise ValueError(f"Unknown output format: {output_format}")
+    if sentence.tree is not None:
+        return sentence.tree.view if tree_view else f"{sentence.tree}\n"
+    if sentence.tags is not None:
+        items = [f"{token} {tag}" for token, tag in zip(sentence.tokens, sentence.tags)]
+    else:
+        items = sentence.tokens
+    if token_per_line:
+        return "".join(item + "\n" for item in items) + "\n"
+    return " ".join(items) + "\n"
+
+
+class Progress:
+    """
+    A line on stderr with the number of lines, sentences and tokens done so far and the rate.
+
+    :param stream: Where the meter is written.
+    :param interval: Minimum number of seconds between updates.
+    """
+
+    def __init__(self, stream=None, interval: float = 0.5):
+        self.stream = stream if stream is not None else sys.stderr
+        self.interval = interval
+        self.lines = 0
+        self.sentences = 0
+        self.tokens = 0
+        self.start = monotonic()
+        self._shown = 0.0
+
+    def update(self, lines: int, sentences: List[StreamedSentence]):
+        self.lines += lines
+        self.sentences += len(sentences)
+        self.tokens += sum(len(sentence.tokens) for sentence in sentences)
+        now = monotonic()
+        if now - self._shown >= self.interval:
+            self._shown = now
+            self._show(now)
+
+    def _show(self, now: float, end=""):
+        elapsed = max(now - self.start, 1e-9)
+        self.stream.write(
+            f"\r{self.lines:,} lines, {self.sentences:,} sentences, {self.tokens:,} tokens"
+            f" in {elapsed:.1f} s ({self.sentences / elapsed:,.0f} sentences/s,"
+            f" {self.tokens / elapsed:,.0f} tokens/s){end}"
+        )
+        self.stream.flush()
+
+    def close(self):
+        self._show(monotonic(), end="\n")
+
+
+def add_arguments(parser):
+    """Add the input, output and batching options to the parser of a command."""
+    parser.add_argument(
+        "-i",
+        "--input",
+        nargs="+",
+        action="extend",
+        metavar="PATH",
+        help="Input files or glob patterns, '-' for stdin. Files ending in .gz are "
+        "decompressed. Without input files or text, stdin is read.",
+    )
+    parser.add_argument(
+        "-o", "--output", type=str, help="Output file path, compressed if it ends in .gz."
+    )
+    parser.add_argument("input_text", nargs="?", help="Direct text to process")
+    parser.add_argument(
+        "-of",
+        "--output-format",
+        type=int,
+        default=2,
+        help="The desired output format. 1 for one token per line, 2 for one sentence per line.",
+        choices=[1, 2],
+    )
+    parser.add_argument(
+        "-t",
+        "--tree-view",
+        action="store_true",
+        help="Print the output in a tree view format. Only applies to IceParser.",
+    )
+    parser.add_argument(
+        "-f", "--format", choices=FORMATS, default="text", help="Output format. Default: text."
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help="Number of input lines sent to IceNLP at a time.",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1, help="Number of batches processed at the same time."
+    )
+    parser.add_argument(
+        "--progress",
+        dest="progress",
+        action="store_true",
+        default=None,
+        help="Show progress on stderr. The default when stderr is a terminal.",
+    )
+    parser.add_argument(
+        "--no-progress", dest="progress", action="store_false", help="Don't show progress."
+    )
+
+
+def main(args) -> int:
+    """Run a command for parsed command line arguments and return an exit status."""
+    from icenlpy.parallel import open_text
+
+    if args.workers < 1:
+        raise ValueError("--workers must be a positive integer")
+    for standard_stream in (sys.stdin, sys.stdout):
+        # IceNLP reads and writes UTF-8, whatever the locale
+        if hasattr(standard_stream, "reconfigure"):
+            standard_stream.reconfigure(encoding="utf-8")
+
+    if args.input:
+        lines = read_lines(expand_inputs(args.input))
+    elif args.input_text is not None:
+        lines = iter([args.input_text])
+    else:
+        lines = read_lines(["-"])
+
+    if args.workers > 1:
+        from icenlpy import workers
+
+        # One warm runner for each batch in progress
+        workers.configure_pool(size=args.workers)
+
+    show_progress = args.progress if args.progress is not None else sys.stderr.isatty()
+    progress = Progress() if show_progress else None
+    token_per_line = args.output_format == 1
+
+    with open_text(args.output or "-", "w") as output:
+        try:
+            for result in process_lines(
+                args.command, lines, batch_size=args.batch_size, workers=args.workers
+            ):
+                output.writelines(
+                    format_sentence(sentence, args.format, token_per_line, args.tree_view)
+                    for sentence in result.sentences
+                )
+                output.flush()
+                if progress is not None:
+                    progress.update(result.lines, result.sentences)
+        except BrokenPipeError:
+            # The reader went away, e.g. the output was piped into head. Python
+            # would fail again flushing stdout on exit, so it is pointed elsewhere.
+            devnull = os.open(os.devnull, os.O_WRONLY)
+            os.dup2(devnull, sys.stdout.fileno())
+            return 1
+        finally:
+            if progress is not None:
+                progress.close()
+    return 0
@@ -1,25 +1,16 @@
-import subprocess
-import shlex
-import tomlkit
-import json
-import os
 import logging
 
-from icenlpy import JAR_PATH, JAR_FOUND
-
-from typing import List, Union
+from typing import Iterable, Iterator, List, Union
 
 import icenlpy.utils as utils
+import icenlpy.bridge as bridge
+import icenlpy.metrics as metrics
+import icenlpy.pytokenizer as pytokenizer
+import icenlpy.cache as caching
 
-logging.basicConfig(level=logging.DEBUG)
-logger = logging.getLogger(__name__)
-
-# ice_nlp_path = utils.get_ice_nlp_path()
-# jar_path = ice_nlp_path / "dist/IceNLPCore.jar"
+from icenlpy import get_jar_path
 
-# abs_path_to_icenlp_jar = os.path.join(ice_nlp_path, jar_path)
-
-logger.debug(f"jar_path: {JAR_PATH}")
+logger = logging.getLogger(__name__)
 
 
 def run_tokenizer(jar_path, input_text, legacy_tagger=False, java_args={}):
@@ -31,12 +22,12 @@ def run_tokenizer(jar_path, input_text, legacy_tagger=False, java_args={}):
     :param output_format: The desired output format ('json' or 'xml').
     :return: The output from tokenizer.
     """
-    logger.debug(f"Running Tokenizer with input: {input_text}")
+    logger.debug("Running Tokenizer with input: %s", utils.Preview(input_text))
 
     tokens = utils.call_icenlp_jar(
         jar_path, "tokenizer", input_text, java_args=java_args
     )
-    logger.debug(f"Tokenizer output: {tokens}")
+    logger.debug("Tokenizer output: %s", utils.Preview(tokens))
 
     return tokens
 
@@ -44,16 +35,89 @@ def run_tokenizer(jar_path, input_text, legacy_tagger=False, java_args={}):
 def tokenize(
     input_text: Union[List[str], str],
     args={"of": 2},
+    backend="jvm",
+    cache=None,
 ):
     """
     Parses the given text using IceParser and returns the output in the specified format.
 
     :param input_text: The text to parse. The standard format is a list of strings, where each string is a sentence.
     :param output_format: The desired output format ('json' or 'xml').
+    :param backend: ``"jvm"`` runs IceNLP's tokenizer, in the embedded JVM of
+        ``icenlpy.bridge`` if JPype is installed, ``"python"`` tokenizes in-process
+        with the same lexicon (see ``icenlpy.pytokenizer``), without starting a JVM.
+    :param cache: A ``ResultCache``, ``False`` for no caching, or ``None`` for the
+        process-wide cache. The tokenizer output is cached for the whole input text.
     :return: Parsed output from IceParser.
     """
     text = "\n".join(input_text) if isinstance(input_text, list) else input_text
-    tokenized_text = run_tokenizer(JAR_PATH, text, java_args=args)
+    if backend == "python":
+        return (
+            iter(sentence) for sentence in _python_tokenizer(args).tokenize(text)
+        )
+    _check_backend(backend)
+    result_cache = caching.resolve_cache(cache)
+    if result_cache is None:
+        # In the embedded JVM the tokens are read directly, not from text
+        sentences = bridge.attempt("tokenizer", args, "tokenize", text)
+        if sentences is not None:
+            return (iter(tokens) for tokens in sentences)
+    with metrics.span("tokenize", backend=backend) as span:
+        # Sentences can span input lines, so the whole text is the unit of caching
+        (tokenized_text,) = caching.cached_apply(
+            result_cache,
+            "tokenizer",
+            [text],
+            lambda texts: [run_tokenizer(get_jar_path(), texts[0], java_args=args)],
+            java_args=args,
+        )
+        if span.recording:
+            stripped = tokenized_text.strip()
+            span.set(
+                sentences=stripped.count("\n") + 1 if stripped else 0,
+                tokens=len(stripped.split()),
+            )
+    return _split_tokens(tokenized_text)
+
+
+def _check_backend(backend: str):
+    if backend not in ("jvm", "python"):
+        raise ValueError(f"Unknown tokenizer backend: {backend}")
+
+
+def _python_tokenizer(args: dict) -> pytokenizer.Tokenizer:
+    """Return the in-process tokenizer matching the given tokenizer arguments."""
+    # Only plain text is read, not the other input formats of -if
+    unsupported = set(args) - {"of", "ns"}
+    if unsupported:
+        raise ValueError(
+            f"Arguments not supported by the python tokenizer: {', '.join(sorted(unsupported))}"
+        )
+    return pytokenizer.get_tokenizer(strict=not args.get("ns", False))
+
+
+async def atokenize(
+    input_text: Union[List[str], str],
+    args={"of": 2},
+    timeout=None,
+):
+    """
+    Asynchronous version of ``tokenize``.
+
+    The JVM is run with ``asyncio.create_subprocess_exec``, so the event loop is
+    not blocked while it works. If the call is cancelled or takes longer than
+    ``timeout`` seconds, the JVM is killed.
+
+    :param timeout: Maximum number of seconds to wait for the tokenizer.
+    """
+    text = "\n".join(input_text) if isinstance(input_text, list) else input_text
+    tokenized_text = await utils.acall_icenlp_jar(
+        get_jar_path(), "tokenizer", text, java_args=args, timeout=timeout
+    )
+    return _split_tokens(tokenized_text)
+
+
+def _split_tokens(tokenized_text: str):
     # for each sentence, return a generator of tokens
     return (
         (token for token in sentence.split())
@@ -61,15 +125,37 @@ def tokenize(
     )
 
 
-def split_into_sentences(text: str) -> List[str]:
+def split_into_sentences(text: str, backend="jvm") -> List[str]:
     """
     Splits the given text into sentences using IceNLP's sentence splitter.
 
     :param text: The text to split into sentences.
+    :param backend: ``"jvm"`` or ``"python"``, see ``tokenize``.
     :return: A list of sentences.
     """
+    if backend == "python":
+        return pytokenizer.get_tokenizer().split_into_sentences(text)
+    _check_backend(backend)
     return (
-        utils.call_icenlp_jar(JAR_PATH, "tokenizer", text, java_args={"of": 2})
+        utils.call_icenlp_jar(get_jar_path(), "tokenizer", text, java_args={"of": 2})
         .strip()
         .split("\n")
     )
+
+
+def iter_tokenize(
+    input_text: Iterable[str],
+    args={"of": 2},
+) -> Iterator[List[str]]:
+    """
+    Tokenizes a stream of text, yielding each sentence as soon as the tokenizer emits it.
+
+    :param input_text: An iterable of strings, e.g. an open file.
+    :param args: Arguments passed on to the tokenizer. The output format must be one sentence per line.
+    :return: A generator of token lists, one per sentence.
+    """
+    for sentence in utils.stream_icenlp_jar(
+        get_jar_path(), "tokenizer", input_text, java_args=args
+    ):
+        if sentence.strip():
+            yield sentence.split()
@@ -1,8 +1,10 @@
 import re
+import sys
 import logging
 import string
 
-from typing import List, Union, TypeVar, Generator
+from array import array
+from typing import Iterable, Iterator, List, TextIO, Union, TypeVar, Generator
 
 TPhrase = TypeVar("TPhrase", bound="Phrase")
 
@@ -12,6 +14,8 @@ logger = logging.getLogger(__name__)
 class TerminalNode:
     """A basic representation of a token-tag pair in the phrase structure"""
 
+    __slots__ = ("word", "tag")
+
     def __init__(self, word: str, tag: str):
         self.word = word
         self.tag = tag
@@ -26,6 +30,8 @@ class TerminalNode:
 class PunctuationNode(TerminalNode):
     """A specialized representation for punctuation in the phrase structure."""
 
+    __slots__ = ("label",)
+
     def __init__(self, punctuation: str, tag: str = "punct"):
         # Initialize the base class with the punctuation as both the word and tag
         super().__init__(punctuation, tag)
@@ -39,6 +45,8 @@ class PunctuationNode(TerminalNode):
 class Phrase:
     """A phrase in a parsed sentence"""
 
+    __slots__ = ("label", "elements")
+
     def __init__(
         self: TPhrase,
         label: str,
@@ -61,7 +69,7 @@ class Phrase:
             self.add_child(child)
 
     def __str__(self):
-        return f"[{self.label} {' '.join(str(e) for e in self.elements)} ]"
+        return _render_brackets([self])
 
     def __repr__(self):
         return self.__str__()
@@ -69,6 +77,59 @@ class Phrase:
 
 TopLevelElement = Union[Phrase, PunctuationNode]
 
+# Marks the end of a phrase on the rendering stacks below
+_CLOSE = object()
+
+
+def _render_brackets(elements: Iterable[Union[Phrase, TerminalNode]]) -> str:
+    """Render elements in IceParser's bracket format, e.g. "[NP ein det ] . pl"."""
+    parts: List[str] = []
+    stack = list(reversed(list(elements)))
+    while stack:
+        element = stack.pop()
+        if element is _CLOSE:
+            parts.append("]")
+        elif isinstance(element, Phrase):
+            children = element.elements
+            parts.append(f"[{element.label}")
+            if not children:
+                parts.append("")
+            stack.append(_CLOSE)
+            stack.extend(reversed(children))
+        else:
+            parts.append(f"{element.word} {element.tag}")
+    return " ".join(parts)
+
+
+def _iter_view_lines(elements: Iterable[Union[Phrase, TerminalNode]]) -> Iterator[str]:
+    """Yield the lines of the indented tree view, under a dummy "S0" root."""
+    yield "S0\n"
+    indents = ["+-"]
+    stack = [(element, 0) for element in reversed(list(elements))]
+    pop, push = stack.pop, stack.append
+    while stack:
+        element, depth = pop()
+        if depth == len(indents):
+            indents.append("  " * depth + "+-")
+        if isinstance(element, Phrase):
+            yield f"{indents[depth]}{element.label}\n"
+            for child in reversed(element.elements):
+                push((child, depth + 1))
+        elif isinstance(element, TerminalNode):
+            # TerminalNode processing, including PunctuationNode
+            yield f"{indents[depth]}{element.tag}: '{element.word}'\n"
+        else:
+            yield f"{indents[depth]}Unknown element\n"
+
+
+# Phrase brackets. A bracket followed by a space and a punctuation tag ("[ pa")
+# is a token in the sentence rather than part of the structure.
+_BRACKETS = re.compile(r"\[(?!\s)|\](?! p[a-z]\b)")
+# Punctuation outside of phrases, followed by itself or a "pX" tag, e.g. ", ," or ". pl"
+_TOP_LEVEL_PUNCTUATION = re.compile(
+    r"([{}]) (?:\1|p[lkga])".format(re.escape(string.punctuation))
+)
+
 # NOTE: (From the paper)
 # Additionally, for some of the syntactic functionlabels (see table 2), we use relative position
 # indica-tors (“<” and “>”). For example, *SUBJ> meansthat the verb is positioned to the right of
@@ -80,166 +141,319 @@ TopLevelElement = Union[Phrase, PunctuationNode]
 
 class IceNLPySentence:
 
+    # Rendered strings are cached, call clear_cache() after changing the tree
+    __slots__ = ("top_level_elements", "phrases", "_brackets", "_view_text")
+
     def __init__(self, input_data, *args, **kwargs):
-        self._tokens = []
+        self._brackets = None
+        self._view_text = None
         if isinstance(input_data, str):
             self.top_level_elements: List[TopLevelElement] = self._parse_from_string(
                 input_data.strip()
             )
-        elif all(isinstance(p, Phrase) for p in input_data):
-            self.top_level_elements: List[TopLevelElement] = input_data
+        elif all(isinstance(p, (Phrase, TerminalNode)) for p in input_data):
+            self.top_level_elements: List[TopLevelElement] = list(input_data)
         else:
             raise ValueError("Input must be a string or a list of Phrase objects")
         self.phrases = [el for el in self.top_level_elements if isinstance(el, Phrase)]
 
     def _parse_from_string(self, input_str: str) -> List[TopLevelElement]:
-        stack = []
-        found = []
-        current_element = ""
-        i = 0
-        logger.debug(f"Processing input string: {input_str}")
-        while i < len(input_str):
-            char = input_str[i]
-            if char == "[":  # Start of a phrase
-                current_element += char
-                stack.append(char)
-            elif char == "]":  # End of a phrase
-                stack.pop()
-                current_element += char
-                if not stack:  # End of top-level phrase
-                    found.append(self._parse_element(current_element))
-                    current_element = ""
-            elif not stack:
-                # Check for ", ," pattern
-                if (
-                    char in string.punctuation
-                    and i + 2 < len(input_str)
-                    and input_str[i + 1] == " "
-                    and input_str[i + 2] == char
-                ):
-                    if current_element:  # Add any pending phrase
-                        found.append(self._parse_element(current_element))
-                        current_element = ""
-                    # Capture the pattern and advance the index
-                    self._tokens.append(char)
-                    found.append(PunctuationNode(char, char))
-                    i += 2  # Skip the next two characters
-                # Check for ", pX" pattern
-                elif (
-                    char in string.punctuation
-                    and i + 3 < len(input_str)
-                    and input_str[i + 1] == " "
-                    and input_str[i + 2] == "p"
-                    and input_str[i + 3] in "lkga"
-                ):
-                    if current_element:
-                        found.append(self._parse_element(current_element))
-                        current_element = ""
-                    # Capture the pattern and advance the index
-                    self._tokens.append(char)
-                    found.append(PunctuationNode(char, input_str[i + 2 : i + 4]))
-                    i += 3  # Skip the next three characters
-            else:  # Accumulate characters
-                current_element += char
-
-            i += 1
-        # Add any remaining element
-        if current_element:
-            found.append(self._parse_element(current_element))
+        """
+        Build the phrase tree from IceParser's bracketed output in a single pass.
+
+        The string is split at the brackets only. Text between brackets is either
+        a phrase label followed by word-tag pairs (inside a phrase) or, at the top
+        level, text in which only punctuation tokens (", ," or ", pk") are kept.
+        """
+        found: List[TopLevelElement] = []
+        stack: List[Phrase] = []
+        expect_label = False
+        pos = 0
+        logger.debug("Processing input string: %s", input_str)
+
+        def consume(segment: str):
+            nonlocal expect_label
+            if not stack:
+                for match in _TOP_LEVEL_PUNCTUATION.finditer(segment):
+                    punctuation = match.group(1)
+                    found.append(PunctuationNode(punctuation, match.group(0)[2:]))
+                return
+            words = segment.split()
+            if expect_label:
+                expect_label = False
+                if words:
+                    stack[-1].label = words[0]
+                    words = words[1:]
+            phrase = stack[-1]
+            # A word without a tag is dropped, as is a word directly before a bracket
+            for idx in range(1, len(words), 2):
+                phrase.elements.append(TerminalNode(words[idx - 1], words[idx]))
+
+        for match in _BRACKETS.finditer(input_str):
+            consume(input_str[pos : match.start()])
+            pos = match.end()
+            if match.group() == "[":
+                phrase = Phrase("")
+                if stack:
+                    stack[-1].elements.append(phrase)
+                stack.append(phrase)
+                expect_label = True
+            else:
+                if not stack:
+                    raise ValueError(f"Unbalanced closing bracket at position {match.start()}")
+                expect_label = False
+                phrase = stack.pop()
+                if not stack:
+                    found.append(phrase)
+        consume(input_str[pos:])
+        # An unclosed phrase is kept as if it had been closed at the end
+        if stack:
+            found.append(stack[0])
         return found
 
-    def _parse_element(self, element: str) -> TopLevelElement:
-        if element.strip().startswith("["):
-            return self._parse_phrase(element)
+    def _view(self) -> str:
+        """Return a string containing an indented map of the sentence"""
+        return "".join(_iter_view_lines(self.top_level_elements))
+
+    @property
+    def view(self) -> str:
+        if self._view_text is None:
+            self._view_text = self._view()
+        return self._view_text
+
+    def write_view(self, fp: TextIO):
+        """Write the tree view to a file object, one line at a time."""
+        if self._view_text is not None:
+            fp.write(self._view_text)
         else:
-            return PunctuationNode(*element.split())
-
-    def _parse_phrase(self, phrase_str: str) -> Phrase:
-        phrase_stack = []
-        current_element = ""
-        current_label = ""
-        elements = []
-
-        label, content = phrase_str.split(maxsplit=1)
-        phrase = Phrase(label.strip("["))
-        content = content.strip("]")
-        i = 0
-
-        while i < len(content):
-            char = content[i]
-
-            if char == "[":
-                if not phrase_stack:  # Start of a new element
-                    current_label = i
-                phrase_stack.append(char)
-            elif char == "]":
-                phrase_stack.pop()
-                if not phrase_stack:  # End of a nested phrase
-                    nested_phrase_str = content[current_label : i + 1]
-                    elements.append(nested_phrase_str)
-                    current_element = ""
+            fp.writelines(_iter_view_lines(self.top_level_elements))
+
+    @property
+    def text(self) -> str:
+        return " ".join(self.tokens())
+
+    def tokens(self) -> Generator[str, None, None]:
+        for node in self.terminals():
+            yield node.word
+
+    def terminals(self) -> Iterator[TerminalNode]:
+        """Iterate over the terminal nodes of the sentence in reading order."""
+        stack = list(reversed(self.top_level_elements))
+        while stack:
+            element = stack.pop()
+            if isinstance(element, Phrase):
+                stack.extend(reversed(element.elements))
             else:
-                if not phrase_stack:  # Accumulating characters for a terminal node
-                    current_element += char
+                yield element
+
+    def pack(self) -> "PackedSentence":
+        """Return a compact, read-only copy of this sentence. See PackedSentence."""
+        return PackedSentence.from_sentence(self)
+
+    def clear_cache(self):
+        """Forget the rendered strings, e.g. after phrases have been modified."""
+        self._brackets = None
+        self._view_text = None
+
+    def __str__(self):
+        if self._brackets is None:
+            self._brackets = _render_brackets(self.top_level_elements)
+        return self._brackets
 
-            if not phrase_stack and (char == " " or i == len(content) - 1):
-                # Handling a terminal node outside nested phrases
-                if current_element.strip() and len(current_element.split()) == 2:
-                    elements.append(current_element.strip())
-                    current_element = ""
+    def __repr__(self):
+        return f"[{self.__str__()}]"
 
-            i += 1
 
-        # Process accumulated elements
-        for element in elements:
-            if element.startswith("["):
-                phrase.add_child(self._parse_phrase(element[1:-1]))
+# Node kinds in a PackedSentence
+PHRASE, TERMINAL, PUNCTUATION = 0, 1, 2
+
+
+class PackedSentence:
+    """
+    A compact, read-only representation of a parsed sentence.
+
+    The nodes of the tree are stored in pre-order in parallel columns: the node
+    kind, its value (the phrase label or the word), its tag, the index of its
+    parent (-1 for top-level nodes) and the index where its subtree ends. All
+    strings are interned, so tags, labels and frequent words are shared across
+    every sentence in a corpus.
+
+    The usual node API is available through lazy views: ``top_level_elements``,
+    ``phrases`` and the ``elements`` of each phrase are built from the columns on
+    access. Use ``unpack`` to get a regular, mutable IceNLPySentence back.
+    """
+
+    __slots__ = ("kinds", "values", "tags", "parents", "ends", "_brackets", "_view_text")
+
+    def __init__(self, kinds: bytes, values, tags, parents: array, ends: array):
+        self._brackets = None
+        self._view_text = None
+        self.kinds = kinds
+        self.values = tuple(values)
+        self.tags = tuple(tags)
+        self.parents = parents
+        self.ends = ends
+
+    @classmethod
+    def from_sentence(cls, sentence: IceNLPySentence) -> "PackedSentence":
+        kinds = bytearray()
+        values: List[str] = []
+        tags: List[str] = []
+        parents = array("i")
+        ends = array("i")
+        intern = sys.intern
+
+        # Each stack item is (element, parent index, whether it has been visited)
+        stack = [(el, -1, False) for el in reversed(sentence.top_level_elements)]
+        while stack:
+            element, parent, visited = stack.pop()
+            if visited:
+                ends[parent] = len(kinds)
+                continue
+            index = len(kinds)
+            parents.append(parent)
+            ends.append(index + 1)
+            if isinstance(element, Phrase):
+                kinds.append(PHRASE)
+                values.append(intern(element.label))
+                tags.append("")
+                # Marks the end of the phrase's subtree once its children are done
+                stack.append((element, index, True))
+                stack.extend((child, index, False) for child in reversed(element.elements))
             else:
-                word, tag = element.split(maxsplit=1)
-                self._tokens.append(word)
-                phrase.add_child(TerminalNode(word, tag))
+                kinds.append(PUNCTUATION if isinstance(element, PunctuationNode) else TERMINAL)
+                values.append(intern(element.word))
+                tags.append(intern(element.tag))
+        return cls(bytes(kinds), values, tags, parents, ends)
+
+    def __len__(self) -> int:
+        """The number of nodes in the sentence."""
+        return len(self.kinds)
+
+    def children(self, index: int) -> Iterator[int]:
+        """Iterate over the node indices of the children of node ``index``."""
+        child = index + 1
+        end = self.ends[index]
+        while child < end:
+            yield child
+            child = self.ends[child]
+
+    def top_level_indices(self) -> Iterator[int]:
+        index = 0
+        while index < len(self.kinds):
+            yield index
+            index = self.ends[index]
+
+    def node(self, index: int) -> Union[Phrase, TerminalNode]:
+        """Return a lazy view of node ``index``."""
+        kind = self.kinds[index]
+        if kind == PHRASE:
+            return PhraseView(self, index)
+        if kind == PUNCTUATION:
+            return PunctuationView(self, index)
+        return TerminalView(self, index)
 
-        return phrase
+    @property
+    def top_level_elements(self) -> List[TopLevelElement]:
+        return [self.node(index) for index in self.top_level_indices()]
 
-    def _view(self, element=None, level: int = 0) -> str:
-        """Return a string containing an indented map of this subtree"""
-        if element is None and level == 0:
-            # When called without an element and at the root level, introduce the dummy root
-            return "S0\n" + "\n".join(
-                self._view(el, 1) for el in self.top_level_elements
-            ).replace("\n\n", "\n")
+    @property
+    def phrases(self) -> List[Phrase]:
+        return [
+            self.node(index)
+            for index in self.top_level_indices()
+            if self.kinds[index] == PHRASE
+        ]
+
+    def terminals(self) -> Iterator[TerminalNode]:
+        for index, kind in enumerate(self.kinds):
+            if kind != PHRASE:
+                yield self.node(index)
 
-        if isinstance(element, Phrase):
-            # Phrase processing
-            indent = "  " * (level - 1) + "+-" if level else ""
-            result = f"{indent}{element.label}\n"
-            for child in element.elements:
-                result += self._view(child, level + 1)
-        elif isinstance(element, TerminalNode):
-            # TerminalNode processing, including PunctuationNode
-            indent = "  " * (level - 1) + "+-"
-            result = f"{indent}{element.tag}: '{element.word}'\n"
-        else:
-            # Fallback for any unrecognized element
-            indent = "  " * (level - 1) + "+-"
-            result = f"{indent}Unknown element\n"
+    def tokens(self) -> Generator[str, None, None]:
+        for index, kind in enumerate(self.kinds):
+            if kind != PHRASE:
+                yield self.values[index]
+
+    def unpack(self) -> IceNLPySentence:
+        """Materialize the sentence as regular node objects."""
+
+        def build(index):
+            kind = self.kinds[index]
+            if kind == PHRASE:
+                return Phrase(self.values[index], [build(c) for c in self.children(index)])
+            if kind == PUNCTUATION:
+                return PunctuationNode(self.values[index], self.tags[index])
+            return TerminalNode(self.values[index], self.tags[index])
+
+        return IceNLPySentence([build(index) for index in self.top_level_indices()])
+
+    view = IceNLPySentence.view
+    write_view = IceNLPySentence.write_view
+    text = IceNLPySentence.text
+    _view = IceNLPySentence._view
+    __str__ = IceNLPySentence.__str__
+    __repr__ = IceNLPySentence.__repr__
+
+
+class _NodeView:
+    """Mixin for read-only views of a node in a PackedSentence."""
+
+    __slots__ = ()
 
-        return result
+    def __init__(self, packed: PackedSentence, index: int):
+        self._packed = packed
+        self._index = index
+
+    def __eq__(self, other):
+        if isinstance(other, _NodeView):
+            return self._packed is other._packed and self._index == other._index
+        return NotImplemented
+
+    def __hash__(self):
+        return hash((id(self._packed), self._index))
+
+
+class PhraseView(_NodeView, Phrase):
+    """A phrase of a PackedSentence. Its elements are views as well."""
+
+    __slots__ = ("_packed", "_index")
 
     @property
-    def view(self) -> str:
-        return self._view()
+    def label(self) -> str:
+        return self._packed.values[self._index]
 
     @property
-    def text(self) -> str:
-        return " ".join(self.tokens())
+    def elements(self) -> List[Union[Phrase, TerminalNode]]:
+        packed = self._packed
+        return [packed.node(child) for child in packed.children(self._index)]
 
-    def tokens(self) -> Generator[str, None, None]:
-        for token in self._tokens:
-            yield token
+    def add_child(self, child):
+        raise TypeError("Packed sentences are read-only, unpack() the sentence first")
 
-    def __str__(self):
-        return " ".join(str(el) for el in self.top_level_elements)
 
-    def __repr__(self):
-        return f"[{self.__str__()}]"
+class TerminalView(_NodeView, TerminalNode):
+    """A terminal node of a PackedSentence."""
+
+    __slots__ = ("_packed", "_index")
+
+    @property
+    def word(self) -> str:
+        return self._packed.values[self._index]
+
+    @property
+    def tag(self) -> str:
+        return self._packed.tags[self._index]
+
+
+class PunctuationView(_NodeView, PunctuationNode):
+    """A punctuation node of a PackedSentence."""
+
+    __slots__ = ("_packed", "_index")
+
+    word = TerminalView.word
+    tag = TerminalView.tag
+
+    @property
+    def label(self) -> str:
+        return "punct"
@@ -0,0 +1,381 @@
+"""
+An in-process trigram HMM tagger using the TriTagger model shipped with IceNLP.
+
+The model in ``resources/IceNLP/ngrams/models`` consists of a lexicon of word
+and tag frequencies (``otb.lex``), tag n-gram frequencies (``otb.ngram``) and
+the weights used to interpolate them (``otb.lambda``). As in TnT, on which
+TriTagger is based, the probability of a tag given the two preceding tags is a
+linear interpolation of unigram, bigram and trigram estimates, and the tags of
+unknown words are guessed from their suffixes.
+
+The model is loaded once per process into NumPy arrays: tags are interned to
+integer ids, bigram counts form a dense matrix and trigram counts a sorted
+array of packed keys. Each sentence is decoded with a second-order Viterbi
+search over the candidate tags of its words, where all transitions between
+the candidates of three consecutive words are computed in one vectorized step.
+
+This requires NumPy, which is an optional dependency (``pip install icenlpy[hmm]``).
+"""
+
+import re
+import bisect
+import logging
+
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+logger = logging.getLogger(__name__)
+
+MODEL_DIR = Path(__file__).parent / "resources/IceNLP/ngrams/models"
+
+# The tag of the sentence boundary in the n-gram model
+BOUNDARY = "__$"
+# Unknown words are guessed from the words of at most this frequency...
+RARE_FREQUENCY = 10
+# ...sharing a suffix of at most this length
+MAX_SUFFIX = 10
+# Number of tags kept for an unknown word
+MAX_GUESSES = 20
+
+# Number classes of the lexicon, in the order they are tried
+_NUMBER_CLASSES = (
+    ("@CARD", re.compile(r"\d+")),
+    ("@CARDSEPS", re.compile(r"\d+(?:[.,:/]\d+)+")),
+    ("@CARDPUNCT", re.compile(r"\d+[.,:]")),
+    ("@CARDSUFFIX", re.compile(r"\d[\d.,:/]*\w+")),
+)
+
+# Punctuation missing from the model, mapped to the model's tag for the same use
+_PUNCTUATION_ALIASES = {
+    "„": "»",
+    "“": "«",
+    '"': "»",
+    "—": "-",
+    "–": "-",
+    "…": "...",
+}
+
+# The model tags punctuation with the punctuation itself, as IceTagger does.
+# The revised tagset of MIM-GOLD uses these tags instead.
+PUNCTUATION_TAGS = {
+    ".": "pl",
+    "!": "pl",
+    "?": "pl",
+    "...": "pl",
+    ",": "pk",
+    ";": "pk",
+    "»": "pg",
+    "«": "pg",
+}
+_DEFAULT_PUNCTUATION_TAG = "pa"
+# Prepositions governing the accusative, dative and genitive
+_PREPOSITION_TAGS = {"ao", "aþ", "ae"}
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError(
+            "The hmm tagger requires NumPy. Install it with: pip install icenlpy[hmm]"
+        )
+
+
+def read_lambdas(path) -> Dict[str, float]:
+    """Read the interpolation weights, e.g. ``{"lambdaTri1": 0.10, ...}``."""
+    lambdas = {}
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            if "=" in line:
+                name, value = line.strip().split("=", 1)
+                lambdas[name] = float(value)
+    return lambdas
+
+
+class TriTagger:
+    """
+    A trigram HMM tagger.
+
+    :param model_dir: The directory of the model files.
+    :param model: The name of the model, i.e. the prefix of the ``.lex``, ``.ngram`` and ``.lambda`` files.
+    """
+
+    def __init__(self, model_dir=MODEL_DIR, model: str = "otb"):
+        _require_numpy()
+        model_dir = Path(model_dir)
+        self._load_ngrams(model_dir / f"{model}.ngram")
+        self._load_lexicon(model_dir / f"{model}.lex")
+
+        lambdas = read_lambdas(model_dir / f"{model}.lambda")
+        self.lambdas = (lambdas["lambdaTri1"], lambdas["lambdaTri2"], lambdas["lambdaTri3"])
+        self._boundary = self.tag_ids[BOUNDARY]
+
+        # Smoothing of the suffix probabilities: the standard deviation of the
+        # unconditioned tag probabilities, as in TnT
+        self._theta = float(np.std(self._unigram_prob))
+
+    def _load_ngrams(self, path: Path):
+        unigrams: Dict[str, int] = {}
+        bigrams: List[Tuple[str, str, int]] = []
+        trigrams: List[Tuple[str, str, str, int]] = []
+        with open(path, "r", encoding="utf-8") as file:
+            for line in file:
+                fields = line.split()
+                if len(fields) == 2:
+                    unigrams[fields[0]] = int(fields[1])
+                elif len(fields) == 3:
+                    bigrams.append((fields[0], fields[1], int(fields[2])))
+                elif len(fields) == 4:
+                    trigrams.append((fields[0], fields[1], fields[2], int(fields[3])))
+
+        self.tags: List[str] = sorted(unigrams)
+        self.tag_ids: Dict[str, int] = {tag: idx for idx, tag in enumerate(self.tags)}
+        n_tags = len(self.tags)
+        ids = self.tag_ids
+
+        self._unigrams = np.array([unigrams[tag] for tag in self.tags], dtype=np.float64)
+        self._unigram_prob = self._unigrams / self._unigrams.sum()
+        self._bigrams = np.zeros((n_tags, n_tags), dtype=np.float64)
+        for first, second, count in bigrams:
+            self._bigrams[ids[first], ids[second]] = count
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self._bigram_prob = np.nan_to_num(self._bigrams / self._unigrams[:, None])
+
+        # Trigrams are packed into a single integer key, sorted for binary search
+        keys = np.fromiter(
+            ((ids[a] * n_tags + ids[b]) * n_tags + ids[c] for a, b, c, _ in trigrams),
+            dtype=np.int64,
+            count=len(trigrams),
+        )
+        counts = np.fromiter((t[3] for t in trigrams), dtype=np.float64, count=len(trigrams))
+        order = np.argsort(keys)
+        self._trigram_keys = keys[order]
+        self._trigram_counts = counts[order]
+
+    def _load_lexicon(self, path: Path):
+        ids = self.tag_ids
+        # word -> (tag ids, tag counts)
+        self.lexicon: Dict[str, Tuple["np.ndarray", "np.ndarray"]] = {}
+        # Rare words by capitalization, for guessing the tags of unknown words
+        rare: Tuple[List, List] = ([], [])
+        with open(path, "r", encoding="utf-8") as file:
+            for line in file:
+                fields = line.split()
+                if len(fields) < 4:
+                    continue
+                word = fields[0]
+                pairs = [
+                    (ids[fields[i]], int(fields[i + 1]))
+                    for i in range(2, len(fields) - 1, 2)
+                    if fields[i] in ids
+                ]
+                if not pairs:
+                    continue
+                tag_ids = np.array([tag for tag, _ in pairs], dtype=np.int64)
+                counts = np.array([count for _, count in pairs], dtype=np.float64)
+                self.lexicon[word] = (tag_ids, counts)
+                if int(fields[1]) <= RARE_FREQUENCY and not word.startswith("@"):
+                    rare[word[:1].isupper()].append((word[::-1], tag_ids, counts))
+
+        # The rare words of each class, sorted by their reversed spelling, so that
+        # the words sharing a suffix form a contiguous range. Their tag counts are
+        # flattened into one array with an offset per word.
+        self._suffix_index = []
+        for words in rare:
+            words.sort(key=lambda item: item[0])
+            offsets = np.zeros(len(words) + 1, dtype=np.int64)
+            np.cumsum([len(tags) for _, tags, _ in words], out=offsets[1:])
+            self._suffix_index.append(
+                (
+                    [reversed_word for reversed_word, _, _ in words],
+                    offsets,
+                    np.concatenate([tags for _, tags, _ in words]),
+                    np.concatenate([counts for _, _, counts in words]),
+                )
+            )
+
+    def _suffix_counts(self, capitalized: bool, suffix: str) -> "np.ndarray":
+        """Tag counts of the rare words ending in ``suffix``."""
+        reversed_words, offsets, tags, counts = self._suffix_index[capitalized]
+        key = suffix[::-1]
+        start = bisect.bisect_left(reversed_words, key)
+        end = bisect.bisect_left(reversed_words, key + "\U0010ffff", start)
+        return np.bincount(
+            tags[offsets[start] : offsets[end]],
+            weights=counts[offsets[start] : offsets[end]],
+            minlength=len(self.tags),
+        )
+
+    @lru_cache(maxsize=100_000)
+    def _guess(self, word: str) -> Tuple["np.ndarray", "np.ndarray"]:
+        """Guess the tags of an unknown word from its suffix, returning (tag ids, log emissions)."""
+        capitalized = word[:1].isupper()
+        prob = self._unigram_prob
+        for length in range(1, min(MAX_SUFFIX, len(word)) + 1):
+            counts = self._suffix_counts(capitalized, word[-length:])
+            total = counts.sum()
+            if total == 0:
+                break
+            prob = (counts / total + self._theta * prob) / (1 + self._theta)
+        # P(word | tag) is proportional to P(tag | suffix) / P(tag)
+        prob = prob.copy()
+        prob[self._boundary] = 0
+        top = np.argsort(prob)[::-1][:MAX_GUESSES]
+        top = top[prob[top] > 0]
+        return top, np.log(prob[top] / self._unigram_prob[top])
+
+    def _lookup(self, word: str, first: bool):
+        entry = self.lexicon.get(word)
+        lowered = word.lower()
+        if (first or word.isupper()) and lowered != word and lowered in self.lexicon:
+            # A capitalized word at the start of a sentence is usually an ordinary word
+            lower_entry = self.lexicon[lowered]
+            if entry is None:
+                entry = lower_entry
+            else:
+                entry = (
+                    np.concatenate([entry[0], lower_entry[0]]),
+                    np.concatenate([entry[1], lower_entry[1]]),
+                )
+        return entry
+
+    def candidates(self, word: str, first: bool = False) -> Tuple["np.ndarray", "np.ndarray"]:
+        """
+        Return the possible tags of a word along with their log emission probabilities.
+
+        :param word: The word.
+        :param first: Whether the word starts a sentence.
+        :return: A tuple of (tag ids, log P(word | tag)) arrays.
+        """
+        entry = self._lookup(word, first)
+        if entry is None:
+            for name, pattern in _NUMBER_CLASSES:
+                if pattern.fullmatch(word) and name in self.lexicon:
+                    entry = self.lexicon[name]
+                    break
+        if entry is None and word in _PUNCTUATION_ALIASES:
+            entry = self.lexicon.get(_PUNCTUATION_ALIASES[word])
+        if entry is None:
+            return self._guess(word)
+
+        tag_ids, counts = entry
+        if len(np.unique(tag_ids)) != len(tag_ids):
+            merged = np.bincount(tag_ids, weights=counts, minlength=len(self.tags))
+            tag_ids = np.flatnonzero(merged)
+            counts = merged[tag_ids]
+        return tag_ids, np.log(counts / self._unigrams[tag_ids])
+
+    def _log_transitions(self, first, second, third) -> "np.ndarray":
+        """log P(t3 | t1, t2) for all combinations, shaped (len(first), len(second), len(third))."""
+        n_tags = len(self.tags)
+        uni_weight, bi_weight, tri_weight = self.lambdas
+        keys = (first[:, None, None] * n_tags + second[None, :, None]) * n_tags + third[
+            None, None, :
+        ]
+        positions = np.searchsorted(self._trigram_keys, keys)
+        positions[positions == len(self._trigram_keys)] = 0
+        tri_counts = np.where(
+            self._trigram_keys[positions] == keys, self._trigram_counts[positions], 0.0
+        )
+        history = self._bigrams[first[:, None], second[None, :]][:, :, None]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            tri_prob = np.where(history > 0, tri_counts / history, 0.0)
+        prob = (
+            uni_weight * self._unigram_prob[third][None, None, :]
+            + bi_weight * self._bigram_prob[second[:, None], third[None, :]][None, :, :]
+            + tri_weight * tri_prob
+        )
+        with np.errstate(divide="ignore"):
+            return np.log(prob)
+
+    def tag(self, tokens: Sequence[str]) -> List[str]:
+        """
+        Tag a single sentence.
+
+        :param tokens: The tokens of the sentence.
+        :return: The most probable tag of each token, in the model's tagset.
+        """
+        if not tokens:
+            return []
+        boundary = np.array([self._boundary], dtype=np.int64)
+        lattice = [self.candidates(token, first=idx == 0) for idx, token in enumerate(tokens)]
+
+        # scores[a, b]: the best log probability of a path ending in the tags
+        # a and b of the two previous words
+        previous, current = boundary, boundary
+        scores = np.zeros((1, 1))
+        backpointers = []
+        for tag_ids, emissions in lattice:
+            step = (
+                scores[:, :, None]
+                + self._log_transitions(previous, current, tag_ids)
+                + emissions[None, None, :]
+            )
+            best = step.argmax(axis=0)
+            backpointers.append(best)
+            scores = np.take_along_axis(step, best[None, :, :], axis=0)[0]
+            previous, current = current, tag_ids
+
+        final = scores + self._log_transitions(previous, current, boundary)[:, :, 0]
+        b, c = np.unravel_index(final.argmax(), final.shape)
+
+        # Follow the backpointers from the last word to the first
+        path = [c, b]
+        for best in reversed(backpointers[2:]):
+            path.append(best[path[-1], path[-2]])
+        path.reverse()
+        path = path[-len(tokens) :]
+        return [self.tags[lattice[idx][0][tag]] for idx, tag in enumerate(path)]
+
+    def tag_sentences(self, sentences: Iterable[Sequence[str]]) -> List[List[str]]:
+        """
+        Tag several sentences, one at a time with ``tag``.
+
+        The guesses for unknown words are memoized by the tagger, so a word that
+        recurs in the sentences, or in later calls, is only guessed once.
+        """
+        return [self.tag(tokens) for tokens in sentences]
+
+
+def to_icetagger_tag(word: str, tag: str) -> str:
+    """
+    Map a tag of the model to the tag IceTagger would give the word.
+
+    The model and IceTagger share the tagset of the Icelandic Frequency
+    Dictionary, but the model tags punctuation missing from it with the tag of
+    similar punctuation (see ``_PUNCTUATION_ALIASES``), while IceTagger tags
+    punctuation with itself.
+    """
+    if tag[:1].isalnum():
+        return tag
+    return word
+
+
+def to_revised_tag(word: str, tag: str) -> str:
+    """
+    Map a tag of the model to the revised tagset, as used in MIM-GOLD.
+
+    In the revised tagset prepositions are "af" rather than marked for case,
+    the supine is a neuter past participle, "sem" is a relativizer and
+    punctuation has "p" tags.
+    """
+    if tag in _PREPOSITION_TAGS:
+        return "af"
+    if tag.startswith("ss"):
+        return f"sþ{tag[2:]}hen"
+    if tag == "c" and word.lower() == "sem":
+        return "ct"
+    if tag[:1].isalnum():
+        return tag
+    return PUNCTUATION_TAGS.get(_PUNCTUATION_ALIASES.get(tag, tag), _DEFAULT_PUNCTUATION_TAG)
+
+
+@lru_cache(maxsize=None)
+def get_tagger(model_dir=MODEL_DIR, model: str = "otb") -> TriTagger:
+    """Return a TriTagger for the given model, loading it only once per process."""
+    logger.debug(f"Loading the {model} model from {model_dir}")
+    return TriTagger(model_dir, model)
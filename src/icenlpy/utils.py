@@ -1,11 +1,32 @@
+import os
 import shlex
+import shutil
 import subprocess
 import logging
+import threading
+import weakref
 
+from functools import lru_cache
 from pathlib import Path
+from time import perf_counter
+from typing import TYPE_CHECKING, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import icenlpy.jvm as jvm
+import icenlpy.bridge as bridge
+import icenlpy.metrics as metrics
+import icenlpy.workers as workers
+
+from icenlpy import get_jar_path
+
+if TYPE_CHECKING:
+    # asyncio is slow to import, it is imported where the asynchronous API needs it
+    import asyncio
 
 logger = logging.getLogger(__name__)
 
+# Longest part of a runner's input or output that is logged, see ``Preview``
+LOG_PREVIEW_CHARS = 200
+
 ICENLP_CLASS_MAP = {
     "tagger": "RunIceTagger",
     "parser": "RunIceParser",
@@ -13,16 +34,81 @@ ICENLP_CLASS_MAP = {
 }
 
 
-def call_icenlp_jar(jar_path: str, target: str, input_text: str, java_args={}):
-    jar_class_target = ICENLP_CLASS_MAP[target]
-    # java_command = f"java -classpath {shlex.quote(jar_path)} is.iclt.icenlp.runner.{jar_class_target}"
+class Preview:
+    """
+    A truncated view of a possibly very long text, for log messages.
+
+    The text is only cut when the message is formatted, so passing
+    ``Preview(output)`` as a %-style argument costs nothing when the level is
+    disabled::
+
+        logger.debug("IceTagger output: %s", Preview(tagged))
+
+    :param text: The text, e.g. a runner's whole input or output.
+    :param limit: Number of characters shown. Defaults to ``LOG_PREVIEW_CHARS``.
+    """
+
+    __slots__ = ("text", "limit")
+
+    def __init__(self, text: str, limit: Optional[int] = None):
+        self.text = text
+        self.limit = LOG_PREVIEW_CHARS if limit is None else limit
+
+    def __str__(self):
+        text = self.text
+        if len(text) <= self.limit:
+            return text
+        return f"{text[: self.limit]}... ({len(text)} characters)"
 
-    # logger.debug(f"Running {jar_class_target} with command: {java_command}")
+
+def format_command(command: Sequence[str]) -> str:
+    """Return a command as it would be typed in a shell."""
+    return " ".join(shlex.quote(part) for part in command)
+
+
+@lru_cache(maxsize=None)
+def find_java() -> Optional[str]:
+    """
+    Return the java executable used to start the runners, or None if there is none.
+
+    ``$JAVA_HOME/bin/java`` is used if it exists, otherwise the first ``java``
+    on the PATH. The result is cached, call ``find_java.cache_clear()`` after
+    installing Java in a running process.
+    """
+    java_home = os.environ.get("JAVA_HOME")
+    if java_home:
+        java = shutil.which("java", path=os.path.join(java_home, "bin"))
+        if java:
+            return java
+    java = shutil.which("java")
+    logger.debug("Using java executable: %s", java)
+    return java
+
+
+def build_command(
+    jar_path: str, target: str, java_args={}, jvm_options: Optional[Sequence[str]] = None
+) -> List[str]:
+    """
+    Build the command line for one of the IceNLP runner classes.
+
+    :param jar_path: Path to the IceNLPCore.jar file.
+    :param target: One of the keys of ``ICENLP_CLASS_MAP``.
+    :param java_args: Arguments passed on to the runner, e.g. ``{"lf": 3}``.
+    :param jvm_options: Options for the JVM. Defaults to those of the launch
+        profile and AppCDS archive in use, see ``icenlpy.jvm``.
+    :return: The command as a list of arguments.
+    """
+    jar_class_target = ICENLP_CLASS_MAP[target]
+    # Without a java executable, starting the runner fails with a clear error
+    java = find_java() or "java"
+    if jvm_options is None:
+        jvm_options = jvm.launch_options(jar_path, target, java)
 
     command = [
-        "java",
+        java,
+        *jvm_options,
         "-classpath",
-        jar_path,
+        str(jar_path),
         f"is.iclt.icenlp.runner.{jar_class_target}",
     ]
 
@@ -35,28 +121,421 @@ def call_icenlp_jar(jar_path: str, target: str, input_text: str, java_args={}):
             # For key-value pairs, add both the flag and its value
             command.extend([f"-{arg}", str(value)])
 
-    logger.debug(
-        f"Running {jar_class_target} with command: {' '.join(shlex.quote(part) for part in command)}"
-    )
+    return command
+
+
+def call_icenlp_jar(
+    jar_path: str, target: str, input_text: str, java_args={}, use_pool=True
+):
+    """
+    Run an IceNLP runner on the given input and return its output.
 
-    process = subprocess.Popen(
-        " ".join(command),
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        shell=True,
-        text=True,
-    )
+    By default the process is taken from the warm worker pool (see
+    ``icenlpy.workers``), so JVM startup is paid ahead of time rather than
+    on the call itself.
 
-    output, errors = process.communicate(input=input_text)
+    :param jar_path: Path to the IceNLPCore.jar file.
+    :param target: One of the keys of ``ICENLP_CLASS_MAP``.
+    :param input_text: Text written to the runner's stdin.
+    :param java_args: Arguments passed on to the runner.
+    :param use_pool: Set to ``False`` to always spawn a fresh process.
+    :return: The runner's stdout.
+    """
+    jar_class_target = ICENLP_CLASS_MAP[target]
+    command = build_command(jar_path, target, java_args)
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Running %s with command: %s", jar_class_target, format_command(command))
+
+    with metrics.span(f"jvm.{target}", runner=jar_class_target) as span:
+        if jar_path == get_jar_path():
+            output = bridge.attempt(target, java_args, "run", target, input_text, java_args)
+            if output is not None:
+                if span.recording:
+                    span.set(
+                        backend="jpype",
+                        bytes_in=len(input_text.encode("utf-8")),
+                        bytes_out=len(output.encode("utf-8")),
+                    )
+                return output
+
+        start = perf_counter()
+        pool = workers.get_pool() if use_pool else None
+        if pool is not None:
+            worker = pool.acquire(command)
+        else:
+            worker = workers.JVMWorker(command)
+        acquired = perf_counter()
+
+        output, errors, returncode = worker.run(input_text)
 
-    if process.returncode != 0:
-        logger.error(f"{jar_class_target} Error: {errors}")
-        raise Exception(f"{jar_class_target} Error: {errors}")
+        if span.recording:
+            span.set(
+                warm=worker.warm,
+                acquire_seconds=acquired - start,
+                run_seconds=perf_counter() - acquired,
+                bytes_in=len(input_text.encode("utf-8")),
+                bytes_out=len(output.encode("utf-8")) if output else 0,
+            )
+
+        if returncode != 0:
+            logger.error("%s Error: %s", jar_class_target, errors)
+            raise Exception(f"{jar_class_target} Error: {errors}")
 
     return output
 
 
+def stream_icenlp_jar(
+    jar_path: str, target: str, lines: Iterable[str], java_args={}, use_pool=True
+) -> Iterator[str]:
+    """
+    Run an IceNLP runner on a stream of input lines and yield its output lines.
+
+    The input is written to the runner's stdin from a separate thread while the
+    output is read as the runner produces it, so neither side is ever held in
+    memory as a whole. Closing the generator early kills the runner.
+
+    :param jar_path: Path to the IceNLPCore.jar file.
+    :param target: One of the keys of ``ICENLP_CLASS_MAP``.
+    :param lines: Input lines. A newline is added to lines that lack one.
+    :param java_args: Arguments passed on to the runner.
+    :param use_pool: Set to ``False`` to always spawn a fresh process.
+    :return: A generator of output lines, without their trailing newline.
+    """
+    jar_class_target = ICENLP_CLASS_MAP[target]
+    command = build_command(jar_path, target, java_args)
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Streaming %s with command: %s", jar_class_target, format_command(command))
+
+    pool = workers.get_pool() if use_pool else None
+    worker = pool.acquire(command) if pool is not None else workers.JVMWorker(command)
+    process = worker.process
+
+    errors: List[str] = []
+    writer_errors: List[BaseException] = []
+
+    def write_input():
+        try:
+            for line in lines:
+                try:
+                    process.stdin.write(line if line.endswith("\n") else line + "\n")
+                except (BrokenPipeError, ValueError):
+                    # The runner exited early, its return code tells the rest of the story
+                    break
+        except BaseException as e:
+            writer_errors.append(e)
+        finally:
+            try:
+                process.stdin.close()
+            except (BrokenPipeError, OSError):
+                pass
+
+    def read_errors():
+        for line in process.stderr:
+            errors.append(line)
+
+    def read_output():
+        try:
+            for line in process.stdout:
+                yield line.rstrip("\n")
+            process.wait()
+            writer.join()
+            error_reader.join()
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+
+        if writer_errors:
+            raise writer_errors[0]
+
+        if process.returncode != 0:
+            error_text = "".join(errors)
+            logger.error("%s Error: %s", jar_class_target, error_text)
+            raise Exception(f"{jar_class_target} Error: {error_text}")
+
+    # The threads are started right away rather than on the first read, so that
+    # the input is consumed even before anyone asks for output
+    writer = threading.Thread(target=write_input, daemon=True)
+    error_reader = threading.Thread(target=read_errors, daemon=True)
+    writer.start()
+    error_reader.start()
+
+    return read_output()
+
+
+def pipe_icenlp_jars(
+    jar_path: str,
+    steps: Sequence[Tuple[str, dict]],
+    input_text: str,
+    keep_intermediate=False,
+) -> List[Optional[str]]:
+    """
+    Run several IceNLP runners as a pipeline, like ``tagger | parser`` in a shell.
+
+    All runners are started at once and each one's stdout is connected to the
+    next one's stdin by an OS pipe, so the intermediate output never passes
+    through Python and the runners work on the text at the same time.
+
+    :param jar_path: Path to the IceNLPCore.jar file.
+    :param steps: ``(target, java_args)`` pairs, in the order the text goes through them.
+    :param input_text: Text written to the first runner's stdin.
+    :param keep_intermediate: Also return the output of every runner but the
+        last. It is then relayed from one runner to the next by a Python thread.
+    :return: The output of each runner. Unless ``keep_intermediate`` is set,
+        only the last one is given, the others are ``None``.
+    """
+    if not steps:
+        raise ValueError("The pipeline needs at least one step")
+
+    if jar_path == get_jar_path():
+        outputs = _pipe_through_bridge(steps, input_text)
+        if outputs is not None:
+            return outputs if keep_intermediate else [None] * (len(steps) - 1) + outputs[-1:]
+    commands = [build_command(jar_path, target, java_args) for target, java_args in steps]
+    classes = [ICENLP_CLASS_MAP[target] for target, _ in steps]
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "Running pipeline: %s, input: %s",
+            " | ".join(format_command(command) for command in commands),
+            Preview(input_text),
+        )
+
+    outputs: List[Optional[str]] = [None] * len(steps)
+    errors: List[List[str]] = [[] for _ in steps]
+    thread_errors: List[BaseException] = []
+    processes: List[subprocess.Popen] = []
+    threads: List[threading.Thread] = []
+
+    def start_thread(target, *args):
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        thread.start()
+        threads.append(thread)
+
+    def feed(stdin, chunks: Iterable[str]):
+        try:
+            for chunk in chunks:
+                stdin.write(chunk)
+        except (BrokenPipeError, ValueError):
+            # The runner exited early, its return code tells the rest of the story
+            pass
+        except BaseException as e:
+            thread_errors.append(e)
+        finally:
+            try:
+                stdin.close()
+            except (BrokenPipeError, OSError):
+                pass
+
+    def relay(idx: int, stdout, stdin):
+        kept: List[str] = []
+        try:
+            for line in stdout:
+                kept.append(line)
+                if stdin is None:
+                    continue
+                try:
+                    stdin.write(line)
+                except (BrokenPipeError, ValueError):
+                    # The next runner exited early, keep draining this one so it can exit too
+                    stdin = None
+        except BaseException as e:
+            thread_errors.append(e)
+        finally:
+            outputs[idx] = "".join(kept)
+            try:
+                if stdin is not None:
+                    stdin.close()
+            except (BrokenPipeError, OSError):
+                pass
+
+    def read_errors(idx: int, stderr):
+        for line in stderr:
+            errors[idx].append(line)
+
+    with metrics.span("jvm.pipeline", runner=" | ".join(classes)) as span:
+        try:
+            for idx, command in enumerate(commands):
+                direct = idx > 0 and not keep_intermediate
+                process = subprocess.Popen(
+                    command,
+                    stdin=processes[-1].stdout if direct else subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    text=True,
+                    encoding="utf-8",
+                )
+                metrics.inc("icenlpy_jvm_spawns_total", runner=classes[idx])
+                if direct:
+                    # Only the runners hold the pipe now, so that they see each other exit
+                    processes[-1].stdout.close()
+                processes.append(process)
+                start_thread(read_errors, idx, process.stderr)
+
+            start_thread(feed, processes[0].stdin, [input_text])
+            if keep_intermediate:
+                for idx in range(len(processes) - 1):
+                    start_thread(relay, idx, processes[idx].stdout, processes[idx + 1].stdin)
+
+            outputs[-1] = processes[-1].stdout.read()
+            for process in processes:
+                process.wait()
+            for thread in threads:
+                thread.join()
+        finally:
+            for process in processes:
+                if process.poll() is None:
+                    process.kill()
+                    process.wait()
+
+        if thread_errors:
+            raise thread_errors[0]
+
+        # A runner that fails takes the runners before it down with a broken pipe,
+        # so the last failing runner is the one to blame
+        for jar_class_target, process, error_lines in reversed(
+            list(zip(classes, processes, errors))
+        ):
+            if process.returncode != 0:
+                error_text = "".join(error_lines)
+                logger.error("%s Error: %s", jar_class_target, error_text)
+                raise Exception(f"{jar_class_target} Error: {error_text}")
+
+        if span.recording:
+            span.set(
+                bytes_in=len(input_text.encode("utf-8")),
+                bytes_out=len(outputs[-1].encode("utf-8")) if outputs[-1] else 0,
+            )
+
+    return outputs
+
+
+def _pipe_through_bridge(
+    steps: Sequence[Tuple[str, dict]], input_text: str
+) -> Optional[List[Optional[str]]]:
+    """Run every step of a pipeline in the embedded JVM, or return None if it can't."""
+    if not all(bridge.available(target, java_args) for target, java_args in steps):
+        return None
+    outputs: List[Optional[str]] = []
+    text = input_text
+    with metrics.span("jvm.pipeline", backend="jpype") as span:
+        for target, java_args in steps:
+            text = bridge.attempt(target, java_args, "run", target, text, java_args)
+            if text is None:
+                return None
+            outputs.append(text)
+        if span.recording:
+            span.set(
+                bytes_in=len(input_text.encode("utf-8")),
+                bytes_out=len(text.encode("utf-8")),
+            )
+    return outputs
+
+
+# Maximum number of concurrent JVMs started by the asyncio API, per event loop
+_async_concurrency = int(os.environ.get("ICENLPY_ASYNC_CONCURRENCY", os.cpu_count() or 1))
+_async_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def set_async_concurrency(limit: int):
+    """Set the maximum number of JVMs the asyncio API runs at the same time."""
+    global _async_concurrency
+    if limit < 1:
+        raise ValueError("The concurrency limit must be a positive integer")
+    _async_concurrency = limit
+    _async_semaphores.clear()
+
+
+def _async_semaphore() -> "asyncio.Semaphore":
+    import asyncio
+
+    # Semaphores are bound to the loop they are first used in, so keep one per loop
+    loop = asyncio.get_running_loop()
+    semaphore = _async_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _async_semaphores[loop] = asyncio.Semaphore(_async_concurrency)
+    return semaphore
+
+
+async def acall_icenlp_jar(
+    jar_path: str,
+    target: str,
+    input_text: str,
+    java_args={},
+    timeout: Optional[float] = None,
+) -> str:
+    """
+    Asynchronous version of ``call_icenlp_jar``.
+
+    The runner is started with ``asyncio.create_subprocess_exec`` so the event
+    loop is never blocked. At most ``set_async_concurrency`` runners are alive
+    at a time; further calls wait for a free slot. If the call times out or is
+    cancelled, the runner is killed.
+
+    Calls to the embedded JVM of ``icenlpy.bridge`` run in a thread, within the
+    same limit and timeout. A bridge call that times out can't be killed, it
+    finishes in its thread after the timeout is raised.
+
+    :param timeout: Maximum number of seconds to wait for the runner.
+    :return: The runner's stdout.
+    """
+    jar_class_target = ICENLP_CLASS_MAP[target]
+    command = build_command(jar_path, target, java_args)
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Running %s with command: %s", jar_class_target, format_command(command))
+
+    import asyncio
+
+    if jar_path == get_jar_path() and bridge.available(target, java_args):
+        # The embedded JVM runs in a thread, so that the event loop is not blocked
+        async with _async_semaphore():
+            return await asyncio.wait_for(
+                asyncio.get_running_loop().run_in_executor(
+                    None, call_icenlp_jar, jar_path, target, input_text, java_args
+                ),
+                timeout,
+            )
+
+    with metrics.span(f"jvm.{target}", runner=jar_class_target, warm=False) as span:
+        start = perf_counter()
+        input_bytes = input_text.encode("utf-8")
+        async with _async_semaphore():
+            acquired = perf_counter()
+            metrics.inc("icenlpy_jvm_spawns_total", runner=jar_class_target)
+            process = await asyncio.create_subprocess_exec(
+                *command,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            try:
+                output, errors = await asyncio.wait_for(process.communicate(input_bytes), timeout)
+            except BaseException:
+                if process.returncode is None:
+                    process.kill()
+                    await asyncio.shield(process.wait())
+                raise
+
+        span.set(
+            acquire_seconds=acquired - start,
+            run_seconds=perf_counter() - acquired,
+            bytes_in=len(input_bytes),
+            bytes_out=len(output),
+        )
+
+        if process.returncode != 0:
+            error_text = errors.decode("utf-8", errors="replace")
+            logger.error("%s Error: %s", jar_class_target, error_text)
+            raise Exception(f"{jar_class_target} Error: {error_text}")
+
+    return output.decode("utf-8")
+
+
 def get_ice_nlp_path():
     """Get the path to the IceNLP directory."""
     # Assuming this function is in a file at the root of the icenlpy package
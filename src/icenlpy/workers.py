@@ -0,0 +1,341 @@
+"""
+A pool of pre-spawned IceNLP runner processes.
+
+The IceNLP runners (``RunIceTagger``, ``RunIceParser``, ``RunTokenizer``) read
+their whole input from stdin and exit at EOF, so a single process can only serve
+one request. What dominates short calls is not the request itself but JVM
+startup, class loading and the loading of the dictionaries. The pool hides that
+cost by keeping warm processes around: each one is started ahead of time and
+sits blocked on stdin, having already booted while the previous request was
+being served. When a request comes in, an idle worker is handed out and a
+replacement is spawned right away.
+
+Idle workers are recycled after ``max_idle`` seconds. While the pool holds
+idle workers, a daemon thread checks them periodically and kills the stale
+ones, so an unused pool does not keep its JVMs around for the life of the
+process; they are spawned again on the next call.
+"""
+
+import os
+import atexit
+import logging
+import threading
+import subprocess
+
+from collections import deque
+from time import monotonic
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+
+import icenlpy.metrics as metrics
+
+logger = logging.getLogger(__name__)
+
+CommandKey = Tuple[str, ...]
+
+DEFAULT_POOL_SIZE = 1
+DEFAULT_MAX_IDLE = 300.0
+# Bounds on the seconds between the checks for stale idle workers
+MIN_REAP_INTERVAL = 1.0
+MAX_REAP_INTERVAL = 60.0
+
+_RUNNER_PREFIX = "is.iclt.icenlp.runner."
+
+
+def spawn_process(command: Sequence[str]) -> subprocess.Popen:
+    """Start an IceNLP runner with all three standard streams piped."""
+    return subprocess.Popen(
+        list(command),
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        encoding="utf-8",
+    )
+
+
+class JVMWorker:
+    """A single runner process waiting for its input on stdin."""
+
+    def __init__(self, command: Sequence[str]):
+        self.command: CommandKey = tuple(command)
+        self.created = monotonic()
+        # Set by the pool when the worker is handed out having booted ahead of the call
+        self.warm = False
+        self.process = spawn_process(self.command)
+        metrics.inc("icenlpy_jvm_spawns_total", runner=self.runner)
+
+    @property
+    def runner(self) -> str:
+        """The name of the IceNLP runner class, e.g. ``RunIceTagger``."""
+        for part in self.command:
+            if part.startswith(_RUNNER_PREFIX):
+                return part[len(_RUNNER_PREFIX) :]
+        return "unknown"
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    def is_alive(self) -> bool:
+        return self.process.poll() is None
+
+    def age(self) -> float:
+        return monotonic() - self.created
+
+    def run(self, input_text: str, timeout: Optional[float] = None):
+        """
+        Send the input to the worker and wait for it to finish.
+
+        :param input_text: The complete input for the runner.
+        :param timeout: Seconds to wait before the worker is killed.
+        :return: A tuple of (stdout, stderr, returncode).
+        """
+        try:
+            output, errors = self.process.communicate(input=input_text, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self.kill()
+            raise
+        return output, errors, self.process.returncode
+
+    def kill(self):
+        if self.is_alive():
+            self.process.kill()
+        try:
+            self.process.communicate(timeout=5)
+        except (subprocess.TimeoutExpired, ValueError, OSError):
+            pass
+
+    def __repr__(self):
+        return f"JVMWorker(pid={self.pid}, alive={self.is_alive()})"
+
+
+class WorkerPool:
+    """
+    Keeps up to ``size`` warm workers for every distinct runner command.
+
+    Workers are keyed by their full command line, so a tagger started with
+    ``-lf 3`` is never handed out for a call that asked for ``-lf 2``.
+
+    Idle workers older than ``max_idle`` seconds are killed by a daemon thread
+    that runs while the pool holds idle workers, see ``reap_interval``.
+    """
+
+    def __init__(self, size: int = DEFAULT_POOL_SIZE, max_idle: float = DEFAULT_MAX_IDLE):
+        if size < 0:
+            raise ValueError("Pool size must be zero or a positive integer")
+        self.size = size
+        self.max_idle = max_idle
+        self._idle: Dict[CommandKey, Deque[JVMWorker]] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        self._reaper: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self.spawned = 0
+        self.restarted = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _spawn(self, key: CommandKey) -> JVMWorker:
+        worker = JVMWorker(key)
+        self.spawned += 1
+        logger.debug("Spawned worker %s for %s", worker.pid, key[-1])
+        return worker
+
+    def _prune(self, key: CommandKey) -> int:
+        """Drop dead or stale idle workers for ``key``. Returns the number dropped."""
+        workers = self._idle.get(key)
+        if not workers:
+            return 0
+        healthy = deque()
+        dropped = 0
+        for worker in workers:
+            if worker.is_alive() and worker.age() < self.max_idle:
+                healthy.append(worker)
+            else:
+                if not worker.is_alive():
+                    logger.warning(
+                        "Idle worker %s exited with code %s, replacing it",
+                        worker.pid,
+                        worker.process.returncode,
+                    )
+                    self.restarted += 1
+                worker.kill()
+                dropped += 1
+        self._idle[key] = healthy
+        return dropped
+
+    def _fill(self, key: CommandKey):
+        workers = self._idle.setdefault(key, deque())
+        while len(workers) < self.size:
+            workers.append(self._spawn(key))
+        if workers and self._reaper is None:
+            self._reaper = threading.Thread(
+                target=self._reap, name="icenlpy-worker-reaper", daemon=True
+            )
+            self._reaper.start()
+
+    @property
+    def reap_interval(self) -> float:
+        """Seconds between the checks for stale idle workers, half of ``max_idle`` within bounds."""
+        return min(max(self.max_idle / 2, MIN_REAP_INTERVAL), MAX_REAP_INTERVAL)
+
+    def _reap(self):
+        """Kill stale idle workers until the pool is shut down or has none left."""
+        while not self._stopped.wait(self.reap_interval):
+            report = self.health_check(refill=False)
+            if report["dropped"]:
+                logger.debug("Reaped %d idle workers", report["dropped"])
+            with self._lock:
+                # Checked under the lock, so that _fill starts a new thread once this one is done
+                if self._closed or not any(self._idle.values()):
+                    self._reaper = None
+                    return
+
+    def acquire(self, command: Sequence[str]) -> JVMWorker:
+        """
+        Hand out a warm worker for ``command`` and spawn its replacement.
+
+        If no healthy idle worker is available a fresh one is started, so the
+        call never blocks on the pool itself.
+        """
+        key = tuple(command)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("The worker pool has been shut down")
+            self._prune(key)
+            workers = self._idle.get(key)
+            if workers:
+                worker = workers.popleft()
+                worker.warm = True
+                self.hits += 1
+            else:
+                worker = self._spawn(key)
+                self.misses += 1
+            self._fill(key)
+        return worker
+
+    def warm(self, command: Sequence[str]):
+        """Start ``size`` idle workers for ``command`` ahead of the first call."""
+        key = tuple(command)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("The worker pool has been shut down")
+            self._prune(key)
+            self._fill(key)
+
+    def health_check(self, refill=True) -> Dict[str, int]:
+        """
+        Drop dead or stale workers across all commands in the pool.
+
+        :param refill: Spawn replacements for the dropped workers. Without it,
+            they are spawned on the next call for their command.
+        :return: The number of workers dropped and of idle workers left.
+        """
+        with self._lock:
+            if self._closed:
+                return {"dropped": 0, "alive": 0}
+            dropped = sum(self._prune(key) for key in list(self._idle))
+            if refill:
+                for key in list(self._idle):
+                    self._fill(key)
+            alive = sum(len(workers) for workers in self._idle.values())
+        return {"dropped": dropped, "alive": alive}
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            idle = sum(len(workers) for workers in self._idle.values())
+        return {
+            "idle": idle,
+            "spawned": self.spawned,
+            "restarted": self.restarted,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def shutdown(self):
+        """Kill every idle worker. The pool can not be used afterwards."""
+        with self._lock:
+            self._closed = True
+            self._stopped.set()
+            workers: List[JVMWorker] = [
+                worker for queue in self._idle.values() for worker in queue
+            ]
+            self._idle.clear()
+        for worker in workers:
+            worker.kill()
+        if workers:
+            logger.debug("Shut down %d idle workers", len(workers))
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+
+_pool: Optional[WorkerPool] = None
+_pool_lock = threading.Lock()
+_pool_enabled = os.environ.get("ICENLPY_POOL", "1") != "0"
+
+
+def get_pool() -> Optional[WorkerPool]:
+    """
+    Return the process-wide worker pool, creating it on first use.
+
+    Returns ``None`` if pooling has been disabled with ``configure_pool`` or the
+    ``ICENLPY_POOL=0`` environment variable.
+    """
+    global _pool
+    if not _pool_enabled:
+        return None
+    with _pool_lock:
+        if _pool is None or _pool.closed:
+            size = int(os.environ.get("ICENLPY_POOL_SIZE", DEFAULT_POOL_SIZE))
+            _pool = WorkerPool(size=size)
+        return _pool
+
+
+def configure_pool(
+    size: Optional[int] = None,
+    max_idle: Optional[float] = None,
+    enabled: Optional[bool] = None,
+) -> Optional[WorkerPool]:
+    """
+    Reconfigure the process-wide worker pool.
+
+    The current pool is shut down and a new one is created with the given
+    settings on the next call.
+
+    :param size: Number of warm workers kept per runner command.
+    :param max_idle: Seconds an idle worker is kept before it is recycled.
+    :param enabled: Set to ``False`` to spawn a fresh process for every call.
+    :return: The new pool, or ``None`` if pooling is disabled.
+    """
+    global _pool, _pool_enabled
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+        if enabled is not None:
+            _pool_enabled = enabled
+        _pool = None
+        if not _pool_enabled:
+            return None
+        _pool = WorkerPool(
+            size=DEFAULT_POOL_SIZE if size is None else size,
+            max_idle=DEFAULT_MAX_IDLE if max_idle is None else max_idle,
+        )
+        return _pool
+
+
+def shutdown_pool():
+    """Kill all idle workers of the process-wide pool."""
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+
+
+atexit.register(shutdown_pool)
@@ -0,0 +1,57 @@
+import sys
+
+import pytest
+
+# A stand-in for the IceNLP runners, used to exercise the process handling
+# without a Java runtime. The tokenizer splits on whitespace, the tagger tags
+# every token with "x" and the parser wraps each sentence in a single phrase.
+# Like the real runners, they write one sentence per line.
+FAKE_RUNNER = r"""
+import sys
+import time
+
+target = sys.argv[1]
+args = sys.argv[2:]
+if "-crash" in args:
+    sys.stderr.write("fake runner crashed")
+    sys.exit(3)
+if "-sleep" in args:
+    time.sleep(float(args[args.index("-sleep") + 1]))
+lines = sys.stdin
+if target == "tagger" and "-lf" in args and args[args.index("-lf") + 1] == "1":
+    # One token per line, with an empty line between sentences
+    lines = [" ".join(block.split()) + "\n" for block in sys.stdin.read().split("\n\n")]
+for line in lines:
+    tokens = line.split()
+    if target == "tokenizer":
+        sys.stdout.write(" ".join(tokens) + "\n")
+    elif target == "tagger":
+        sys.stdout.write(" ".join(f"{token} x" for token in tokens) + "\n")
+    elif target == "parser":
+        sys.stdout.write(f"[X {line.strip()} ]\n" if tokens else "\n")
+    sys.stdout.flush()
+"""
+
+
+def fake_command(jar_path, target, java_args={}):
+    command = [sys.executable, "-c", FAKE_RUNNER, target]
+    for arg, value in java_args.items():
+        command.append(f"-{arg}")
+        if value is not True:
+            command.append(str(value))
+    return command
+
+
+@pytest.fixture
+def fake_jvm(monkeypatch):
+    """Replace the java command line with the fake runner above."""
+    import icenlpy.utils
+    import icenlpy.bridge
+    import icenlpy.workers
+
+    monkeypatch.setattr(icenlpy.utils, "build_command", fake_command)
+    # The fake runner only stands in for processes, not for an embedded JVM
+    monkeypatch.setattr(icenlpy.bridge, "_bridge_enabled", False)
+    icenlpy.workers.configure_pool(size=1)
+    yield fake_command
+    icenlpy.workers.configure_pool(size=1)
@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from icenlpy import benchmark
+
+
+def test_percentile():
+    assert benchmark.percentile([], 50) == 0.0
+    assert benchmark.percentile([3.0, 1.0, 2.0], 50) == 2.0
+    assert benchmark.percentile([1.0, 2.0], 50) == 1.5
+    assert benchmark.percentile(list(range(101)), 99) == 99
+
+
+def test_load_corpus():
+    dev = benchmark.load_corpus("dev")
+    assert len(dev) == 4508
+    assert dev[0].tokens == ["Styrkir", "og", "sjóðir"]
+    assert dev[0].tagged_text == "Styrkir nkfn og c sjóðir nkfn"
+
+    mogginn = benchmark.load_corpus("mogginn", limit=2)
+    assert len(mogginn) == 2
+    assert mogginn[0].tags is None
+    assert mogginn[0].tokens[:2] == ["Hópur", "nokkurra"]
+
+
+def test_run_benchmarks_in_process_stages(monkeypatch):
+    monkeypatch.setattr(benchmark, "jvm_available", lambda: False)
+    results = benchmark.run_benchmarks(
+        stages=["tokenizer-python", "tree", "tagger"], batch_sizes=[1, 7], limit=20
+    )
+    json.dumps(results)
+
+    assert results["metadata"]["corpus_sentences"] == 20
+    assert "skipped" in results["stages"]["tagger"]
+    runs = results["stages"]["tree"]["runs"]
+    assert [run["batch_size"] for run in runs] == [1, 7]
+    assert [run["batches"] for run in runs] == [20, 3]
+    for run in runs + results["stages"]["tokenizer-python"]["runs"]:
+        assert run["sentences"] == 20
+        assert run["tokens"] > 20
+        assert run["latency_p50_ms"] <= run["latency_p99_ms"]
+
+
+def test_run_benchmarks_parser(fake_jvm, monkeypatch):
+    monkeypatch.setattr(benchmark, "jvm_available", lambda: True)
+    results = benchmark.run_benchmarks(stages=["parser"], batch_sizes=[5], limit=10)
+    (run,) = results["stages"]["parser"]["runs"]
+    assert run["sentences"] == 10
+    assert run["batches"] == 2
+
+    results = benchmark.run_benchmarks(stages=["parser", "tree"], corpus="mogginn", limit=1)
+    assert "skipped" in results["stages"]["parser"]
+    assert "skipped" in results["stages"]["tree"]
+
+
+def test_run_benchmarks_rejects_unknown_stage():
+    with pytest.raises(ValueError):
+        benchmark.run_benchmarks(stages=["lemmatizer"])
+
+
+def test_compare_results():
+    def results(tokens_per_sec):
+        return {"stages": {"tree": {"runs": [{"batch_size": 1, "tokens_per_sec": tokens_per_sec}]}}}
+
+    assert benchmark.compare_results(results(100), results(95)) == []
+    (regression,) = benchmark.compare_results(results(100), results(50))
+    assert regression.startswith("tree (batch size 1)")
@@ -0,0 +1,146 @@
+import os
+import time
+import asyncio
+import threading
+
+import pytest
+
+from icenlpy import bridge, get_jar_path, icetagger, tokenizer, utils
+
+
+class FakeBridge:
+    """Stands in for the Java objects of ``bridge.Bridge``."""
+
+    def __init__(self):
+        self.calls = []
+
+    def tokenize(self, text):
+        self.calls.append(("tokenize", text))
+        return [line.split() for line in text.split("\n") if line.strip()]
+
+    def tag(self, text):
+        self.calls.append(("tag", text))
+        return [[(token, "jp") for token in tokens] for tokens in self.tokenize(text)]
+
+    def parse(self, tagged_text, functions=False):
+        self.calls.append(("parse", tagged_text))
+        return [f"[JP {line} ]" for line in tagged_text.split("\n") if line.strip()]
+
+    run = bridge.Bridge.run
+
+
+class BrokenBridge(FakeBridge):
+    def tag(self, text):
+        raise RuntimeError("java.lang.NullPointerException")
+
+
+@pytest.fixture
+def fake_bridge(monkeypatch):
+    fake = FakeBridge()
+    monkeypatch.setattr(bridge, "_bridge", fake)
+    monkeypatch.setattr(bridge, "_bridge_failed", False)
+    monkeypatch.setattr(bridge, "_bridge_enabled", True)
+    return fake
+
+
+@pytest.mark.parametrize(
+    "target, java_args, supported",
+    [
+        ("tokenizer", {"of": 2}, True),
+        ("tokenizer", {"of": "2"}, True),
+        ("tokenizer", {"of": 1}, False),
+        ("tokenizer", {}, False),
+        ("tagger", {"lf": 3}, True),
+        ("tagger", {"lf": 3, "sf": True}, False),
+        ("parser", {}, True),
+        ("parser", {"f": True}, True),
+        ("parser", {"l": True}, False),
+        ("lemmald", {}, False),
+    ],
+)
+def test_supports_args(target, java_args, supported):
+    assert bridge.supports_args(target, java_args) is supported
+
+
+def test_no_bridge_when_disabled(monkeypatch):
+    monkeypatch.setattr(bridge, "_bridge", FakeBridge())
+    monkeypatch.setattr(bridge, "_bridge_enabled", False)
+    assert bridge.get_bridge() is None
+    assert bridge.attempt("tagger", {"lf": 3}, "tag", "Hann") is None
+
+
+def test_calls_go_through_the_bridge(fake_bridge):
+    output = utils.call_icenlp_jar(get_jar_path(), "tagger", "Hann fór", {"lf": 3})
+    assert output == "Hann jp fór jp\n"
+    assert fake_bridge.calls == [("tag", "Hann fór"), ("tokenize", "Hann fór")]
+
+    outputs = utils.pipe_icenlp_jars(
+        get_jar_path(), [("tagger", {"lf": 3}), ("parser", {})], "Hann fór"
+    )
+    assert outputs == [None, "[JP Hann jp fór jp ]\n"]
+
+
+def test_structured_results_skip_the_text_format(fake_bridge):
+    assert icetagger.tag_text(["Hann fór"], cache=False, return_tags_only=True) == (
+        ("jp", "jp"),
+    )
+    assert [list(tokens) for tokens in tokenizer.tokenize("Hann fór", cache=False)] == [
+        ["Hann", "fór"]
+    ]
+
+
+def test_unsupported_args_use_a_runner(fake_jvm, fake_bridge):
+    assert utils.call_icenlp_jar(get_jar_path(), "tagger", "Hann fór", {"lf": 2}) == (
+        "Hann x fór x\n"
+    )
+    assert fake_bridge.calls == []
+
+
+def test_errors_turn_the_bridge_off(fake_jvm, monkeypatch):
+    monkeypatch.setattr(bridge, "_bridge", BrokenBridge())
+    monkeypatch.setattr(bridge, "_bridge_failed", False)
+    monkeypatch.setattr(bridge, "_bridge_enabled", True)
+    output = utils.call_icenlp_jar(get_jar_path(), "tagger", "Hann fór", {"lf": 3})
+    assert output == "Hann x fór x\n"
+    assert bridge.get_bridge() is None
+
+
+
+class SlowBridge(FakeBridge):
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+
+    def tag(self, text):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(0.2)
+        with self.lock:
+            self.running -= 1
+        return super().tag(text)
+
+
+def test_async_bridge_calls_keep_the_limits(monkeypatch):
+    slow = SlowBridge()
+    monkeypatch.setattr(bridge, "_bridge", slow)
+    monkeypatch.setattr(bridge, "_bridge_failed", False)
+    monkeypatch.setattr(bridge, "_bridge_enabled", True)
+    acall = utils.acall_icenlp_jar
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(acall(get_jar_path(), "tagger", "Hann", {"lf": 3}, timeout=0.05))
+
+    async def main():
+        return await asyncio.gather(
+            *(acall(get_jar_path(), "tagger", "Hann", {"lf": 3}) for _ in range(3))
+        )
+
+    utils.set_async_concurrency(1)
+    try:
+        assert asyncio.run(main()) == ["Hann jp\n"] * 3
+        assert slow.peak == 1
+    finally:
+        utils.set_async_concurrency(os.cpu_count() or 1)
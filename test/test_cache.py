@@ -0,0 +1,105 @@
+import pytest
+
+from icenlpy import cache as caching
+from icenlpy import iceparser, icetagger, tokenizer
+from icenlpy.cache import ResultCache, cached_apply, make_key
+from icenlpy.workers import get_pool
+
+
+def jvm_calls():
+    stats = get_pool().stats()
+    return stats["hits"] + stats["misses"]
+
+
+def test_make_key():
+    key = make_key("parser", "Hann fpken", {"f": True})
+    assert key == make_key("parser", "Hann fpken", {"f": True})
+    assert key != make_key("parser", "Hann fpken", {})
+    assert key != make_key("tagger", "Hann fpken", {"f": True})
+    assert key != make_key("parser", "Hann fpkeo", {"f": True})
+
+
+def test_lru_eviction():
+    cache = ResultCache(max_entries=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1"
+    cache.put("c", "3")
+    assert cache.get("b") is None
+    assert cache.get_many(["a", "c"]) == {"a": "1", "c": "3"}
+    assert cache.stats() == {"hits": 3, "misses": 1, "disk_hits": 0, "memory_entries": 2}
+
+
+def test_disk_tier_is_shared(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    with ResultCache(path=path) as first:
+        first.put_many({"a": "1", "b": "2"})
+    with ResultCache(max_entries=0, path=path) as second:
+        assert second.get_many(["a", "b", "c"]) == {"a": "1", "b": "2"}
+        assert second.stats()["disk_hits"] == 2
+        second.clear()
+    with ResultCache(path=path) as third:
+        assert third.get("a") is None
+
+
+def test_cached_apply_deduplicates_misses():
+    cache = ResultCache()
+    calls = []
+
+    def compute(texts):
+        calls.append(texts)
+        return [text.upper() for text in texts]
+
+    assert cached_apply(cache, "x", ["a", "b", "a"], compute) == ["A", "B", "A"]
+    assert cached_apply(cache, "x", ["b", "c", "c"], compute) == ["B", "C", "C"]
+    assert calls == [["a", "b"], ["c"]]
+    assert cached_apply(cache, "x", ["a"], lambda texts: None) == ["A"]
+    assert cached_apply(cache, "x", ["d"], lambda texts: None) is None
+    assert cached_apply(None, "x", ["a", "a"], compute) == ["A", "A"]
+
+
+def test_parse_text_with_cache(fake_jvm):
+    cache = ResultCache()
+    sentences = ["Hann fpken er sfg3en", "? ?", "Hann  fpken er sfg3en"]
+    parsed = iceparser.parse_text(sentences, cache=cache)
+    assert [str(sent) for sent in parsed] == [
+        "[X Hann fpken er sfg3en ]",
+        "[X ? ? ]",
+        "[X Hann fpken er sfg3en ]",
+    ]
+    assert jvm_calls() == 1
+    assert cache.stats()["misses"] == 2
+
+    parsed = iceparser.parse_text(sentences[::-1], cache=cache)
+    assert str(parsed[1]) == "[X ? ? ]"
+    assert jvm_calls() == 1
+
+    # Different arguments are cached separately
+    iceparser.parse_text(sentences, args={"f": True}, cache=cache)
+    assert jvm_calls() == 2
+
+
+def test_tag_text_with_cache(fake_jvm):
+    cache = ResultCache()
+    tagged = icetagger.tag_text(["Hann er", "", "Hvað", "Hann er"], cache=cache)
+    assert tagged == ["Hann x er x\n", "Hvað x\n", "Hann x er x\n"]
+    assert icetagger.tag_text(["Hvað"], return_tags_only=True, cache=cache) == (("x",),)
+    assert jvm_calls() == 1
+
+
+def test_tokenize_with_default_cache(fake_jvm):
+    caching.configure_cache(max_entries=10)
+    try:
+        for _ in range(2):
+            tokens = tokenizer.tokenize(["Hann er", "Hvað"])
+            assert [list(sent) for sent in tokens] == [["Hann", "er"], ["Hvað"]]
+        assert jvm_calls() == 1
+        assert caching.get_cache().stats()["hits"] == 1
+    finally:
+        caching.configure_cache(enabled=False)
+    assert caching.get_cache() is None
+
+
+def test_negative_size_is_rejected():
+    with pytest.raises(ValueError):
+        ResultCache(max_entries=-1)
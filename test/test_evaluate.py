@@ -0,0 +1,114 @@
+import json
+
+from pathlib import Path
+
+import pytest
+
+from icenlpy import cli, evaluate
+from icenlpy.evaluate import Counts, extract_spans
+
+TEST_DATA = Path(__file__).parent.parent / "src/icenlpy/resources/IceNLP/bat/iceparser/testData"
+GOLD = TEST_DATA / "test.gold.sent.gold"
+PARSED = TEST_DATA / "test.gold.sent.parsed"
+
+GOLD_LINE = (
+    "{*SUBJ [NP Merkingum nvfþ ] } [AdvP mögulega aa ] {*COMP [AP ábótavant lhensf ] } . ."
+)
+PARSED_LINE = "[NP Merkingum nvfþ ] [AP [AdvP mögulega aa ] ábótavant lhensf ] . ."
+
+
+def test_extract_spans():
+    spans = extract_spans(GOLD_LINE)
+    assert spans.words == ["Merkingum", "mögulega", "ábótavant", "."]
+    assert spans.tags == ["nvfþ", "aa", "lhensf", "."]
+    assert spans.phrases == [("NP", 0, 1), ("AdvP", 1, 2), ("AP", 2, 3)]
+    assert spans.functions == [("*SUBJ", 0, 1), ("*COMP", 2, 3)]
+
+    spans = extract_spans(PARSED_LINE)
+    assert spans.phrases == [("NP", 0, 1), ("AdvP", 1, 2), ("AP", 1, 3)]
+    assert spans.functions == []
+
+
+def test_extract_spans_bracket_words():
+    spans = extract_spans("[NP orð nhen ] [ pa [NP x nhen ] ] pa")
+    assert spans.words == ["orð", "[", "x", "]"]
+    assert spans.tags == ["nhen", "pa", "nhen", "pa"]
+    assert spans.phrases == [("NP", 0, 1), ("NP", 2, 3)]
+
+
+def test_unclosed_phrase():
+    assert extract_spans("[NP orð nhen").phrases == [("NP", 0, 1)]
+
+
+def test_counts():
+    counts = Counts()
+    counts.add_sentence(GOLD_LINE, PARSED_LINE)
+    assert counts.sentences == 1
+    assert counts.matched == {"labeled": 2, "unlabeled": 2, "functions": 0}
+    assert counts.precision() == pytest.approx(2 / 3)
+    assert counts.recall() == pytest.approx(2 / 3)
+    assert counts.f1("functions") == 0.0
+    assert counts.tag_accuracy == 1.0
+
+    counts.add_sentence(GOLD_LINE, GOLD_LINE)
+    assert counts.matched["labeled"] == 5
+    assert counts.recall("functions") == 0.5
+    assert counts.precision("functions") == 1.0
+
+
+def test_unlabeled_and_repeated_spans():
+    counts = Counts()
+    counts.add_sentence(
+        "[NP [NP Jón nken ] ] [VP fór sfg3eþ ]", "[NP [AP Jón nken ] ] [VP fór sfg3eþ ]"
+    )
+    assert counts.matched["labeled"] == 2
+    assert counts.matched["unlabeled"] == 3
+
+
+def test_tag_accuracy_with_different_words():
+    counts = Counts()
+    counts.add_sentence(
+        "[NP Jón nken ] [VP fór sfg3eþ ]", "[NP Jón nken ] [VP fer sfg3en ] . ."
+    )
+    assert counts.length_mismatches == 1
+    assert counts.gold_tags == 2
+    assert counts.correct_tags == 1
+
+
+def test_evaluate_files():
+    counts = evaluate.evaluate(GOLD, PARSED, workers=1)
+    assert counts.sentences == 500
+    assert counts.length_mismatches == 0
+    assert 0.9 < counts.f1("labeled") < 1.0
+    assert counts.f1("labeled") <= counts.f1("unlabeled")
+    assert counts.tag_accuracy > 0.99
+    json.dumps(counts.as_dict())
+
+
+def test_evaluate_in_processes():
+    lines = GOLD.read_text(encoding="utf-8").split("\n")[:300]
+    parsed = PARSED.read_text(encoding="utf-8").split("\n")[:300]
+    single = evaluate.evaluate(lines, parsed, workers=1)
+    pooled = evaluate.evaluate(lines, parsed, workers=2, chunk_size=50)
+    assert pooled.as_dict() == single.as_dict()
+
+
+def test_evaluate_identical():
+    counts = evaluate.evaluate(GOLD, GOLD)
+    assert counts.f1("labeled") == counts.f1("functions") == counts.tag_accuracy == 1.0
+
+
+def test_evaluate_different_lengths():
+    with pytest.raises(ValueError):
+        evaluate.evaluate([GOLD_LINE, GOLD_LINE], [PARSED_LINE])
+    assert evaluate.evaluate([], []).sentences == 0
+
+
+def test_cli(capsys, monkeypatch):
+    monkeypatch.setattr("sys.argv", ["icenlpy", "evaluate", str(GOLD), str(PARSED), "--json"])
+    with pytest.raises(SystemExit) as exit_info:
+        cli.main()
+    assert exit_info.value.code == 0
+    results = json.loads(capsys.readouterr().out)
+    assert results["sentences"] == 500
+    assert set(results["labeled"]) >= {"precision", "recall", "f1"}
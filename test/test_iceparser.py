@@ -1,3 +1,4 @@
+import asyncio
 import pytest
 
 from test.test_data import (
@@ -43,3 +44,127 @@ def test_iceparser(
     for idx in range(len(tokenized_sentences)):
         assert str(legacy_parsed[idx]) == legacy_expected[idx]
         assert str(gold_parsed[idx]) == gold_expected[idx]
+
+
+def test_parse_text_batches_keep_alignment(fake_jvm):
+    from icenlpy.workers import get_pool
+
+    sentences = ["Hann fpken er sfg3en", "Hvað fshen\nsegirðu sfg2en", "", "  ", "? ?"]
+    parsed = iceparser.parse_text(sentences, batch_size=2)
+
+    assert len(parsed) == len(sentences)
+    assert str(parsed[0]) == "[X Hann fpken er sfg3en ]"
+    assert str(parsed[1]) == "[X Hvað fshen segirðu sfg2en ]"
+    assert str(parsed[2]) == ""
+    assert str(parsed[3]) == ""
+    # Three batches, the second one containing only empty sentences
+    stats = get_pool().stats()
+    assert stats["hits"] + stats["misses"] == 2
+
+
+def test_parse_text_legacy_tagger_single_batch(fake_jvm):
+    from icenlpy.workers import get_pool
+
+    parsed = iceparser.parse_text(["Hann er", "Hvað"], legacy_tagger=True)
+    assert [str(sent) for sent in parsed] == ["[X Hann x er x ]", "[X Hvað x ]"]
+    stats = get_pool().stats()
+    assert stats["hits"] + stats["misses"] == 2
+
+
+def test_iter_parse_streams_aligned_sentences(fake_jvm):
+    sentences = iter(["Hann er", "", "Hvað segirðu"])
+    parsed = iceparser.iter_parse(sentences, legacy_tagger=True)
+    assert str(next(parsed)) == "[X Hann x er x ]"
+    assert str(next(parsed)) == ""
+    assert str(next(parsed)) == "[X Hvað x segirðu x ]"
+    with pytest.raises(StopIteration):
+        next(parsed)
+
+
+def test_iter_parse_rejects_phrase_per_line(fake_jvm):
+    with pytest.raises(ValueError):
+        list(iceparser.iter_parse(["Hann fpken"], args={"l": True}))
+
+
+def test_aparse_text(fake_jvm):
+    sentences = ["Hann er", "", "Hvað"]
+    parsed = asyncio.run(
+        iceparser.aparse_text(sentences, legacy_tagger=True, batch_size=2)
+    )
+    assert [str(sent) for sent in parsed] == ["[X Hann x er x ]", "", "[X Hvað x ]"]
+
+
+def test_parse_text_tagged_pairs_and_tokens(fake_jvm):
+    pairs = [[("Hann", "fpken"), ("fór", "sfg3eþ")], []]
+    parsed = iceparser.parse_text(pairs, cache=False)
+    assert [str(sent) for sent in parsed] == ["[X Hann fpken fór sfg3eþ ]", ""]
+
+    tokens = [["Hann", "fór"], ("Hvað",)]
+    parsed = iceparser.parse_text(tokens, legacy_tagger=True, cache=False)
+    assert [str(sent) for sent in parsed] == ["[X Hann x fór x ]", "[X Hvað x ]"]
+
+    with pytest.raises(ValueError):
+        iceparser.parse_text(tokens, cache=False)
+    with pytest.raises(ValueError):
+        iceparser.parse_text(pairs, legacy_tagger=True, cache=False)
+
+
+def test_tokens_are_tagged_one_per_line(fake_jvm, monkeypatch):
+    from icenlpy import icetagger
+
+    calls = []
+    run_icetagger = icetagger.run_icetagger
+
+    def spy(jar_path, input_text, legacy_tagger=False, java_args={}):
+        calls.append((input_text, java_args))
+        return run_icetagger(jar_path, input_text, legacy_tagger, java_args)
+
+    monkeypatch.setattr(icetagger, "run_icetagger", spy)
+    tokens = [["Hann", "fór"], [], iter(["Hvað"])]
+    parsed = iceparser.parse_text(tokens, legacy_tagger=True, cache=False)
+    assert [str(sent) for sent in parsed] == ["[X Hann x fór x ]", "", "[X Hvað x ]"]
+    assert calls == [("Hann\nfór\n\nHvað\n", {"lf": 1, "of": 2})]
+
+    # The async version kills IceTagger on a timeout, as it is run by acall_icenlp_jar
+    from icenlpy import utils
+
+    acalls = []
+    acall_icenlp_jar = utils.acall_icenlp_jar
+
+    async def aspy(jar_path, target, input_text, java_args={}, timeout=None):
+        acalls.append((target, input_text, java_args, timeout))
+        return await acall_icenlp_jar(jar_path, target, input_text, java_args, timeout)
+
+    monkeypatch.setattr(utils, "acall_icenlp_jar", aspy)
+    parsed = asyncio.run(iceparser.aparse_text(tokens[:2], legacy_tagger=True, timeout=30))
+    assert [str(sent) for sent in parsed] == ["[X Hann x fór x ]", ""]
+    assert acalls[0] == ("tagger", "Hann\nfór\n", {"lf": 1, "of": 2}, 30)
+    assert len(calls) == 1
+    with pytest.raises(TypeError):
+        iceparser.parse_text([["Hann"], "fór"], legacy_tagger=True, cache=False)
+
+
+def test_iter_parse_tokens(fake_jvm):
+    parsed = iceparser.iter_parse(iter([["Hann", "fór"], [], ["Hvað"]]), legacy_tagger=True)
+    assert [str(sent) for sent in parsed] == ["[X Hann x fór x ]", "", "[X Hvað x ]"]
+    assert list(iceparser.iter_parse([], legacy_tagger=True)) == []
+
+
+def test_iter_parse_raises_input_errors(fake_jvm):
+    def sentences():
+        yield "Hann er"
+        raise OSError("input failed")
+
+    parsed = iceparser.iter_parse(sentences(), legacy_tagger=True)
+    assert str(next(parsed)) == "[X Hann x er x ]"
+    with pytest.raises(OSError, match="input failed"):
+        next(parsed)
+
+
+def test_iter_parse_checks_every_sentence(fake_jvm):
+    with pytest.raises(ValueError, match="legacy_tagger=True"):
+        list(iceparser.iter_parse([["Hann", "fór"], ["heim"]]))
+    with pytest.raises(TypeError):
+        list(iceparser.iter_parse(["Hann fór", ["heim"]], legacy_tagger=True))
+    with pytest.raises(TypeError):
+        list(iceparser.iter_parse([["Hann", "fór"], "heim"], legacy_tagger=True))
@@ -1,3 +1,4 @@
+import asyncio
 import pytest
 
 from test.test_data import (
@@ -53,3 +54,45 @@ def test_icetagger_tags_only(tokenized_sentences, tags):
     tagged = icetagger.tag_text(tokenized_sentences, return_tags_only=True)
     for idx in range(len(tokenized_sentences)):
         assert tagged[idx] == tags[idx]
+
+
+def test_iter_tag(fake_jvm):
+    tagged = icetagger.iter_tag(line for line in ["Hann er", "Hvað"])
+    assert next(tagged) == "Hann x er x\n"
+    assert list(tagged) == ["Hvað x\n"]
+    tags = icetagger.iter_tag(["Hann er"], return_tags_only=True)
+    assert list(tags) == [("x", "x")]
+
+
+def test_atag_text(fake_jvm):
+    tagged = asyncio.run(icetagger.atag_text(["Hann er", "Hvað"]))
+    assert tagged == ["Hann x er x\n", "Hvað x\n"]
+
+
+def test_tag_tokenized_sentences(fake_jvm, monkeypatch):
+    calls = []
+    run_icetagger = icetagger.run_icetagger
+
+    def spy(jar_path, input_text, legacy_tagger=False, java_args={}):
+        calls.append((input_text, java_args))
+        return run_icetagger(jar_path, input_text, legacy_tagger, java_args)
+
+    monkeypatch.setattr(icetagger, "run_icetagger", spy)
+    sentences = [iter(["Hann", "fór", "heim"]), [], ("a.m.k.", "10")]
+    tagged = icetagger.tag_text(sentences, cache=False)
+    assert tagged == ["Hann x fór x heim x\n", "\n", "a.m.k. x 10 x\n"]
+    assert calls == [("Hann\nfór\nheim\n\na.m.k.\n10\n", {"lf": 1, "of": 2})]
+
+    tags = icetagger.tag_text([["Hann", "fór"]], return_tags_only=True, cache=False)
+    assert tags == (("x", "x"),)
+    with pytest.raises(TypeError):
+        icetagger.tag_text([["Hann"], "fór"], cache=False)
+
+
+@pytest.mark.parametrize("backend", ["jvm", "hmm"])
+def test_tokenized_sentences_need_sentence_per_line_output(fake_jvm, backend):
+    sentences = [["Hundurinn", "gelti", "."], ["Ég", "á", "hund"]]
+    with pytest.raises(ValueError):
+        icetagger.tag_text(sentences, backend=backend, args={"of": 1}, cache=False)
+    tagged = icetagger.tag_text(sentences, args={"of": "2"}, cache=False)
+    assert tagged == ["Hundurinn x gelti x . x\n", "Ég x á x hund x\n"]
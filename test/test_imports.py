@@ -0,0 +1,108 @@
+import re
+import sys
+import json
+import subprocess
+
+from pathlib import Path
+
+import pytest
+
+SRC = Path(__file__).parent.parent / "src"
+
+# Modules that are slow to import and not needed until a feature uses them
+HEAVY_MODULES = ["numpy", "asyncio", "tomlkit", "sqlite3", "concurrent.futures.process"]
+
+# Generous, so that it only catches a heavy import creeping back in
+IMPORT_BUDGET_MS = 300
+
+CHECK = """
+import sys, json, logging
+import {module}
+import icenlpy
+print(json.dumps({{
+    "modules": sorted(sys.modules),
+    "root_handlers": len(logging.getLogger().handlers),
+    "root_level": logging.getLogger().level,
+    "icenlpy_handlers": sum(
+        len(logger.handlers)
+        for name, logger in logging.Logger.manager.loggerDict.items()
+        if name.startswith("icenlpy") and isinstance(logger, logging.Logger)
+    ),
+    "jar_lookups": icenlpy.get_jar_path.cache_info().currsize,
+}}))
+"""
+
+
+def run_python(*args):
+    result = subprocess.run(
+        [sys.executable, *args],
+        capture_output=True,
+        text=True,
+        env={"PYTHONPATH": str(SRC)},
+        check=True,
+    )
+    return result
+
+
+@pytest.mark.parametrize(
+    "module", ["icenlpy", "icenlpy.cli", "icenlpy.icetagger", "icenlpy.iceparser"]
+)
+def test_import_has_no_side_effects(module):
+    result = run_python("-c", CHECK.format(module=module))
+    state = json.loads(result.stdout)
+    assert state["root_handlers"] == 0
+    assert state["root_level"] == 30  # logging.WARNING, the default
+    assert state["icenlpy_handlers"] == 0
+    assert state["jar_lookups"] == 0
+    assert result.stderr == ""
+    loaded = set(state["modules"])
+    for heavy in HEAVY_MODULES:
+        assert heavy not in loaded, f"import {module} imports {heavy}"
+
+
+def test_cli_imports_no_commands():
+    result = run_python("-c", CHECK.format(module="icenlpy.cli"))
+    loaded = set(json.loads(result.stdout)["modules"])
+    for command in ["icenlpy.stream", "icenlpy.server", "icenlpy.benchmark", "icenlpy.utils"]:
+        assert command not in loaded, f"import icenlpy.cli imports {command}"
+
+
+def test_import_time_budget():
+    # The best of a few runs, as the first one may compile the bytecode
+    timings = []
+    for _ in range(3):
+        result = run_python("-X", "importtime", "-c", "import icenlpy.cli")
+        cumulative = [
+            int(match.group(1))
+            for match in re.finditer(r"\|\s*(\d+) \| icenlpy\.cli$", result.stderr, re.MULTILINE)
+        ]
+        timings.append(cumulative[-1] / 1000)
+    assert min(timings) < IMPORT_BUDGET_MS
+
+
+def test_lazy_attributes():
+    import icenlpy
+
+    assert icenlpy.JAR_FOUND == (icenlpy.JAR_PATH is not None)
+    assert icenlpy.query.__name__ == "icenlpy.query"
+    assert "store" in dir(icenlpy)
+    with pytest.raises(AttributeError):
+        icenlpy.does_not_exist
+
+
+def test_find_java_is_cached(tmp_path, monkeypatch):
+    from icenlpy import utils
+
+    java = tmp_path / "bin" / "java"
+    java.parent.mkdir()
+    java.write_text("#!/bin/sh\n")
+    java.chmod(0o755)
+    monkeypatch.setenv("JAVA_HOME", str(tmp_path))
+    utils.find_java.cache_clear()
+    try:
+        assert utils.find_java() == str(java)
+        assert utils.build_command("IceNLPCore.jar", "tagger")[0] == str(java)
+        java.unlink()
+        assert utils.find_java() == str(java)
+    finally:
+        utils.find_java.cache_clear()
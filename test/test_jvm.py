@@ -0,0 +1,90 @@
+import sys
+
+import pytest
+
+from icenlpy import jvm, utils
+
+# Stands in for a JVM dumping its classes, writes the file named by -XX:ArchiveClassesAtExit
+FAKE_DUMP = r"""
+import sys
+for arg in sys.argv[1:]:
+    if arg.startswith("-XX:ArchiveClassesAtExit="):
+        open(arg.split("=", 1)[1], "w").write("archive")
+"""
+
+
+@pytest.fixture(autouse=True)
+def launch_settings(monkeypatch, tmp_path):
+    """Start every test from the default profile, with archives in a temporary directory."""
+    monkeypatch.setattr(jvm, "_profile", "default")
+    monkeypatch.setattr(jvm, "_heap", None)
+    monkeypatch.setattr(jvm, "_extra_options", ())
+    monkeypatch.setattr(jvm, "_cds_enabled", True)
+    monkeypatch.setenv("ICENLPY_CACHE_DIR", str(tmp_path / "cache"))
+    jar = tmp_path / "IceNLPCore.jar"
+    jar.write_bytes(b"jar")
+    return str(jar)
+
+
+def test_profiles():
+    assert jvm.profile_options() == []
+    assert jvm.configure_jvm(profile="latency").name == "latency"
+    assert jvm.profile_options() == ["-XX:TieredStopAtLevel=1", "-XX:+UseSerialGC", "-Xmx1g"]
+
+    jvm.configure_jvm(heap="512m", options=["-Dfile.encoding=UTF-8"])
+    assert jvm.get_profile().heap == "512m"
+    assert jvm.profile_options()[-2:] == ["-Xmx512m", "-Dfile.encoding=UTF-8"]
+
+    custom = jvm.JVMProfile("custom", ("-XX:+UseZGC",))
+    assert jvm.configure_jvm(profile=custom).options == ("-XX:+UseZGC",)
+    with pytest.raises(ValueError):
+        jvm.configure_jvm(profile="fastest")
+
+
+def test_build_command_uses_the_profile(launch_settings):
+    jvm.configure_jvm(profile="throughput")
+    command = utils.build_command(launch_settings, "tagger", {"lf": 3})
+    classpath = command.index("-classpath")
+    assert command[1:classpath] == ["-XX:+UseParallelGC", "-Xms1g", "-Xmx4g"]
+    assert command[classpath + 2 :] == ["is.iclt.icenlp.runner.RunIceTagger", "-lf", "3"]
+
+
+def test_archive_is_used_once_generated(launch_settings, monkeypatch):
+    monkeypatch.setattr(
+        utils,
+        "build_command",
+        lambda jar_path, target, java_args={}, jvm_options=None: [
+            sys.executable,
+            "-c",
+            FAKE_DUMP,
+            *jvm_options,
+        ],
+    )
+    java = utils.find_java() or "java"
+    assert jvm.launch_options(launch_settings, "tagger", java) == []
+
+    archives = jvm.warmup(["tagger"], jar_path=launch_settings)
+    archive = jvm.archive_path(launch_settings, "tagger", java)
+    assert archives == {"tagger": archive}
+    assert archive.read_text() == "archive"
+    assert list(archive.parent.iterdir()) == [archive]
+    assert jvm.launch_options(launch_settings, "tagger", java) == jvm.cds_options(archive)
+    assert jvm.launch_options(launch_settings, "parser", java) == []
+
+    jvm.configure_jvm(cds=False)
+    assert jvm.launch_options(launch_settings, "tagger", java) == []
+
+
+def test_failed_warmup(launch_settings, monkeypatch):
+    monkeypatch.setattr(
+        utils,
+        "build_command",
+        lambda jar_path, target, java_args={}, jvm_options=None: [
+            sys.executable,
+            "-c",
+            "import sys; sys.exit('Unrecognized VM option')",
+        ],
+    )
+    with pytest.raises(RuntimeError, match="Unrecognized VM option"):
+        jvm.generate_archive(launch_settings, "parser")
+    assert not list(jvm.archive_dir().iterdir())
@@ -0,0 +1,132 @@
+import pytest
+
+from icenlpy import lexicon
+from icenlpy.lexicon import Lexicon, compile_dict, get_lexicon, load_lexicon, read_dict
+
+
+@pytest.fixture(autouse=True)
+def lexicon_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("ICENLPY_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(lexicon, "_lexicons", {})
+    return tmp_path / "cache"
+
+
+@pytest.fixture
+def small_dict(tmp_path):
+    path = tmp_path / "small.dict"
+    path.write_text(
+        "#A comment\n"
+        "hestur=nken\n"
+        "á=ao_aþ_nveo_sfg1en\n"
+        "==x\n"
+        "a=b=tp\n"
+        "\n"
+        "forskeyti\r\n",
+        encoding="utf-8",
+    )
+    return path
+
+
+def test_read_dict(small_dict):
+    assert list(read_dict(small_dict)) == [
+        ("hestur", "nken"),
+        ("á", "ao_aþ_nveo_sfg1en"),
+        ("=", "x"),
+        ("a=b", "tp"),
+        ("forskeyti", ""),
+    ]
+
+
+def test_lookup(small_dict, tmp_path):
+    with Lexicon.open(compile_dict(small_dict, tmp_path / "small.lex")) as lex:
+        assert len(lex) == 5
+        assert lex.lookup("hestur") == ["nken"]
+        assert lex.lookup("á") == ["ao", "aþ", "nveo", "sfg1en"]
+        assert lex.lookup("=") == ["x"]
+        assert lex.lookup("a=b") == ["tp"]
+        assert lex.lookup("forskeyti") == []
+        assert lex.lookup("Hestur") is None
+        assert lex.lookup("") is None
+        assert lex.get("á") == "ao_aþ_nveo_sfg1en"
+        assert "forskeyti" in lex
+        assert "hest" not in lex
+
+
+def test_keys_are_sorted_by_bytes(small_dict):
+    lex = Lexicon.from_entries(read_dict(small_dict))
+    keys = list(lex)
+    assert keys == sorted(keys, key=lambda key: key.encode("utf-8"))
+    assert dict(lex.items()) == dict(read_dict(small_dict))
+
+
+def test_lookup_many(small_dict):
+    lex = Lexicon.from_entries(read_dict(small_dict))
+    words = ["á", "köttur", "hestur", "á", "=", "zzz", ""]
+    assert lex.lookup_many(words) == [lex.lookup(word) for word in words]
+    assert lex.lookup_many([]) == []
+
+
+def test_lookup_ending():
+    lex = Lexicon.from_entries([("arnar", "nvfog"), ("nar", "nkfo"), ("r", "nken")])
+    assert lex.lookup_ending("flugvélarnar") == ("arnar", ["nvfog"])
+    assert lex.lookup_ending("hestanar") == ("nar", ["nkfo"])
+    assert lex.lookup_ending("hestanar", min_length=4) is None
+    assert lex.lookup_ending("hús") is None
+
+
+def test_empty_lexicon():
+    lex = Lexicon.from_entries([])
+    assert len(lex) == 0
+    assert lex.lookup("hestur") is None
+    assert lex.lookup_ending("hestur") is None
+
+
+def test_invalid_data():
+    with pytest.raises(ValueError):
+        Lexicon(b"not a lexicon at all")
+
+
+def test_load_lexicon_compiles_once(small_dict, lexicon_cache):
+    first = load_lexicon(small_dict)
+    compiled = list(lexicon_cache.iterdir())
+    assert len(compiled) == 1
+    mtime = compiled[0].stat().st_mtime_ns
+    second = load_lexicon(small_dict)
+    assert compiled[0].stat().st_mtime_ns == mtime
+    assert first.lookup("hestur") == second.lookup("hestur") == ["nken"]
+
+
+def test_load_lexicon_recompiles_changed_source(small_dict, lexicon_cache):
+    load_lexicon(small_dict)
+    small_dict.write_text("hestur=nkeo\n", encoding="utf-8")
+    assert load_lexicon(small_dict).lookup("hestur") == ["nkeo"]
+
+
+def test_load_lexicon_without_writable_cache(small_dict, tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    lex = load_lexicon(small_dict, directory=blocker / "cache")
+    assert lex.lookup("hestur") == ["nken"]
+
+
+def test_cache_dir(monkeypatch, tmp_path):
+    monkeypatch.delenv("ICENLPY_CACHE_DIR")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    assert lexicon.cache_dir() == tmp_path / "icenlpy"
+
+
+def test_get_lexicon():
+    otb = get_lexicon("otb")
+    assert get_lexicon("otb") is otb
+    assert otb.lookup("hestur") == ["nken"]
+    assert otb.lookup("$\\delta$=÷106\\prómill") == ["tp"]
+    assert len(otb) == len(dict(read_dict(lexicon.DICT_DIR / "otb.dict")))
+    assert "aðal" in get_lexicon("prefixes")
+    ending, tags = get_lexicon("endings").lookup_ending("glæsiflugvélarnar")
+    assert "glæsiflugvélarnar".endswith(ending)
+    assert "nvfog" in tags
+
+
+def test_get_lexicon_unknown_name():
+    with pytest.raises(ValueError):
+        get_lexicon("nonexistent")
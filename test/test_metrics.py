@@ -0,0 +1,166 @@
+import json
+import asyncio
+import threading
+
+import pytest
+
+from icenlpy import iceparser, icetagger, metrics, utils
+from icenlpy.metrics import MetricsRegistry, SpanCollector
+
+
+@pytest.fixture
+def registry():
+    """Record into a fresh registry, and put the process-wide one back afterwards."""
+    old_registry, old_enabled = metrics._registry, metrics._metrics_enabled
+    registry = metrics.configure_metrics(enabled=True, registry=MetricsRegistry())
+    yield registry
+    metrics._registry, metrics._metrics_enabled = old_registry, old_enabled
+
+
+def test_span_records_duration_and_counts(registry):
+    with metrics.span("stage", bytes_in=10) as span:
+        span.set(tokens=4, note="not counted")
+    assert span.duration >= 0
+    assert registry.histogram("icenlpy_stage_seconds", stage="stage").count == 1
+    assert registry.counter("icenlpy_bytes_in_total", stage="stage") == 10
+    assert registry.counter("icenlpy_tokens_total", stage="stage") == 4
+    assert registry.counter("icenlpy_errors_total", stage="stage") == 0
+
+
+def test_span_nesting_and_errors(registry):
+    collector = SpanCollector()
+    registry.add_listener(collector)
+    with pytest.raises(KeyError):
+        with metrics.span("outer") as outer:
+            with metrics.span("inner") as inner:
+                assert metrics.current_span() is inner
+            raise KeyError("x")
+    assert metrics.current_span() is None
+    assert inner.parent_id == outer.span_id
+    assert inner.trace_id == outer.trace_id
+    assert [data["name"] for data in collector.spans] == ["inner", "outer"]
+    assert collector.spans[1]["status"] == {"status_code": "ERROR", "description": "KeyError"}
+    assert registry.counter("icenlpy_errors_total", stage="outer") == 1
+
+
+def test_failing_listener_is_ignored(registry):
+    def listener(span):
+        raise RuntimeError("broken exporter")
+
+    registry.add_listener(listener)
+    with metrics.span("stage"):
+        pass
+    assert registry.histogram("icenlpy_stage_seconds", stage="stage").count == 1
+
+
+def test_disabled_metrics(registry):
+    metrics.configure_metrics(enabled=False)
+    assert metrics.get_registry() is None
+    with metrics.span("stage", tokens=3) as span:
+        span.set(bytes_in=1)
+    assert not span.recording
+    metrics.inc("icenlpy_cache_hits_total", stage="x")
+    metrics.configure_metrics(enabled=True)
+    assert registry.to_prometheus() == ""
+
+
+def test_counters_are_thread_safe(registry):
+    def work():
+        for _ in range(1000):
+            registry.inc("icenlpy_tokens_total", stage="x")
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert registry.counter("icenlpy_tokens_total", stage="x") == 4000
+
+
+def test_prometheus_text(registry, tmp_path):
+    registry = MetricsRegistry(buckets=(0.1, 1.0))
+    registry.inc("icenlpy_tokens_total", 5, stage="tag_text")
+    registry.inc("icenlpy_jvm_spawns_total", runner='Run"X"')
+    registry.observe("icenlpy_stage_seconds", 0.5, stage="tag_text")
+    registry.observe("icenlpy_stage_seconds", 2.0, stage="tag_text")
+    lines = registry.to_prometheus().splitlines()
+    assert "# TYPE icenlpy_tokens_total counter" in lines
+    assert 'icenlpy_tokens_total{stage="tag_text"} 5' in lines
+    assert 'icenlpy_jvm_spawns_total{runner="Run\\"X\\""} 1' in lines
+    assert "# TYPE icenlpy_stage_seconds histogram" in lines
+    assert 'icenlpy_stage_seconds_bucket{stage="tag_text",le="0.1"} 0' in lines
+    assert 'icenlpy_stage_seconds_bucket{stage="tag_text",le="1"} 1' in lines
+    assert 'icenlpy_stage_seconds_bucket{stage="tag_text",le="+Inf"} 2' in lines
+    assert 'icenlpy_stage_seconds_sum{stage="tag_text"} 2.5' in lines
+    assert 'icenlpy_stage_seconds_count{stage="tag_text"} 2' in lines
+
+    path = tmp_path / "icenlpy.prom"
+    registry.write_prometheus(path)
+    assert path.read_text() == registry.to_prometheus()
+
+
+def test_span_collector_export(registry, tmp_path):
+    collector = SpanCollector(max_spans=2)
+    registry.add_listener(collector)
+    for name in ("a", "b", "c"):
+        with metrics.span(name, tokens=1):
+            pass
+    path = tmp_path / "spans.jsonl"
+    assert collector.export(path) == 2
+    assert collector.spans == []
+    spans = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [data["name"] for data in spans] == ["b", "c"]
+    assert len(spans[0]["context"]["trace_id"]) == 32
+    assert spans[0]["end_time_unix_nano"] >= spans[0]["start_time_unix_nano"]
+    assert spans[0]["attributes"] == {"tokens": 1}
+
+
+def test_call_icenlp_jar_is_measured(registry, fake_jvm):
+    collector = SpanCollector()
+    registry.add_listener(collector)
+    utils.call_icenlp_jar(None, "tagger", "Hann fór\n")
+    utils.call_icenlp_jar(None, "tagger", "Hann fór\n")
+    first, second = collector.spans
+    assert first["name"] == "jvm.tagger"
+    assert first["attributes"]["runner"] == "RunIceTagger"
+    assert first["attributes"]["bytes_in"] == len("Hann fór\n".encode("utf-8"))
+    assert first["attributes"]["bytes_out"] == len("Hann x fór x\n".encode("utf-8"))
+    assert not first["attributes"]["warm"]
+    # The second call gets the worker the pool started after the first
+    assert second["attributes"]["warm"]
+    assert registry.counter("icenlpy_jvm_spawns_total", runner="unknown") >= 2
+
+
+def test_acall_icenlp_jar_is_measured(registry, fake_jvm):
+    asyncio.run(utils.acall_icenlp_jar(None, "tokenizer", "Hann fór\n"))
+    assert registry.counter("icenlpy_bytes_out_total", stage="jvm.tokenizer") == 10
+    assert registry.counter("icenlpy_jvm_spawns_total", runner="RunTokenizer") == 1
+
+
+def test_entry_points_are_measured(registry, fake_jvm):
+    collector = SpanCollector()
+    registry.add_listener(collector)
+    icetagger.tag_text(["Hann fór heim .", "Já"])
+    assert collector.spans[-1]["name"] == "tag_text"
+    assert collector.spans[-1]["attributes"]["sentences"] == 2
+    assert collector.spans[-1]["attributes"]["tokens"] == 5
+
+    collector.clear()
+    iceparser.parse_text(["Hann fór heim .", "Já"], cache=False)
+    names = [data["name"] for data in collector.spans]
+    assert names == ["jvm.parser", "tree", "parse_text"]
+    parse_span = collector.spans[-1]
+    assert parse_span["attributes"]["sentences"] == 2
+    assert parse_span["attributes"]["tokens"] == 5
+    parent_id = parse_span["context"]["span_id"]
+    assert all(data["parent_id"] == parent_id for data in collector.spans[:2])
+
+
+def test_cache_hits_are_counted(registry, fake_jvm):
+    from icenlpy.cache import ResultCache
+
+    cache = ResultCache()
+    iceparser.parse_text(["Hann fór", "Já"], cache=cache)
+    iceparser.parse_text(["Hann fór", "Nei"], cache=cache)
+    assert registry.counter("icenlpy_cache_hits_total", stage="parser") == 1
+    assert registry.counter("icenlpy_cache_misses_total", stage="parser") == 3
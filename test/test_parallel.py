@@ -0,0 +1,75 @@
+import time
+
+import pytest
+
+from icenlpy import iceparser, parallel
+
+
+SENTENCES = [f"orð{idx} x" for idx in range(23)]
+
+
+def test_parse_corpus_keeps_order(fake_jvm):
+    shards = []
+    parsed = parallel.parse_corpus(
+        SENTENCES, workers=4, chunk_size=5, on_shard=shards.append
+    )
+    assert [str(sent) for sent in parsed] == [f"[X {sent} ]" for sent in SENTENCES]
+    assert [shard.index for shard in shards] == [0, 1, 2, 3, 4]
+    assert all(shard.elapsed >= 0 and shard.attempts == 1 for shard in shards)
+
+
+def test_parse_corpus_unordered(fake_jvm):
+    parsed = parallel.parse_corpus(SENTENCES, workers=3, chunk_size=4, ordered=False)
+    assert sorted(str(sent) for sent in parsed) == sorted(
+        f"[X {sent} ]" for sent in SENTENCES
+    )
+
+
+def test_parse_corpus_from_files(fake_jvm, tmp_path):
+    first, second = tmp_path / "a.txt", tmp_path / "b.txt"
+    first.write_text("Hann fpken\nHvað fshen\n", encoding="utf-8")
+    second.write_text("? ?\n", encoding="utf-8")
+    parsed = parallel.parse_corpus([first, second], workers=2, chunk_size=1)
+    assert [str(sent) for sent in parsed] == [
+        "[X Hann fpken ]",
+        "[X Hvað fshen ]",
+        "[X ? ? ]",
+    ]
+    assert len(list(parallel.parse_corpus(str(first), workers=1))) == 2
+
+
+def test_parse_shards_retries(fake_jvm, monkeypatch):
+    parse_text = iceparser.parse_text
+    calls = []
+
+    def flaky_parse_text(shard, **kwargs):
+        calls.append(shard[0])
+        if len(calls) == 1:
+            raise Exception("JVM crashed")
+        return parse_text(shard, **kwargs)
+
+    monkeypatch.setattr(iceparser, "parse_text", flaky_parse_text)
+    (result,) = parallel.parse_shards(SENTENCES[:3], workers=1, chunk_size=3)
+    assert result.attempts == 2
+    assert len(result.sentences) == 3
+
+    monkeypatch.setattr(iceparser, "parse_text", lambda *a, **k: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        list(parallel.parse_shards(SENTENCES[:3], workers=1, retries=1))
+
+
+def test_map_bounded_holds_back_few_results():
+    started = []
+    started_before_first = []
+
+    def run(index, item):
+        started.append(index)
+        if index == 0:
+            time.sleep(0.5)
+            started_before_first.append(len(started))
+        return item
+
+    results = parallel.map_bounded(run, range(1000), workers=2)
+    assert list(results) == list(range(1000))
+    # The first item and at most three more, in flight or done, while it runs
+    assert started_before_first[0] <= 4
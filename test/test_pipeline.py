@@ -0,0 +1,66 @@
+import pytest
+
+from icenlpy import iceparser, pipeline, utils
+from icenlpy.pipeline import AnalyzedSentence
+
+
+def test_analyze(fake_jvm):
+    parsed = pipeline.analyze("Hann er\nHvað segirðu")
+    assert [str(sent) for sent in parsed] == ["[X Hann x er x ]", "[X Hvað x segirðu x ]"]
+
+
+def test_analyze_layers(fake_jvm):
+    analyzed = pipeline.analyze(["Hann er", "", "Hvað"], layers=True)
+    assert analyzed == [
+        AnalyzedSentence(["Hann", "er"], ["x", "x"], "[X Hann x er x ]", analyzed[0].tree),
+        AnalyzedSentence(["Hvað"], ["x"], "[X Hvað x ]", analyzed[1].tree),
+    ]
+    assert list(analyzed[0].tree.tokens()) == ["Hann", "er"]
+
+
+def test_analyze_empty_input(fake_jvm):
+    assert pipeline.analyze("  \n") == []
+
+
+def test_analyze_rejects_unaligned_args(fake_jvm):
+    with pytest.raises(ValueError):
+        pipeline.analyze("Hann er", parser_args={"l": True})
+    with pytest.raises(ValueError):
+        pipeline.analyze("Hann er", tagger_args={"lf": 3, "of": 1})
+
+
+def test_pipe_runs_steps_in_order(fake_jvm):
+    outputs = utils.pipe_icenlp_jars(
+        None, [("tokenizer", {}), ("tagger", {}), ("parser", {})], "Hann er\n"
+    )
+    assert outputs == [None, None, "[X Hann x er x ]\n"]
+
+
+def test_pipe_keeps_intermediate_output(fake_jvm):
+    outputs = utils.pipe_icenlp_jars(
+        None, [("tagger", {}), ("parser", {})], "Hann er\nHvað\n", keep_intermediate=True
+    )
+    assert outputs == ["Hann x er x\nHvað x\n", "[X Hann x er x ]\n[X Hvað x ]\n"]
+
+
+@pytest.mark.parametrize("keep_intermediate", [False, True])
+@pytest.mark.parametrize("crashing", ["tagger", "parser"])
+def test_pipe_raises_runner_errors(fake_jvm, crashing, keep_intermediate):
+    steps = [
+        (target, {"crash": True} if target == crashing else {})
+        for target in ("tagger", "parser")
+    ]
+    with pytest.raises(Exception, match="fake runner crashed"):
+        utils.pipe_icenlp_jars(
+            None, steps, "Hann er\n" * 10_000, keep_intermediate=keep_intermediate
+        )
+
+
+def test_pipe_needs_steps():
+    with pytest.raises(ValueError):
+        utils.pipe_icenlp_jars(None, [], "Hann er\n")
+
+
+def test_run_iceparser_legacy_tagger(fake_jvm):
+    output = iceparser.run_iceparser(None, "Hann er\n", legacy_tagger=True)
+    assert output == "[X Hann x er x ]\n"
@@ -0,0 +1,76 @@
+from pathlib import Path
+
+import pytest
+
+from icenlpy import pytokenizer
+from icenlpy.pytokenizer import Tokenizer, get_tokenizer, load_lexicon
+
+BAT_DIR = Path(__file__).parent.parent / "src/icenlpy/resources/IceNLP/bat"
+TOKENIZER_DATA = BAT_DIR / "tokenizer"
+
+
+def test_load_lexicon():
+    lexicon = load_lexicon()
+    assert lexicon["a.m.k."] == pytokenizer.ABBREV2
+    assert lexicon["o.s.frv."] == pytokenizer.ABBREV
+    assert lexicon["af_hverju"] == pytokenizer.MWE
+    assert not any(entry.startswith("[") for entry in lexicon)
+
+
+def test_get_tokenizer_is_cached():
+    assert get_tokenizer() is get_tokenizer()
+    assert get_tokenizer(strict=False) is not get_tokenizer()
+
+
+def test_matches_java_output():
+    text = (TOKENIZER_DATA / "test.txt").read_text(encoding="utf-8")
+    expected = (TOKENIZER_DATA / "test.out").read_text(encoding="utf-8")
+    sentences = [
+        sentence.split("\n") for sentence in expected.strip().split("\n\n")
+    ]
+    assert list(get_tokenizer().tokenize(text)) == sentences
+
+
+def test_matches_tokenized_corpus():
+    # One token per line with empty lines between sentences
+    corpus = (BAT_DIR / "icetagger/mogginn.txt").read_text(encoding="utf-8")
+    tokenizer = get_tokenizer()
+    for sentence in corpus.strip().split("\n\n"):
+        tokens = sentence.split("\n")
+        assert list(tokenizer.tokenize(" ".join(tokens))) == [tokens]
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        (
+            "Ég á stóran hund. Sá er a.m.k. 10 kíló.",
+            [["Ég", "á", "stóran", "hund", "."], ["Sá", "er", "a.m.k.", "10", "kíló", "."]],
+        ),
+        (
+            "Farið e.t.v. þangað kl. 10:30. Hvað?! Já.",
+            [["Farið", "e.t.v.", "þangað", "kl.", "10:30", "."], ["Hvað", "?!"], ["Já", "."]],
+        ),
+        (
+            "Hann keypti mjólk o.fl. Svo fór hann heim.",
+            [["Hann", "keypti", "mjólk", "o.fl."], ["Svo", "fór", "hann", "heim", "."]],
+        ),
+        (
+            "Hún sagði: „Komdu!“ Hann kom.",
+            [["Hún", "sagði", ":", "„", "Komdu", "!", "“"], ["Hann", "kom", "."]],
+        ),
+        (
+            "delta$(4) kostar 9% af 2.000 kr., sjá www.mbl.is.",
+            [["delta", "$", "(", "4", ")", "kostar", "9%", "af", "2.000", "kr.", ",", "sjá", "www.mbl.is", "."]],
+        ),
+        ("Fyrri málsgrein\n\nSeinni málsgrein", [["Fyrri", "málsgrein"], ["Seinni", "málsgrein"]]),
+        ("", []),
+    ],
+)
+def test_tokenize(text, expected):
+    assert list(get_tokenizer().tokenize(text)) == expected
+
+
+def test_not_strict():
+    tokens = list(Tokenizer(strict=False).tokenize("delta$(4) kostar 2.000 kr."))
+    assert tokens == [["delta$(4)", "kostar", "2.000", "kr."]]
@@ -0,0 +1,144 @@
+import re
+
+from pathlib import Path
+
+import pytest
+
+from icenlpy import query
+from icenlpy.query import CorpusIndex, Match, build_index, phrase, terminal
+from icenlpy.store import read_corpus, write_corpus
+from icenlpy.tree import PHRASE, IceNLPySentence
+
+ICEPARSER = Path(__file__).parent.parent / "src/icenlpy/resources/IceNLP/bat/iceparser"
+
+SENTENCES = [
+    "[NP Hann fpken ] [VP fór sfg3eþ ] [PP í aþ [NP skóla nkeþ ] ] . .",
+    "[NP Hún fpven ] [VP fór sfg3eþ ] [PP í ao [NP skólann nkeog ] ] . .",
+    "[NP Ég fp1en ] [VP las sfg1eþ ] [NP bókina nveog ] . .",
+    "[PP um ao [NP [AP gamla lheþvf ] húsinu nheþg ] ] . .",
+]
+
+DATIVE_NOUN = re.compile("n..þ.*")
+
+
+def brute_force(sentences, pattern):
+    return [
+        Match(sent_idx, node)
+        for sent_idx, sentence in enumerate(sentences)
+        for node in range(len(sentence))
+        if pattern.matches(sentence, node)
+    ]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return build_index(SENTENCES)
+
+
+@pytest.fixture(scope="module")
+def gdc():
+    lines = (ICEPARSER / "200sent_func.gdc").read_text(encoding="utf-8").split("\n")
+    return build_index(line for line in lines if line.strip())
+
+
+def test_search(index):
+    pattern = phrase("PP", child=phrase("NP", child=terminal(tag=DATIVE_NOUN)))
+    assert list(index.search(pattern)) == [Match(0, 4), Match(3, 0)]
+    assert str(index.node(Match(0, 4))) == "[PP í aþ [NP skóla nkeþ ] ]"
+    assert index.sentence(Match(3, 0)).text == "um gamla húsinu ."
+
+
+def test_terminal_patterns(index):
+    assert index.count(terminal(word="fór")) == 2
+    assert index.count(terminal(tag="sfg3eþ", word="fór")) == 2
+    assert index.count(terminal(tag="sfg1eþ", word="fór")) == 0
+    assert [m.sentence for m in index.search(terminal(tag=re.compile("fp.*")))] == [0, 1, 2]
+    with pytest.raises(ValueError):
+        query.TerminalPattern(child=terminal())
+
+
+def test_descendant_and_where(index):
+    pattern = phrase("PP", descendant=terminal(tag=re.compile("l.*")))
+    assert list(index.search(pattern)) == [Match(3, 0)]
+    assert index.count(phrase("PP", child=phrase(child=terminal(tag="lheþvf")))) == 0
+    first_word_is_pronoun = lambda sentence, node: sentence.tags[node + 1].startswith("fp")
+    assert index.count(phrase("NP", where=first_word_is_pronoun)) == 3
+
+
+def test_limit(index):
+    assert list(index.search(phrase("NP"), limit=2)) == [Match(0, 0), Match(0, 6)]
+    assert len(list(index.search(phrase("NP"), limit=10))) == 7
+
+
+def test_candidates(index):
+    assert index.candidates(phrase()) is None
+    assert index.candidates(phrase("PP", child=terminal(word="um"))) == {3}
+    assert index.candidates(phrase("AdvP")) == set()
+    assert list(index.search(phrase("AdvP"))) == []
+
+
+def test_keys_and_frequency(index):
+    assert sorted(index.keys(query.LABELS)) == ["AP", "NP", "PP", "VP"]
+    assert index.keys(query.WORDS, "xyz") == []
+    assert index.frequency(query.LABELS, "NP") == 7
+    assert index.frequency(query.TAGS, re.compile("n.*")) == 4
+
+
+def test_matches_brute_force(gdc):
+    patterns = [
+        phrase("PP", child=phrase(re.compile("NP.*"), child=terminal(tag=DATIVE_NOUN))),
+        phrase(re.compile("VP.*"), child=terminal(tag=re.compile("s.*"))),
+        phrase("NP", child=[phrase("AP"), terminal(tag=re.compile("n.*"))]),
+        terminal(word=re.compile("[Ss]ér")),
+        phrase(child=terminal(tag="c")),
+    ]
+    for pattern in patterns:
+        expected = brute_force(gdc.sentences, pattern)
+        assert expected
+        assert list(gdc.search(pattern)) == expected
+
+
+def test_pp_case_mismatch(gdc):
+    matches = list(gdc.search(query.PP_CASE_MISMATCH))
+    assert matches == brute_force(gdc.sentences, query.PP_CASE_MISMATCH)
+    assert "[PP um ao [NP nokkurra fohfe ára nhfe ] [NP skeið nheo ] ]" in [
+        str(gdc.node(match)) for match in matches
+    ]
+    for match in matches:
+        sentence = gdc.sentence(match)
+        assert sentence.kinds[match.node] == PHRASE
+
+
+def test_pp_case_mismatch_skips_qualifiers():
+    index = build_index(
+        [
+            "[PP í aþ [NP húsinu nheþg ] [NP Jóns nkee-s ] ] . .",
+            "[PP í aþ [NP húsinu nheþg Jóns nkee-s ] ] . .",
+            "[PP í aþ [NP húsið nheog ] ] . .",
+        ]
+    )
+    assert list(index.search(query.PP_CASE_MISMATCH)) == [Match(2, 0)]
+
+
+def test_save_and_load(index, tmp_path):
+    path = tmp_path / "index.pickle"
+    index.save(path)
+    loaded = CorpusIndex.load(path, index.sentences)
+    pattern = phrase("PP", child=terminal(tag="ao"))
+    assert list(loaded.search(pattern)) == list(index.search(pattern))
+    with pytest.raises(ValueError):
+        CorpusIndex.load(path, index.sentences[:2])
+
+
+def test_corpus_file(tmp_path):
+    path = tmp_path / "corpus.bin"
+    write_corpus(path, SENTENCES)
+    with read_corpus(path) as corpus:
+        index = build_index(corpus)
+        assert index.sentences is corpus
+        assert list(index.search(phrase("PP", child=terminal(word="um")))) == [Match(3, 0)]
+
+
+def test_accepts_sentence_objects():
+    index = build_index([IceNLPySentence(SENTENCES[0]), IceNLPySentence(SENTENCES[1]).pack()])
+    assert index.count(phrase("PP")) == 2
@@ -0,0 +1,145 @@
+import threading
+
+import pytest
+
+from icenlpy import server
+from icenlpy.server import Client, MicroBatcher, Server, ServerBusy, ServerError
+
+
+def echo_batches(batches):
+    def process(items):
+        batches.append(list(items))
+        return [item.upper() for item in items]
+
+    return process
+
+
+def test_concurrent_requests_share_a_batch():
+    batches = []
+    batcher = MicroBatcher(echo_batches(batches), max_batch_size=10, max_wait=0.5)
+    futures = [batcher.submit([f"a{idx}", f"b{idx}"]) for idx in range(3)]
+    assert [future.result(5) for future in futures] == [
+        ["A0", "B0"],
+        ["A1", "B1"],
+        ["A2", "B2"],
+    ]
+    assert batches == [["a0", "b0", "a1", "b1", "a2", "b2"]]
+    batcher.close()
+    assert batcher.stats() == {"queued": 0, "requests": 3, "batches": 1, "rejected": 0}
+
+
+def test_batches_are_cut_at_max_batch_size():
+    batches = []
+    batcher = MicroBatcher(echo_batches(batches), max_batch_size=3, max_wait=0.5)
+    futures = [batcher.submit(["x", "y"]) for _ in range(3)]
+    for future in futures:
+        assert future.result(5) == ["X", "Y"]
+    # Requests are never split, so a batch of 3 holds one request of 2
+    assert [len(batch) for batch in batches] == [2, 2, 2]
+    # A request larger than a batch is a batch of its own
+    assert batcher.submit(list("abcde")).result(5) == list("ABCDE")
+    batcher.close()
+
+
+def test_full_queue_is_rejected():
+    release = threading.Event()
+    started = threading.Event()
+
+    def process(items):
+        started.set()
+        release.wait(5)
+        return items
+
+    batcher = MicroBatcher(process, max_batch_size=2, max_wait=0, max_queue=3)
+    first = batcher.submit(["a", "b"])
+    started.wait(5)
+    queued = batcher.submit(["c", "d", "e"])
+    with pytest.raises(ServerBusy):
+        batcher.submit(["f"])
+    assert batcher.stats()["rejected"] == 1
+    release.set()
+    assert first.result(5) == ["a", "b"]
+    assert queued.result(5) == ["c", "d", "e"]
+    batcher.close()
+
+
+def test_failing_request_does_not_fail_its_batch():
+    def process(items):
+        if "bad" in items:
+            raise ValueError("bad input")
+        return items
+
+    batcher = MicroBatcher(process, max_batch_size=10, max_wait=0.5)
+    good = batcher.submit(["good"])
+    bad = batcher.submit(["bad"])
+    assert good.result(5) == ["good"]
+    with pytest.raises(ValueError):
+        bad.result(5)
+    batcher.close()
+
+
+def test_cancelled_requests_are_dropped():
+    batches = []
+    batcher = MicroBatcher(echo_batches(batches), max_batch_size=10, max_wait=0.5)
+    cancelled = batcher.submit(["gone"])
+    assert cancelled.cancel()
+    assert batcher.submit(["kept"]).result(5) == ["KEPT"]
+    assert batches == [["kept"]]
+    batcher.close()
+
+
+def test_http_server(fake_jvm):
+    with Server(port=0, max_wait=0.01) as service:
+        client = Client(service.address)
+        (tagged,) = client.tag(["Hann  fór"])
+        assert tagged.tokens == ["Hann", "fór"]
+        assert tagged.tags == ["x", "x"]
+
+        parsed = client.parse(["Hann fór", ""])
+        assert str(parsed[0].tree) == "[X Hann x fór x ]"
+        assert parsed[0].tags == ["x", "x"]
+        assert parsed[1].tokens == []
+
+        parsed_tagged = client.parse(["Hann fpken"], tagged=True)
+        assert parsed_tagged[0].tokens == ["Hann"]
+
+        health = client.health()
+        assert health["status"] == "ok"
+        assert health["batchers"]["parse"]["requests"] == 1
+        assert "# TYPE" in client.metrics()
+
+        with pytest.raises(ServerError) as error:
+            client._request("POST", "/unknown", {"sentences": []})
+        assert error.value.status == 404
+        with pytest.raises(ServerError) as error:
+            client._request("POST", "/tag", {"sentences": "not a list"})
+        assert error.value.status == 400
+
+
+def test_unix_socket_server(fake_jvm, tmp_path):
+    socket_path = str(tmp_path / "icenlpy.sock")
+    with Server(socket_path=socket_path, warm=False) as service:
+        assert service.address == socket_path
+        client = Client(socket_path=socket_path)
+        results = []
+
+        def call(idx):
+            results.append(client.parse([f"orð{idx}"])[0].tokens)
+
+        threads = [threading.Thread(target=call, args=(idx,)) for idx in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert sorted(results) == [[f"orð{idx}"] for idx in range(5)]
+    assert not (tmp_path / "icenlpy.sock").exists()
+
+
+def test_busy_server_answers_503(fake_jvm, monkeypatch):
+    def busy(self, path, sentences, request):
+        raise ServerBusy()
+
+    monkeypatch.setattr(server.Server, "handle", busy)
+    with Server(port=0, warm=False) as service:
+        with pytest.raises(ServerBusy):
+            Client(service.address).tag(["Hann"])
@@ -0,0 +1,111 @@
+from pathlib import Path
+
+import pytest
+
+from icenlpy import store
+from icenlpy.store import CorpusReader, CorpusWriter, read_corpus, write_corpus
+from icenlpy.tree import IceNLPySentence, PackedSentence, Phrase, TerminalNode
+
+PARSED = (
+    Path(__file__).parent.parent
+    / "src/icenlpy/resources/IceNLP/bat/iceparser/testData/test.gold.sent.parsed"
+)
+
+SENTENCES = [
+    "[AdvP Stundum aa ] , , [VP held sfg1en ] [NP ég fp1en ] , , [VPb er sfg3en ] "
+    "[NPs [NP einhver foken einhverju foheþ [AP betri lkenvm ] ] [CP en c ] [NP ekkert fohen ] ] . .",
+    "",
+    "[NPs [NP Hvað fshen ] [CP heldur c ] [NP þú fp2en ] ] ? ?",
+]
+
+
+@pytest.fixture
+def corpus_file(tmp_path):
+    path = tmp_path / "corpus.bin"
+    write_corpus(path, SENTENCES)
+    return path
+
+
+def test_roundtrip(corpus_file):
+    with read_corpus(corpus_file) as corpus:
+        assert len(corpus) == 3
+        assert [str(sent) for sent in corpus] == [str(IceNLPySentence(s)) for s in SENTENCES]
+        assert all(isinstance(sent, PackedSentence) for sent in corpus)
+
+
+def test_random_access(corpus_file):
+    with read_corpus(corpus_file) as corpus:
+        assert corpus[2].text == "Hvað heldur þú ?"
+        assert corpus[-1].text == corpus[2].text
+        assert str(corpus[1]) == ""
+        assert [sent.text for sent in corpus[0:3:2]] == [corpus[0].text, corpus[2].text]
+        with pytest.raises(IndexError):
+            corpus[3]
+        with pytest.raises(IndexError):
+            corpus[-4]
+
+
+def test_structure_is_preserved(corpus_file):
+    expected = IceNLPySentence(SENTENCES[0]).pack()
+    with read_corpus(corpus_file) as corpus:
+        sentence = corpus[0]
+        assert sentence.kinds == expected.kinds
+        assert sentence.values == expected.values
+        assert sentence.tags == expected.tags
+        assert sentence.parents == expected.parents
+        assert sentence.ends == expected.ends
+        assert sentence.view == expected.view
+        assert str(sentence.unpack()) == str(expected)
+
+
+def test_strings_are_stored_once(corpus_file):
+    with read_corpus(corpus_file) as corpus:
+        strings = corpus.strings
+        assert len(strings) == len(set(strings))
+        assert strings.count("NP") == 1
+
+
+def test_writer_accepts_sentence_objects(tmp_path):
+    path = tmp_path / "corpus.bin"
+    sentence = IceNLPySentence([Phrase("NP", [TerminalNode("Hann", "fpken")])])
+    with CorpusWriter(path) as writer:
+        writer.write(sentence)
+        writer.write(sentence.pack())
+        assert len(writer) == 2
+    with CorpusReader(path) as corpus:
+        assert [str(sent) for sent in corpus] == ["[NP Hann fpken ]"] * 2
+
+
+def test_empty_corpus(tmp_path):
+    path = tmp_path / "corpus.bin"
+    assert write_corpus(path, []) == 0
+    with read_corpus(path) as corpus:
+        assert len(corpus) == 0
+        assert list(corpus) == []
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "corpus.bin"
+    path.write_bytes(b"[NP Hann fpken ]\n")
+    with pytest.raises(ValueError):
+        read_corpus(path)
+    path.write_bytes(b"")
+    with pytest.raises(ValueError):
+        read_corpus(path)
+
+
+def test_large_string_numbers(tmp_path):
+    path = tmp_path / "corpus.bin"
+    sentences = [f"[NP orð{idx} nken ]" for idx in range(20_000)]
+    write_corpus(path, sentences)
+    with read_corpus(path) as corpus:
+        assert str(corpus[19_999]) == sentences[19_999]
+
+
+def test_convert_parsed_file(tmp_path):
+    path = tmp_path / "corpus.bin"
+    lines = [line for line in PARSED.read_text(encoding="utf-8").split("\n") if line.strip()]
+    assert store.convert_parsed_file(PARSED, path) == len(lines)
+    with read_corpus(path) as corpus:
+        for idx in (0, len(lines) // 2, len(lines) - 1):
+            assert str(corpus[idx]) == str(IceNLPySentence(lines[idx]))
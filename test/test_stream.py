@@ -0,0 +1,133 @@
+import io
+import sys
+import gzip
+import json
+
+import pytest
+
+from icenlpy import cli, stream
+from icenlpy.stream import StreamedSentence
+from icenlpy.tree import IceNLPySentence
+
+LINES = [f"orð{idx} og annað" for idx in range(7)]
+
+
+def run_cli(monkeypatch, *argv, stdin=None):
+    monkeypatch.setattr(sys, "argv", ["icenlpy", *argv])
+    if stdin is not None:
+        monkeypatch.setattr(sys, "stdin", io.StringIO(stdin))
+    with pytest.raises(SystemExit) as exit_info:
+        cli.main()
+    return exit_info.value.code
+
+
+def test_expand_inputs(tmp_path):
+    for name in ("b.txt", "a.txt", "c.gz"):
+        (tmp_path / name).write_text("x")
+    assert stream.expand_inputs([str(tmp_path / "*.txt"), "-"]) == [
+        str(tmp_path / "a.txt"),
+        str(tmp_path / "b.txt"),
+        "-",
+    ]
+    assert stream.expand_inputs(["missing.txt"]) == ["missing.txt"]
+    with pytest.raises(FileNotFoundError):
+        stream.expand_inputs([str(tmp_path / "*.xml")])
+
+
+def test_read_lines_from_plain_and_gzip_files(tmp_path):
+    plain = tmp_path / "a.txt"
+    plain.write_text("Fyrsta lína\n\nÖnnur lína\n", encoding="utf-8")
+    compressed = tmp_path / "b.txt.gz"
+    with gzip.open(compressed, "wt", encoding="utf-8") as file:
+        file.write("Þriðja lína\n")
+    lines = list(stream.read_lines([plain, compressed]))
+    assert lines == ["Fyrsta lína", "Önnur lína", "Þriðja lína"]
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_process_lines_keeps_order(fake_jvm, workers):
+    results = list(stream.process_lines("icetagger", LINES, batch_size=2, workers=workers))
+    assert [result.lines for result in results] == [2, 2, 2, 1]
+    sentences = [sentence for result in results for sentence in result.sentences]
+    assert [sentence.tokens[0] for sentence in sentences] == [f"orð{idx}" for idx in range(7)]
+    assert sentences[0].tags == ["x", "x", "x"]
+
+
+def test_process_lines_rejects_empty_batches():
+    with pytest.raises(ValueError):
+        stream.process_lines("tokenizer", LINES, batch_size=0)
+
+
+def test_format_sentence():
+    tagged = StreamedSentence(["Hann", "fór"], ["fpken", "sfg3eþ"])
+    assert stream.format_sentence(tagged) == "Hann fpken fór sfg3eþ\n"
+    assert stream.format_sentence(tagged, token_per_line=True) == "Hann fpken\nfór sfg3eþ\n\n"
+    assert json.loads(stream.format_sentence(tagged, "jsonl")) == {
+        "tokens": ["Hann", "fór"],
+        "tags": ["fpken", "sfg3eþ"],
+    }
+    assert stream.format_sentence(StreamedSentence(["Hann", "fór"])) == "Hann fór\n"
+
+    tree = IceNLPySentence("[VP [NP Hann fpken NP] fór sfg3eþ VP] . .")
+    parsed = StreamedSentence(["Hann", "fór", "."], ["fpken", "sfg3eþ", "."], tree)
+    assert stream.format_sentence(parsed) == f"{tree}\n"
+    assert stream.format_sentence(parsed, tree_view=True) == tree.view
+    assert json.loads(stream.format_sentence(parsed, "jsonl"))["brackets"] == str(tree)
+    assert stream.format_sentence(parsed, "conll").split("\n") == [
+        "1\tHann\t_\t_\tfpken\t_\t_\t_\t_\tPhrases=VP>NP",
+        "2\tfór\t_\t_\tsfg3eþ\t_\t_\t_\t_\tPhrases=VP",
+        "3\t.\t_\t_\t.\t_\t_\t_\t_\t_",
+        "",
+        "",
+    ]
+    with pytest.raises(ValueError):
+        stream.format_sentence(tagged, "xml")
+
+
+def test_progress_meter():
+    output = io.StringIO()
+    progress = stream.Progress(output, interval=0)
+    progress.update(2, [StreamedSentence(["a", "b"]), StreamedSentence(["c"])])
+    progress.close()
+    assert "2 lines, 2 sentences, 3 tokens" in output.getvalue()
+    assert output.getvalue().endswith("tokens/s)\n")
+
+
+def test_cli_parses_files_to_jsonl(fake_jvm, monkeypatch, tmp_path, capsys):
+    (tmp_path / "a.txt").write_text("\n".join(LINES[:4]) + "\n", encoding="utf-8")
+    with gzip.open(tmp_path / "b.txt.gz", "wt", encoding="utf-8") as file:
+        file.write("\n".join(LINES[4:]) + "\n")
+    code = run_cli(
+        monkeypatch,
+        "iceparser",
+        "-i",
+        str(tmp_path / "*.txt"),
+        str(tmp_path / "*.gz"),
+        "--format",
+        "jsonl",
+        "--workers",
+        "2",
+        "--batch-size",
+        "3",
+        "--progress",
+    )
+    assert code == 0
+    captured = capsys.readouterr()
+    records = [json.loads(line) for line in captured.out.splitlines()]
+    assert [record["tokens"][0] for record in records] == [f"orð{idx}" for idx in range(7)]
+    assert "7 lines, 7 sentences, 21 tokens" in captured.err
+
+
+def test_cli_reads_stdin_and_writes_gzip(fake_jvm, monkeypatch, tmp_path):
+    output = tmp_path / "out.txt.gz"
+    code = run_cli(
+        monkeypatch, "tokenizer", "-o", str(output), "-of", "1", stdin="Hann fór\n\nHeim\n"
+    )
+    assert code == 0
+    with gzip.open(output, "rt", encoding="utf-8") as file:
+        assert file.read() == "Hann\nfór\n\nHeim\n\n"
+
+
+def test_cli_direct_text(fake_jvm, monkeypatch, capsys):
+    assert run_cli(monkeypatch, "icetagger", "Hann fór", "--no-progress") == 0
+    assert capsys.readouterr().out == "Hann x fór x\n"
@@ -36,3 +36,45 @@ def test_split_into_sentences():
     expected = TWO_SENTENCE_TOKEN_STRINGS_IN_A_LIST
     sentences = tokenizer.split_into_sentences(input_sentence)
     assert sentences == expected
+
+
+def test_iter_tokenize(fake_jvm):
+    from src.icenlpy import tokenizer
+
+    tokenized = tokenizer.iter_tokenize(["Hann er hér .", "", "Hvað ?"])
+    assert list(tokenized) == [["Hann", "er", "hér", "."], ["Hvað", "?"]]
+
+
+def test_atokenize(fake_jvm):
+    import asyncio
+
+    from src.icenlpy import tokenizer
+
+    tokenized = asyncio.run(tokenizer.atokenize(["Hann er .", "Hvað ?"]))
+    assert [list(sent) for sent in tokenized] == [["Hann", "er", "."], ["Hvað", "?"]]
+
+
+def test_python_backend():
+    from src.icenlpy import tokenizer
+
+    tokenized = tokenizer.tokenize(TWO_SENTENCE_STRING, backend="python")
+    assert [tuple(sentence) for sentence in tokenized] == [
+        tuple(sentence) for sentence in TWO_SENTENCE_TOKENS
+    ]
+    assert (
+        tokenizer.split_into_sentences(TWO_SENTENCE_STRING, backend="python")
+        == TWO_SENTENCE_TOKEN_STRINGS_IN_A_LIST
+    )
+
+
+def test_python_backend_rejects_unsupported_args():
+    import pytest
+
+    from src.icenlpy import tokenizer
+
+    with pytest.raises(ValueError):
+        tokenizer.tokenize("Hæ.", args={"mwe": True}, backend="python")
+    with pytest.raises(ValueError):
+        tokenizer.tokenize("Hæ.", args={"if": 1}, backend="python")
+    with pytest.raises(ValueError):
+        tokenizer.tokenize("Hæ.", backend="perl")
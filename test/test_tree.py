@@ -1,5 +1,5 @@
 import pytest
-from src.icenlpy.tree import TerminalNode, Phrase, IceNLPySentence
+from src.icenlpy.tree import TerminalNode, Phrase, IceNLPySentence, PackedSentence
 from src.icenlpy import iceparser
 
 from typing import List, Tuple
@@ -291,3 +291,88 @@ def test_tree_text():
 
     assert sentence.text == complex_sentence_expected_text
     assert list(sentence.tokens()) == complex_sentence_expected_text.split()
+
+
+def test_from_string_with_functions_and_bracket_tokens():
+    sentence = IceNLPySentence(
+        "{*SUBJ> [NP Það fphen ] } [SCP að c ] [ pa {*QUAL [NP menntamála nhfe ] } ] pa . pl"
+    )
+    assert str(sentence) == (
+        "[NP Það fphen ] [SCP að c ] [ pa [NP menntamála nhfe ] ] pa . pl"
+    )
+    assert [el.label for el in sentence.phrases] == ["NP", "SCP", "NP"]
+    assert list(sentence.tokens()) == ["Það", "að", "[", "menntamála", "]", "."]
+
+
+def test_from_string_unbalanced():
+    with pytest.raises(ValueError):
+        IceNLPySentence("[NP ein det ] ]")
+    unclosed = IceNLPySentence("[NP ein det [PP í prep")
+    assert str(unclosed) == "[NP ein det [PP í prep ] ]"
+
+
+def test_nodes_use_slots():
+    sentence = IceNLPySentence("[NP ein det ] . pl")
+    for obj in (sentence, sentence.phrases[0], sentence.phrases[0].elements[0]):
+        assert not hasattr(obj, "__dict__")
+
+
+def test_pack_roundtrip():
+    raw = "[NP ein det [PP í prep bók noun ] ] , , [VP kemur verb ] . pl"
+    sentence = IceNLPySentence(raw)
+    packed = sentence.pack()
+
+    assert isinstance(packed, PackedSentence)
+    assert len(packed) == 9
+    assert str(packed) == str(sentence)
+    assert packed.view == sentence.view
+    assert packed.text == sentence.text
+    assert list(packed.tokens()) == ["ein", "í", "bók", ",", "kemur", "."]
+    assert [p.label for p in packed.phrases] == ["NP", "VP"]
+    assert [e.label for e in packed.phrases[0].elements if isinstance(e, Phrase)] == ["PP"]
+    assert str(packed.unpack()) == str(sentence)
+
+
+def test_packed_sentence_is_read_only():
+    packed = IceNLPySentence("[NP ein det ]").pack()
+    with pytest.raises(TypeError):
+        packed.phrases[0].add_child(TerminalNode("x", "y"))
+    with pytest.raises(AttributeError):
+        packed.phrases[0].label = "VP"
+
+
+def test_packed_sentences_share_strings():
+    first = IceNLPySentence("[NP bók" + " noun ]").pack()
+    second = IceNLPySentence("[NP bók noun" + " ]").pack()
+    assert first.tags[1] is second.tags[1]
+    assert first.values[0] is second.values[0]
+
+
+def test_write_view_matches_view():
+    import io
+
+    sentence = IceNLPySentence("[NP ein det [PP í prep bók noun ] ] . pl")
+    buffer = io.StringIO()
+    sentence.write_view(buffer)
+    assert buffer.getvalue() == sentence.view
+    assert sentence.view == (
+        "S0\n+-NP\n  +-det: 'ein'\n  +-PP\n    +-prep: 'í'\n    +-noun: 'bók'\n+-pl: '.'\n"
+    )
+
+
+def test_rendering_is_cached():
+    sentence = IceNLPySentence("[NP ein det ]")
+    assert str(sentence) is str(sentence)
+    assert sentence.view is sentence.view
+
+    sentence.phrases[0].add_child(TerminalNode("bók", "noun"))
+    assert str(sentence) == "[NP ein det ]"
+    sentence.clear_cache()
+    assert str(sentence) == "[NP ein det bók noun ]"
+
+
+def test_render_deep_tree():
+    depth = 5000
+    sentence = IceNLPySentence("[NP a b " * depth + "]" * depth)
+    assert str(sentence).count("[NP") == depth
+    assert len(sentence.view.splitlines()) == 2 * depth + 1
@@ -0,0 +1,132 @@
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from icenlpy import icetagger, tritagger
+from icenlpy.tritagger import get_tagger, to_icetagger_tag, to_revised_tag
+
+TEST_GOLD = (
+    Path(__file__).parent.parent
+    / "src/icenlpy/resources/IceNLP/bat/iceparser/testData/test.gold"
+)
+
+
+def test_get_tagger_is_cached():
+    assert get_tagger() is get_tagger()
+
+
+def test_read_lambdas():
+    lambdas = tritagger.read_lambdas(tritagger.MODEL_DIR / "otb.lambda")
+    assert set(lambdas) >= {"lambdaTri1", "lambdaTri2", "lambdaTri3"}
+    assert sum(lambdas[f"lambdaTri{n}"] for n in (1, 2, 3)) == pytest.approx(1, abs=1e-3)
+
+
+def test_tag_known_words():
+    tags = get_tagger().tag("Hundurinn gelti á köttinn .".split())
+    assert tags == ["nkeng", "sfg3eþ", "ao", "nkeog", "."]
+
+
+def test_tag_empty_sentence():
+    assert get_tagger().tag([]) == []
+
+
+def test_unknown_word_is_guessed_from_suffix():
+    tags = get_tagger().tag("Ég keypti glæsiflugvélarnar .".split())
+    # A feminine plural accusative noun with the definite article
+    assert tags[2] == "nvfog"
+
+
+def test_number_classes():
+    tags = get_tagger().tag("Hann keypti 25 bækur 1.500 sinnum .".split())
+    assert tags[2] == "ta"
+    assert tags[4] == "ta"
+
+
+def test_tag_sentences():
+    sentences = [["Ég", "sef", "."], ["Hundurinn", "gelti", "."]]
+    tagged = get_tagger().tag_sentences(sentences)
+    assert [len(tags) for tags in tagged] == [3, 3]
+
+
+@pytest.mark.parametrize(
+    "word,tag,expected",
+    [
+        ("á", "ao", "af"),
+        ("í", "aþ", "af"),
+        ("til", "ae", "af"),
+        ("farið", "ssg", "sþghen"),
+        ("sem", "c", "ct"),
+        ("og", "c", "c"),
+        (".", ".", "pl"),
+        (",", ",", "pk"),
+        ("»", "»", "pg"),
+        ("„", "„", "pg"),
+        ("(", "(", "pa"),
+        ("hestur", "nken", "nken"),
+    ],
+)
+def test_to_revised_tag(word, tag, expected):
+    assert to_revised_tag(word, tag) == expected
+
+
+@pytest.mark.parametrize(
+    "word,tag,expected",
+    [
+        ("á", "ao", "ao"),
+        ("farið", "ssg", "ssg"),
+        (".", ".", "."),
+        ("„", "»", "„"),
+        ("—", "-", "—"),
+    ],
+)
+def test_to_icetagger_tag(word, tag, expected):
+    assert to_icetagger_tag(word, tag) == expected
+
+
+def test_accuracy_on_gold_corpus():
+    blocks = TEST_GOLD.read_text(encoding="utf-8").strip().split("\n\n")
+    gold = [[line.split("\t") for line in block.split("\n")] for block in blocks]
+    tagger = get_tagger()
+    correct = total = 0
+    for sentence in gold:
+        tokens = [token for token, _ in sentence]
+        for (token, gold_tag), tag in zip(sentence, tagger.tag(tokens)):
+            correct += to_revised_tag(token, tag) == gold_tag.strip()
+            total += 1
+    assert correct / total > 0.8
+
+
+def test_tag_text_hmm_backend():
+    tagged = icetagger.tag_text(
+        ["Hundurinn gelti á köttinn ."], args={"lf": 2}, backend="hmm"
+    )
+    assert [line.strip() for line in tagged] == [
+        "Hundurinn nkeng gelti sfg3eþ á ao köttinn nkeog . ."
+    ]
+
+
+def test_tag_text_hmm_backend_tags_only():
+    tags = icetagger.tag_text(
+        ["Ég sef. Hundurinn gelti."], backend="hmm", return_tags_only=True
+    )
+    assert len(tags) == 2
+    assert tags[0][-1] == "."
+
+
+def test_tag_text_hmm_backend_token_per_line():
+    tagged = icetagger._tag_hmm(["Ég\nsef\n.\n\nHundurinn\ngelti\n."], {"lf": 1, "of": 1})
+    sentences = tagged.split("\n\n")
+    assert len(sentences) == 2
+    assert sentences[0].split("\n")[0] == "Ég fp1en"
+
+
+def test_tag_text_hmm_backend_rejects_unsupported_args():
+    with pytest.raises(ValueError):
+        icetagger.tag_text(["Ég sef ."], args={"lf": 2, "sf": True}, backend="hmm")
+
+
+def test_tag_text_unknown_backend():
+    with pytest.raises(ValueError):
+        icetagger.tag_text(["Ég sef ."], backend="crf")
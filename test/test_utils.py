@@ -0,0 +1,70 @@
+import logging
+
+from contextlib import contextmanager
+
+from icenlpy import icetagger, utils
+from icenlpy.utils import Preview
+
+
+def test_preview():
+    assert str(Preview("short")) == "short"
+    text = "x" * 1000
+    shown = str(Preview(text))
+    assert shown.startswith("x" * utils.LOG_PREVIEW_CHARS + "...")
+    assert shown.endswith("(1000 characters)")
+    assert str(Preview(text, limit=3)) == "xxx... (1000 characters)"
+
+
+def test_format_command():
+    assert utils.format_command(["java", "-classpath", "a b.jar"]) == "java -classpath 'a b.jar'"
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+@contextmanager
+def log_level(level):
+    logger = logging.getLogger("icenlpy")
+    handler = ListHandler()
+    old_level = logger.level
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    try:
+        yield handler.messages
+    finally:
+        logger.removeHandler(handler)
+        logger.setLevel(old_level)
+
+
+class Exploding(str):
+    """A runner output that fails the test if it is formatted for the log."""
+
+    def __str__(self):
+        raise AssertionError("the output was formatted")
+
+    def __len__(self):
+        raise AssertionError("the output was measured")
+
+
+def test_no_formatting_when_disabled(monkeypatch):
+    output = Exploding("Hann fpken")
+    monkeypatch.setattr(utils, "call_icenlp_jar", lambda *args, **kwargs: output)
+    with log_level(logging.INFO) as messages:
+        assert icetagger.run_icetagger(None, Exploding("Hann")) is output
+    assert messages == []
+
+
+def test_debug_logs_previews(monkeypatch):
+    output = "Hann fpken\n" * 1000
+    monkeypatch.setattr(utils, "call_icenlp_jar", lambda *args, **kwargs: output)
+    with log_level(logging.DEBUG) as messages:
+        icetagger.run_icetagger(None, "Hann\n" * 1000)
+    assert len(messages) == 2
+    assert any(message.endswith(f"({len(output)} characters)") for message in messages)
+    assert all(len(message) < 2 * utils.LOG_PREVIEW_CHARS for message in messages)
@@ -0,0 +1,142 @@
+import os
+import time
+import asyncio
+
+import pytest
+
+from icenlpy import utils
+from icenlpy.workers import WorkerPool, get_pool
+
+
+def test_call_icenlp_jar_uses_pool(fake_jvm):
+    pool = get_pool()
+    first = utils.call_icenlp_jar("IceNLPCore.jar", "tagger", "Hann er hér\n")
+    assert first == "Hann x er x hér x\n"
+    assert pool.stats()["misses"] == 1
+    assert pool.stats()["idle"] == 1
+
+    second = utils.call_icenlp_jar("IceNLPCore.jar", "tagger", "Hvað\n")
+    assert second == "Hvað x\n"
+    assert pool.stats()["hits"] == 1
+
+
+def test_call_icenlp_jar_without_pool(fake_jvm):
+    output = utils.call_icenlp_jar(
+        "IceNLPCore.jar", "tokenizer", "a  b\n", use_pool=False
+    )
+    assert output == "a b\n"
+    assert get_pool().stats()["spawned"] == 0
+
+
+def test_call_icenlp_jar_error(fake_jvm):
+    with pytest.raises(Exception, match="fake runner crashed"):
+        utils.call_icenlp_jar("IceNLPCore.jar", "parser", "", {"crash": True})
+
+
+def test_dead_workers_are_replaced(fake_jvm):
+    command = fake_jvm("IceNLPCore.jar", "tokenizer")
+    with WorkerPool(size=2) as pool:
+        pool.warm(command)
+        for worker in list(pool._idle[tuple(command)]):
+            worker.process.kill()
+            worker.process.wait()
+        report = pool.health_check()
+        assert report == {"dropped": 2, "alive": 2}
+        assert pool.stats()["restarted"] == 2
+        assert pool.acquire(command).run("a b\n")[0] == "a b\n"
+
+
+def test_stale_workers_are_reaped(fake_jvm):
+    command = fake_jvm("IceNLPCore.jar", "tokenizer")
+    with WorkerPool(size=1, max_idle=0.5) as pool:
+        pool.warm(command)
+        (worker,) = pool._idle[tuple(command)]
+        deadline = time.monotonic() + 10
+        while pool.stats()["idle"] and time.monotonic() < deadline:
+            time.sleep(0.1)
+        assert pool.stats()["idle"] == 0
+        assert not worker.is_alive()
+        assert pool.stats()["restarted"] == 0
+        assert pool.acquire(command).run("a b\n")[0] == "a b\n"
+        assert pool.stats()["misses"] == 1
+
+
+def test_shutdown_kills_idle_workers(fake_jvm):
+    command = fake_jvm("IceNLPCore.jar", "tokenizer")
+    pool = WorkerPool(size=1)
+    pool.warm(command)
+    (worker,) = pool._idle[tuple(command)]
+    pool.shutdown()
+    assert not worker.is_alive()
+    with pytest.raises(RuntimeError):
+        pool.acquire(command)
+
+
+def test_stream_icenlp_jar(fake_jvm):
+    lines = (f"orð{idx}" for idx in range(1000))
+    output = utils.stream_icenlp_jar("IceNLPCore.jar", "tagger", lines)
+    assert next(output) == "orð0 x"
+    assert sum(1 for _ in output) == 999
+
+
+def test_stream_icenlp_jar_early_close_kills_runner(fake_jvm):
+    output = utils.stream_icenlp_jar("IceNLPCore.jar", "tokenizer", ["a", "b"])
+    assert next(output) == "a"
+    process = output.gi_frame.f_locals["process"]
+    output.close()
+    assert process.poll() is not None
+
+
+def test_stream_icenlp_jar_error(fake_jvm):
+    output = utils.stream_icenlp_jar("IceNLPCore.jar", "parser", ["a"], {"crash": True})
+    with pytest.raises(Exception, match="fake runner crashed"):
+        list(output)
+
+
+def test_acall_icenlp_jar(fake_jvm):
+    output = asyncio.run(utils.acall_icenlp_jar("IceNLPCore.jar", "tagger", "a b\n"))
+    assert output == "a x b x\n"
+
+
+def test_acall_icenlp_jar_timeout_kills_runner(fake_jvm, monkeypatch):
+    spawned = []
+    create_subprocess_exec = asyncio.create_subprocess_exec
+
+    async def recording_exec(*args, **kwargs):
+        process = await create_subprocess_exec(*args, **kwargs)
+        spawned.append(process)
+        return process
+
+    monkeypatch.setattr(asyncio, "create_subprocess_exec", recording_exec)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(
+            utils.acall_icenlp_jar(
+                "IceNLPCore.jar", "tagger", "a\n", {"sleep": 10}, timeout=0.5
+            )
+        )
+    assert spawned[0].returncode is not None
+
+
+def test_async_concurrency_limit(fake_jvm):
+    utils.set_async_concurrency(2)
+    running = 0
+    peak = 0
+    acall = utils.acall_icenlp_jar
+
+    async def main():
+        async def one():
+            nonlocal running, peak
+            async with utils._async_semaphore():
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.05)
+                running -= 1
+            return await acall("IceNLPCore.jar", "tokenizer", "a\n")
+
+        return await asyncio.gather(*(one() for _ in range(5)))
+
+    try:
+        assert asyncio.run(main()) == ["a\n"] * 5
+        assert peak == 2
+    finally:
+        utils.set_async_concurrency(os.cpu_count() or 1)